@@ -0,0 +1,19 @@
+"""
+Shared setup of the benchmark scripts: puts this folder and the hermes
+sources on sys.path and installs fakearcpy as arcpy, so hermes imports
+without ArcGIS.  Every script imports it before hermes:
+
+  import _setup
+  import hermes
+"""
+from __future__ import absolute_import
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+import fakearcpy
+sys.modules['arcpy'] = fakearcpy
@@ -0,0 +1,69 @@
+"""
+Compares the storage of a weekly archive kept as one xml file per
+dataset per week against a deduplicated MetadataArchive of the same
+snapshots.  Every week ArcGIS rewrites the ModDate of each dataset and a
+few datasets get a real edit.
+
+Usage:
+
+  python benchmarks/bench_archive.py --datasets 50 --weeks 12 --size 64k
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import random
+import argparse
+import tempfile
+import time
+
+import _setup
+import fakearcpy
+import corpus
+from hermes.archive import MetadataArchive
+
+#--------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--datasets", type=int, default=50)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--size", default="64k")
+    parser.add_argument("--edited", type=float, default=0.1,
+                        help="share of the datasets edited each week")
+    args = parser.parse_args()
+    rng = random.Random(0)
+    datasets = [r"c:\bench\archive.gdb\layer_%d" % i
+                for i in range(args.datasets)]
+    documents = dict((d, corpus.generate("arcgis", args.size, seed=i,
+                                         name="layer_%d" % i))
+                     for i, d in enumerate(datasets))
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "archive.sqlite")
+    full = 0
+    seconds = 0.0
+    with MetadataArchive(path) as archive:
+        for week in range(args.weeks):
+            for dataset in datasets:
+                xml = documents[dataset].replace(
+                    b"<ModDate>20150615", b"<ModDate>2015%04d" % (week + 1))
+                if rng.random() < args.edited:
+                    xml = xml.replace(b"FIELD_3</attrlabl>",
+                                      b"FIELD_3</attrlabl><!-- %d -->" % week)
+                    xml = xml.replace(b"Field 3<", b"Field 3 (week %d)<" % week)
+                    documents[dataset] = xml
+                fakearcpy.register(dataset, xml)
+                full += len(xml)
+            started = time.time()
+            archive.snapshot(datasets, label="week %d" % week)
+            seconds += time.time() - started
+        stats = archive.stats()
+    stored = os.path.getsize(path)
+    os.remove(path)
+    os.rmdir(folder)
+    print("xml copies   %10d bytes" % full)
+    print("archive      %10d bytes (%d chunks, %.1fx smaller)" % (
+        stored, stats["chunks"], float(full) / stored))
+    print("snapshots    %10.2fs for %d documents" % (
+        seconds, stats["documents"]))
+
+if __name__ == "__main__":
+    main()
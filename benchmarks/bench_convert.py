@@ -0,0 +1,49 @@
+"""
+Times the iterative XML to dictionary converter against the original
+recursive implementation on an entity/attribute heavy document.
+
+Usage:
+
+  python benchmarks/bench_convert.py --attributes 5000 --repeat 5
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import timeit
+import argparse
+
+import _setup
+from hermes.converters import ET, metadata_to_dictionary, \
+     metadata_to_dictionary_recursive
+
+#--------------------------------------------------------------------------
+def build_document(attributes):
+    """returns an FGDC style document with the given number of attr nodes"""
+    parts = ['<metadata><eainfo><detailed Name="parcels">']
+    for i in range(attributes):
+        parts.append(
+            '<attr><attrlabl Sync="TRUE">FIELD_%d</attrlabl>'
+            '<attalias Sync="TRUE">Field %d</attalias>'
+            '<attrtype Sync="TRUE">String</attrtype>'
+            '<attwidth Sync="TRUE">50</attwidth>'
+            '<attrdef>definition %d</attrdef>'
+            '<attrdomv><edom><edomv>A</edomv><edomvd>a</edomvd></edom>'
+            '<edom><edomv>B</edomv><edomvd>b</edomvd></edom></attrdomv>'
+            '</attr>' % (i, i, i))
+    parts.append('</detailed></eainfo></metadata>')
+    return "".join(parts)
+#--------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--attributes", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    root = ET.XML(build_document(args.attributes))
+    assert metadata_to_dictionary(root) == \
+           metadata_to_dictionary_recursive(root)
+    for func in (metadata_to_dictionary_recursive, metadata_to_dictionary):
+        best = min(timeit.repeat(lambda: func(root), number=1,
+                                 repeat=args.repeat))
+        print("%-34s %8.4fs" % (func.__name__, best))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Compares the cost of creating Paperwork objects with the metadata export
+deferred (the default) against preload=True.  Runs against fakearcpy, so
+no ArcGIS install is needed.
+
+Usage:
+
+  python benchmarks/bench_lazy.py --datasets 2000 --latency 0.001
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import time
+import argparse
+
+import _setup
+import fakearcpy
+import hermes
+
+DOCUMENT = ("<metadata><Esri><CreaDate>20150101</CreaDate></Esri>"
+            "<dataIdInfo><idPurp>benchmark</idPurp></dataIdInfo></metadata>")
+#--------------------------------------------------------------------------
+def run(count, preload):
+    """creates count Paperwork objects and returns (seconds, tool calls)"""
+    datasets = [r"c:\temp\bench.gdb\table_%d" % i for i in range(count)]
+    for dataset in datasets:
+        fakearcpy.register(dataset, DOCUMENT)
+    fakearcpy.calls.clear()
+    start = time.time()
+    for dataset in datasets:
+        pw = hermes.Paperwork(dataset=dataset, preload=preload)
+        pw.dataset
+        del pw
+    return time.time() - start, dict(fakearcpy.calls)
+#--------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--datasets", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated seconds per arcpy tool call")
+    args = parser.parse_args()
+    for preload in (False, True):
+        fakearcpy.reset(args.latency)
+        seconds, calls = run(args.datasets, preload)
+        print("%-8s %8.3fs  %s" % ("preload" if preload else "lazy",
+                                   seconds, calls))
+
+if __name__ == "__main__":
+    main()
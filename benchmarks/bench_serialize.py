@@ -0,0 +1,62 @@
+"""
+Compares time and peak memory of building the whole xml string with
+dictionary_to_metadata against the chunked write_dictionary serializer,
+writing a converted document of growing size to a file.
+
+Usage:
+
+  python benchmarks/bench_serialize.py --sizes 1m 10m 50m --style fgdc
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import _setup
+from hermes.converters import ET, metadata_to_dictionary, \
+     dictionary_to_metadata, write_dictionary
+import corpus
+
+#--------------------------------------------------------------------------
+def whole_string(d, path):
+    with open(path, 'wb') as writer:
+        writer.write(dictionary_to_metadata(d))
+#--------------------------------------------------------------------------
+def chunked(d, path):
+    with open(path, 'wb') as writer:
+        write_dictionary(d, writer)
+#--------------------------------------------------------------------------
+def measure(func):
+    """returns (seconds, peak MB) of calling func"""
+    tracemalloc.start()
+    start = time.time()
+    func()
+    seconds = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1024.0 / 1024.0
+#--------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", nargs="+", default=["1m", "10m"])
+    parser.add_argument("--style", default="fgdc", choices=corpus.STYLES)
+    args = parser.parse_args()
+    fd, path = tempfile.mkstemp(".xml")
+    os.close(fd)
+    try:
+        for size in args.sizes:
+            d = metadata_to_dictionary(ET.XML(corpus.generate(args.style,
+                                                              size)))
+            for name, func in (("tostring", whole_string),
+                               ("write_dictionary", chunked)):
+                seconds, peak = measure(lambda: func(d, path))
+                print("%-5s %-17s %8.3fs  peak %8.1f MB" % (size, name,
+                                                            seconds, peak))
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares time and peak memory of the whole-tree conversion against the
+streaming iterparse conversion on a large document with an embedded
+thumbnail.
+
+Usage:
+
+  python benchmarks/bench_stream.py --thumbnail-mb 20 --attributes 20000
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import time
+import base64
+import argparse
+import tempfile
+import tracemalloc
+
+import _setup
+from hermes.converters import ET, metadata_to_dictionary, \
+     iterparse_to_dictionary
+from bench_convert import build_document
+
+#--------------------------------------------------------------------------
+def write_document(path, thumbnail_mb, attributes):
+    """writes a document with a base64 thumbnail and many attributes"""
+    body = build_document(attributes)[len("<metadata>"):]
+    data = base64.b64encode(os.urandom(thumbnail_mb * 1024 * 1024 * 3 // 4))
+    with open(path, 'wb') as writer:
+        writer.write(b'<metadata><Binary><Thumbnail><Data EsriPropertyType="PictureX">')
+        writer.write(data)
+        writer.write(b'</Data></Thumbnail></Binary>')
+        writer.write(body.encode('utf-8'))
+#--------------------------------------------------------------------------
+def measure(func):
+    """returns (seconds, peak MB) of calling func"""
+    tracemalloc.start()
+    start = time.time()
+    func()
+    seconds = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1024.0 / 1024.0
+#--------------------------------------------------------------------------
+def whole_tree(path):
+    with open(path, 'rb') as reader:
+        return metadata_to_dictionary(ET.XML(reader.read()))
+#--------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--thumbnail-mb", type=int, default=10)
+    parser.add_argument("--attributes", type=int, default=10000)
+    args = parser.parse_args()
+    fd, path = tempfile.mkstemp(".xml")
+    os.close(fd)
+    try:
+        write_document(path, args.thumbnail_mb, args.attributes)
+        print("document: %.1f MB" % (os.path.getsize(path) / 1024.0 / 1024.0))
+        runs = [
+            ("tree", lambda: whole_tree(path)),
+            ("iterparse", lambda: iterparse_to_dictionary(path)),
+            ("iterparse -Binary", lambda: iterparse_to_dictionary(
+                path, exclude=["metadata/Binary"])),
+        ]
+        for name, func in runs:
+            seconds, peak = measure(func)
+            print("%-18s %8.3fs  peak %8.1f MB" % (name, seconds, peak))
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
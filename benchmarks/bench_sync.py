@@ -0,0 +1,63 @@
+"""
+Compares resyncing many datasets one at a time with setSyncMethod()
+against BulkSync, with a simulated SynchronizeMetadata latency and a
+share of the calls failing once on a schema lock.
+
+Usage:
+
+  python benchmarks/bench_sync.py --datasets 200 --latency 0.05
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import random
+import argparse
+import time
+
+import _setup
+import fakearcpy
+import hermes
+from hermes.sync import BulkSync
+
+#--------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--datasets", type=int, default=200)
+    parser.add_argument("--workspaces", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--locked", type=float, default=0.05,
+                        help="share of the datasets locked on the first try")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=2)
+    args = parser.parse_args()
+    datasets = ["c:/bench/ws%d.sde/fc%d" % (i % args.workspaces, i)
+                for i in range(args.datasets)]
+    for dataset in datasets:
+        fakearcpy.register(dataset, "<metadata />")
+    rng = random.Random(0)
+    locked = set(d for d in datasets if rng.random() < args.locked)
+    sync = fakearcpy.SynchronizeMetadata_conversion
+    def flaky(source, synctype="ALWAYS"):
+        sync(source, synctype)
+        if source in locked:
+            locked.discard(source)
+            raise fakearcpy.ExecuteError("ERROR 000464: Cannot get "
+                                         "exclusive schema lock.")
+    fakearcpy.SynchronizeMetadata_conversion = flaky
+    fakearcpy.latencies["SynchronizeMetadata_conversion"] = args.latency
+    first = set(locked)
+    started = time.time()
+    failed = 0
+    for dataset in datasets:
+        try:
+            hermes.Paperwork(dataset=dataset).setSyncMethod("ALWAYS")
+        except hermes.HermesErrorHandler:
+            failed += 1
+    print("sequential  %7.2fs  %d failed" % (time.time() - started, failed))
+    locked.update(first)
+    report = BulkSync(workers=args.workers, limit=args.limit,
+                      backoff=args.latency).run(datasets)
+    print("bulk        %7.2fs  %d failed, %d retries, %.1f datasets/s" % (
+        report.elapsed, len(report.failed), report.retries, report.rate))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares stamping a standard metadata skeleton by building a dictionary
+per dataset and serializing it with write_dictionary against rendering a
+compiled MetadataTemplate.
+
+Usage:
+
+  python benchmarks/bench_template.py --count 10000
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import io
+import argparse
+import timeit
+
+import _setup
+from hermes.converters import write_dictionary
+from hermes.template import MetadataTemplate
+
+#--------------------------------------------------------------------------
+def skeleton(title, owner, extent):
+    """the standard document a provisioning job stamps on a dataset"""
+    contact = {"rpIndName" : owner, "rpOrgName" : "GIS Office",
+               "rpCntInfo" : {"cntAddress" : {
+                   "delPoint" : "380 New York St", "city" : "Redlands",
+                   "adminArea" : "CA", "postCode" : "92373",
+                   "eMailAdd" : "gis@example.com"},
+                   "cntPhone" : {"voiceNum" : "909-555-0100"}},
+               "role" : {"RoleCd" : {"@value" : "007"}}}
+    return {"metadata" : {
+        "@xml:lang" : "en",
+        "Esri" : {"ArcGISFormat" : "1.0", "SyncOnce" : "TRUE"},
+        "dataIdInfo" : {
+            "idCitation" : {"resTitle" : title},
+            "idPoC" : contact,
+            "idCredit" : owner,
+            "resConst" : [{"Consts" : {"useLimit" : "Internal use only."}},
+                          {"LegConsts" : {"accessConsts" : {
+                              "RestrictCd" : {"@value" : "008"}}}}],
+            "dataExt" : {"exDesc" : extent}},
+        "mdContact" : contact,
+        "distInfo" : {"distributor" : {"distorCont" : contact}}}}
+#--------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+    template = MetadataTemplate(skeleton("${title}", "${owner}",
+                                         "${extent}"))
+    values = [{"title" : "layer_%d" % i, "owner" : "Owner %d" % i,
+               "extent" : "Tile %d" % i} for i in range(args.count)]
+    def build():
+        for v in values:
+            write_dictionary(skeleton(v["title"], v["owner"], v["extent"]),
+                             io.BytesIO())
+    def render():
+        for v in values:
+            template.write(io.BytesIO(), v)
+    for name, func in (("dictionary", build), ("template", render)):
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        print("%-10s %8.3fs  %7.1f us per dataset" % (
+            name, seconds, seconds / args.count * 1e6))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Generates synthetic metadata documents for the benchmarks: ArcGIS
+format (with an Esri section, entity/attribute detail and a base64
+thumbnail), FGDC CSDGM and ISO 19139.  Documents are grown to a target
+size by adding fields (attributes or range dimensions), so the large
+ones have the many-small-elements shape of real catalog metadata rather
+than one huge text node.  Output is deterministic for a given seed.
+
+Usage:
+
+  python benchmarks/corpus.py c:\\temp\\corpus --sizes 2k 1m 50m --count 5
+
+writes c:\\temp\\corpus\\arcgis.gdb\\arcgis_2k_0.xml and so on, a layout
+fakearcpy.load_directory() turns into datasets.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import random
+import base64
+import argparse
+from collections import OrderedDict
+
+STYLES = ("arcgis", "fgdc", "iso")
+SIZES = OrderedDict([("2k", 2 * 1024), ("64k", 64 * 1024),
+                     ("1m", 1024 * 1024), ("10m", 10 * 1024 * 1024),
+                     ("50m", 50 * 1024 * 1024)])
+WORDS = ("parcel", "boundary", "county", "survey", "road", "centerline",
+         "hydrography", "elevation", "zoning", "census", "tract", "utility",
+         "water", "sewer", "address", "point", "polygon", "line", "state",
+         "federal", "annual", "update", "source", "derived", "public")
+#--------------------------------------------------------------------------
+def parse_size(value):
+    """returns the bytes of a size such as 2k, 64k, 1m or 50m"""
+    value = str(value).lower()
+    if value in SIZES:
+        return SIZES[value]
+    units = {"k" : 1024, "m" : 1024 * 1024}
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+#--------------------------------------------------------------------------
+def _text(rng, count):
+    return " ".join(rng.choice(WORDS) for i in range(count))
+########################################################################
+class _Style(object):
+    """the fixed head and tail of a document and its repeated field"""
+    #----------------------------------------------------------------------
+    def __init__(self, rng, name):
+        self.rng = rng
+        self.name = name
+    #----------------------------------------------------------------------
+    def field(self, i):
+        raise NotImplementedError()
+########################################################################
+class _ArcGIS(_Style):
+    #----------------------------------------------------------------------
+    def head(self):
+        rng = self.rng
+        keywords = "".join("<keyword>%s</keyword>" % rng.choice(WORDS)
+                           for i in range(8))
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<metadata xml:lang="en">'
+            '<Esri><CreaDate>20150101</CreaDate><CreaTime>08000000</CreaTime>'
+            '<ArcGISFormat>1.0</ArcGISFormat><SyncOnce>TRUE</SyncOnce>'
+            '<ModDate>20150615</ModDate><ModTime>12000000</ModTime>'
+            '<DataProperties><itemProps><itemName Sync="TRUE">%(name)s'
+            '</itemName><imsContentType Sync="TRUE">002</imsContentType>'
+            '</itemProps></DataProperties></Esri>'
+            '<dataIdInfo><idCitation><resTitle Sync="TRUE">%(name)s</resTitle>'
+            '<date><createDate>2015-01-01T00:00:00</createDate></date>'
+            '</idCitation><idAbs>%(abstract)s</idAbs><idPurp>%(purpose)s'
+            '</idPurp><searchKeys>%(keywords)s</searchKeys>'
+            '<dataExt><geoEle><GeoBndBox esriExtentType="search">'
+            '<exTypeCode Sync="TRUE">1</exTypeCode>'
+            '<westBL Sync="TRUE">-124.7</westBL><eastBL Sync="TRUE">-66.9'
+            '</eastBL><northBL Sync="TRUE">49.3</northBL>'
+            '<southBL Sync="TRUE">24.5</southBL></GeoBndBox></geoEle>'
+            '</dataExt><resConst><Consts><useLimit>%(limit)s</useLimit>'
+            '</Consts></resConst></dataIdInfo>'
+            '<mdContact><rpOrgName>GIS Office</rpOrgName><role>'
+            '<RoleCd value="007"/></role></mdContact>'
+            '<refSysInfo><RefSystem><refSysID><identCode code="4326" '
+            'Sync="TRUE"/><idCodeSpace Sync="TRUE">EPSG</idCodeSpace>'
+            '</refSysID></RefSystem></refSysInfo>'
+            '<eainfo><detailed Name="%(name)s"><enttyp><enttypl Sync="TRUE">'
+            '%(name)s</enttypl><enttypt Sync="TRUE">Feature Class</enttypt>'
+            '</enttyp>' % {"name" : self.name, "abstract" : _text(rng, 40),
+                           "purpose" : _text(rng, 12),
+                           "keywords" : keywords, "limit" : _text(rng, 6)})
+    #----------------------------------------------------------------------
+    def field(self, i):
+        return (
+            '<attr><attrlabl Sync="TRUE">FIELD_%d</attrlabl>'
+            '<attalias Sync="TRUE">Field %d</attalias>'
+            '<attrtype Sync="TRUE">String</attrtype>'
+            '<attwidth Sync="TRUE">50</attwidth>'
+            '<atprecis Sync="TRUE">0</atprecis>'
+            '<attscale Sync="TRUE">0</attscale>'
+            '<attrdef>%s</attrdef><attrdefs>Producer defined</attrdefs>'
+            '</attr>' % (i, i, _text(self.rng, 6)))
+    #----------------------------------------------------------------------
+    def tail(self, thumbnail):
+        return ('</detailed></eainfo>'
+                '<mdDateSt Sync="TRUE">20150615</mdDateSt>'
+                '<Binary><Thumbnail><Data EsriPropertyType="PictureX">%s'
+                '</Data></Thumbnail></Binary></metadata>' % thumbnail)
+########################################################################
+class _FGDC(_Style):
+    #----------------------------------------------------------------------
+    def head(self):
+        rng = self.rng
+        keywords = "".join("<themekey>%s</themekey>" % rng.choice(WORDS)
+                           for i in range(8))
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<metadata><idinfo><citation><citeinfo><origin>GIS Office'
+            '</origin><pubdate>20150101</pubdate><title>%(name)s</title>'
+            '<geoform>vector digital data</geoform></citeinfo></citation>'
+            '<descript><abstract>%(abstract)s</abstract><purpose>%(purpose)s'
+            '</purpose></descript><timeperd><timeinfo><sngdate><caldate>'
+            '20150101</caldate></sngdate></timeinfo><current>publication date'
+            '</current></timeperd><status><progress>Complete</progress>'
+            '<update>Annually</update></status><spdom><bounding><westbc>'
+            '-124.7</westbc><eastbc>-66.9</eastbc><northbc>49.3</northbc>'
+            '<southbc>24.5</southbc></bounding></spdom><keywords><theme>'
+            '<themekt>None</themekt>%(keywords)s</theme></keywords>'
+            '<accconst>None</accconst><useconst>%(limit)s</useconst></idinfo>'
+            '<spref><horizsys><geograph><latres>0.000001</latres><longres>'
+            '0.000001</longres><geogunit>Decimal degrees</geogunit>'
+            '</geograph></horizsys></spref>'
+            '<eainfo><detailed><enttyp><enttypl>%(name)s</enttypl><enttypd>'
+            'Feature Class</enttypd><enttypds>Producer defined</enttypds>'
+            '</enttyp>' % {"name" : self.name, "abstract" : _text(rng, 40),
+                           "purpose" : _text(rng, 12),
+                           "keywords" : keywords, "limit" : _text(rng, 6)})
+    #----------------------------------------------------------------------
+    def field(self, i):
+        return (
+            '<attr><attrlabl>FIELD_%d</attrlabl><attrdef>%s</attrdef>'
+            '<attrdefs>Producer defined</attrdefs><attrdomv><edom><edomv>A'
+            '</edomv><edomvd>%s</edomvd><edomvds>Producer defined</edomvds>'
+            '</edom></attrdomv></attr>' % (i, _text(self.rng, 6),
+                                           _text(self.rng, 3)))
+    #----------------------------------------------------------------------
+    def tail(self, thumbnail):
+        return ('</detailed></eainfo><distinfo><distrib><cntinfo><cntorgp>'
+                '<cntorg>GIS Office</cntorg></cntorgp></cntinfo></distrib>'
+                '</distinfo><metainfo><metd>20150615</metd>'
+                '<metstdn>FGDC Content Standard for Digital Geospatial '
+                'Metadata</metstdn><metstdv>FGDC-STD-001-1998</metstdv>'
+                '</metainfo></metadata>')
+########################################################################
+class _ISO(_Style):
+    #----------------------------------------------------------------------
+    def head(self):
+        rng = self.rng
+        keywords = "".join(
+            "<gmd:keyword><gco:CharacterString>%s</gco:CharacterString>"
+            "</gmd:keyword>" % rng.choice(WORDS) for i in range(8))
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<gmd:MD_Metadata xmlns:gmd="http://www.isotc211.org/2005/gmd" '
+            'xmlns:gco="http://www.isotc211.org/2005/gco">'
+            '<gmd:fileIdentifier><gco:CharacterString>%(id)s'
+            '</gco:CharacterString></gmd:fileIdentifier>'
+            '<gmd:language><gco:CharacterString>eng</gco:CharacterString>'
+            '</gmd:language><gmd:contact><gmd:CI_ResponsibleParty>'
+            '<gmd:organisationName><gco:CharacterString>GIS Office'
+            '</gco:CharacterString></gmd:organisationName><gmd:role>'
+            '<gmd:CI_RoleCode codeList="http://www.isotc211.org/2005/'
+            'resources/codeList.xml#CI_RoleCode" codeListValue='
+            '"pointOfContact">pointOfContact</gmd:CI_RoleCode></gmd:role>'
+            '</gmd:CI_ResponsibleParty></gmd:contact><gmd:dateStamp>'
+            '<gco:Date>2015-06-15</gco:Date></gmd:dateStamp>'
+            '<gmd:identificationInfo><gmd:MD_DataIdentification>'
+            '<gmd:citation><gmd:CI_Citation><gmd:title><gco:CharacterString>'
+            '%(name)s</gco:CharacterString></gmd:title></gmd:CI_Citation>'
+            '</gmd:citation><gmd:abstract><gco:CharacterString>%(abstract)s'
+            '</gco:CharacterString></gmd:abstract><gmd:descriptiveKeywords>'
+            '<gmd:MD_Keywords>%(keywords)s</gmd:MD_Keywords>'
+            '</gmd:descriptiveKeywords></gmd:MD_DataIdentification>'
+            '</gmd:identificationInfo><gmd:contentInfo>'
+            '<gmd:MD_CoverageDescription>' %
+            {"id" : "%032x" % rng.getrandbits(128), "name" : self.name,
+             "abstract" : _text(rng, 40), "keywords" : keywords})
+    #----------------------------------------------------------------------
+    def field(self, i):
+        return (
+            '<gmd:dimension><gmd:MD_RangeDimension><gmd:sequenceIdentifier>'
+            '<gco:MemberName><gco:aName><gco:CharacterString>FIELD_%d'
+            '</gco:CharacterString></gco:aName><gco:attributeType>'
+            '<gco:TypeName><gco:aName><gco:CharacterString>String'
+            '</gco:CharacterString></gco:aName></gco:TypeName>'
+            '</gco:attributeType></gco:MemberName></gmd:sequenceIdentifier>'
+            '<gmd:descriptor><gco:CharacterString>%s</gco:CharacterString>'
+            '</gmd:descriptor></gmd:MD_RangeDimension></gmd:dimension>' %
+            (i, _text(self.rng, 6)))
+    #----------------------------------------------------------------------
+    def tail(self, thumbnail):
+        return ('</gmd:MD_CoverageDescription></gmd:contentInfo>'
+                '</gmd:MD_Metadata>')
+
+_STYLES = {"arcgis" : _ArcGIS, "fgdc" : _FGDC, "iso" : _ISO}
+#--------------------------------------------------------------------------
+def generate(style="arcgis", size=64 * 1024, seed=0, name="dataset",
+             thumbnail_share=0.25):
+    """
+    returns a metadata document of about size bytes as utf-8 bytes.
+
+    Inputs:
+       style - "arcgis", "fgdc" or "iso".
+       size - target size in bytes, or a string such as "1m".
+       seed - seed of the random text.
+       name - dataset name written into the title and entity.
+       thumbnail_share - part of an ArcGIS document taken by the base64
+        thumbnail.
+    """
+    size = parse_size(size)
+    rng = random.Random(seed)
+    writer = _STYLES[style](rng, name)
+    head = writer.head()
+    thumbnail = ""
+    if style == "arcgis":
+        raw = int(size * thumbnail_share) * 3 // 4
+        raw -= raw % 3
+        block = bytes(bytearray(rng.getrandbits(8) for i in range(3072)))
+        thumbnail = base64.b64encode(
+            (block * (raw // len(block) + 1))[:raw]).decode('ascii')
+    tail = writer.tail(thumbnail)
+    parts = [head]
+    total = len(head) + len(tail)
+    i = 0
+    while True:
+        field = writer.field(i)
+        if total + len(field) > size and i:
+            break
+        parts.append(field)
+        total += len(field)
+        i += 1
+    parts.append(tail)
+    return "".join(parts).encode('utf-8')
+#--------------------------------------------------------------------------
+def write_corpus(folder, styles=STYLES, sizes=("2k", "64k", "1m"), count=1,
+                 seed=0):
+    """
+    writes count documents per style and size to
+    folder/<style>.gdb/<style>_<size>_<n>.xml and returns their paths.
+    """
+    paths = []
+    for style in styles:
+        workspace = os.path.join(folder, style + ".gdb")
+        if not os.path.isdir(workspace):
+            os.makedirs(workspace)
+        for size in sizes:
+            for n in range(count):
+                name = "%s_%s_%d" % (style, size, n)
+                path = os.path.join(workspace, name + ".xml")
+                with open(path, 'wb') as writer:
+                    writer.write(generate(style, size, seed + n, name))
+                paths.append(path)
+    return paths
+#--------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("folder")
+    parser.add_argument("--styles", nargs="+", default=list(STYLES),
+                        choices=STYLES)
+    parser.add_argument("--sizes", nargs="+", default=["2k", "64k", "1m"])
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for path in write_corpus(args.folder, args.styles, args.sizes,
+                             args.count, args.seed):
+        print("%10d  %s" % (os.path.getsize(path), path))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+An in-process stand-in for the parts of arcpy that hermes uses.  It lets
+the benchmarks (and the tests) run on machines without ArcGIS.
+
+Datasets are registered with an XML document, or loaded from a folder
+of XML files where every file is a dataset; exporting a dataset's
+metadata writes that document out, importing an XML file replaces it.
+Every tool call can be slowed down with a simulated latency, for all
+tools or per tool, so the cost of geoprocessing round-trips shows up in
+the timings.
+
+Usage:
+
+  >>> import sys, fakearcpy
+  >>> sys.modules['arcpy'] = fakearcpy
+  >>> fakearcpy.register(r"c:\\temp\\scratch.gdb\\states", "<metadata />")
+  >>> fakearcpy.load_directory("corpus")  # corpus/bench.gdb/roads.xml ...
+  >>> fakearcpy.latencies["MetadataImporter_conversion"] = 0.05
+  >>> import hermes
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import time
+import shutil
+
+latency = 0.0
+latencies = {}
+calls = {}
+_datasets = {}
+_files = {}
+#--------------------------------------------------------------------------
+def _tool(name):
+    """counts a tool call and sleeps for the simulated latency"""
+    calls[name] = calls.get(name, 0) + 1
+    delay = latencies.get(name, latency)
+    if delay:
+        time.sleep(delay)
+#--------------------------------------------------------------------------
+def reset(delay=0.0):
+    """forgets all datasets, call counts and per tool latencies"""
+    global latency
+    latency = delay
+    latencies.clear()
+    calls.clear()
+    _datasets.clear()
+    _files.clear()
+#--------------------------------------------------------------------------
+def register(dataset, xml):
+    """registers a dataset with its metadata document (str or bytes)"""
+    if not isinstance(xml, bytes):
+        xml = xml.encode('utf-8')
+    _files.pop(dataset, None)
+    _datasets[dataset] = xml
+#--------------------------------------------------------------------------
+def load_directory(folder):
+    """
+    registers every .xml file below folder as a dataset named after the
+    file without its extension, e.g. folder/bench.gdb/roads.xml becomes
+    folder/bench.gdb/roads.  The files are read on export and replaced
+    on import.  Returns the sorted dataset paths.
+    """
+    datasets = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for name in filenames:
+            if name.lower().endswith(".xml"):
+                path = os.path.join(dirpath, name)
+                dataset = os.path.splitext(path)[0]
+                _datasets.pop(dataset, None)
+                _files[dataset] = path
+                datasets.append(dataset)
+    return sorted(datasets)
+#--------------------------------------------------------------------------
+def _exists(dataset):
+    return dataset in _datasets or dataset in _files
+#--------------------------------------------------------------------------
+def _all():
+    return list(_datasets) + list(_files)
+#--------------------------------------------------------------------------
+def metadata(dataset):
+    """returns the metadata bytes currently stored for a dataset"""
+    if dataset in _files:
+        with open(_files[dataset], 'rb') as reader:
+            return reader.read()
+    return _datasets[dataset]
+#--------------------------------------------------------------------------
+def Exists(dataset):
+    _tool("Exists")
+    return _exists(dataset)
+#--------------------------------------------------------------------------
+def MetadataImporter_conversion(source, target):
+    _tool("MetadataImporter_conversion")
+    if source in _files:
+        shutil.copyfile(_files[source], target)
+    elif source in _datasets:
+        with open(target, 'wb') as writer:
+            writer.write(_datasets[source])
+    elif target in _files and os.path.isfile(source):
+        shutil.copyfile(source, _files[target])
+    elif target in _datasets and os.path.isfile(source):
+        with open(source, 'rb') as reader:
+            _datasets[target] = reader.read()
+    else:
+        raise ExecuteError("ERROR 000732: Source Metadata: "
+                           "Dataset %s does not exist" % source)
+#--------------------------------------------------------------------------
+def SynchronizeMetadata_conversion(source, synctype="ALWAYS"):
+    _tool("SynchronizeMetadata_conversion")
+    if not _exists(source):
+        raise ExecuteError("ERROR 000732: Source Metadata: "
+                           "Dataset %s does not exist" % source)
+#--------------------------------------------------------------------------
+def _split(path):
+    """splits a path on its last separator, either / or \\"""
+    index = max(path.rfind("/"), path.rfind("\\"))
+    return path[:index], path[index + 1:]
+########################################################################
+class _Describe(object):
+    """the Describe object of a dataset or workspace"""
+    pass
+#--------------------------------------------------------------------------
+def Describe(value):
+    _tool("Describe")
+    desc = _Describe()
+    desc.catalogPath = value
+    desc.path, desc.name = _split(value)
+    if _exists(value):
+        desc.dataType = "FeatureClass"
+        desc.datasetType = "FeatureClass"
+        desc.aliasName = desc.name
+        return desc
+    prefix = value.rstrip("\\/")
+    if not any(d.startswith(prefix) and d[len(prefix):len(prefix) + 1] in
+               ("/", "\\") for d in _all()):
+        raise IOError('"%s" does not exist' % value)
+    extension = os.path.splitext(prefix)[1].lower()
+    if extension in (".gdb", ".mdb", ".sde"):
+        desc.dataType = "Workspace"
+        desc.workspaceType = "RemoteDatabase" if extension == ".sde" \
+                             else "LocalDatabase"
+        desc.workspaceFactoryProgID = {
+            ".gdb" : "esriDataSourcesGDB.FileGDBWorkspaceFactory.1",
+            ".mdb" : "esriDataSourcesGDB.AccessWorkspaceFactory.1",
+            ".sde" : "esriDataSourcesGDB.SdeWorkspaceFactory.1"}[extension]
+        desc.connectionString = "DATABASE=" + prefix
+    elif os.path.splitext(_split(prefix)[0])[1].lower() in \
+         (".gdb", ".mdb", ".sde"):
+        desc.dataType = "FeatureDataset"
+    else:
+        desc.dataType = "Folder"
+    return desc
+#--------------------------------------------------------------------------
+def ParseTableName(name, workspace=None):
+    _tool("ParseTableName")
+    parts = name.split(".")
+    if workspace and workspace.lower().endswith(".sde") and len(parts) == 3:
+        return ", ".join(parts)
+    if workspace and workspace.lower().endswith(".sde") and len(parts) == 2:
+        return "(null), %s, %s" % tuple(parts)
+    return "(null), (null), %s" % parts[-1]
+#--------------------------------------------------------------------------
+def GetMessages(severity=0):
+    return ""
+########################################################################
+class da(object):
+    """the arcpy.da module"""
+    #----------------------------------------------------------------------
+    @staticmethod
+    def Walk(top, datatype=None):
+        """walks the registered datasets below top"""
+        folders = {}
+        prefix = top.rstrip("\\/")
+        for dataset in sorted(_all()):
+            folder, name = os.path.split(dataset)
+            if folder == prefix or folder.startswith(prefix + os.sep):
+                folders.setdefault(folder, []).append(name)
+        for folder in sorted(folders):
+            yield folder, [], folders[folder]
+########################################################################
+class ExecuteError(Exception):
+    """raised by the fake geoprocessing tools"""
+    pass
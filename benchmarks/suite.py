@@ -0,0 +1,232 @@
+"""
+Runs the hermes benchmark suite against fakearcpy and a generated corpus
+and records the time and peak memory of every scenario, so releases can
+be compared.  No ArcGIS install is needed.
+
+Scenarios, per corpus style and size:
+
+  convert - Paperwork.convert()
+  convert-stream - Paperwork.convert(stream=True)
+  save - convert, change the title and save() the dictionary
+  view-save - change the title through view() and save()
+  export - Paperwork.exportToXML()
+  export-direct - Paperwork.exportToXML(direct=True)
+
+and over all documents of the smallest size:
+
+  batch-convert - PaperworkCollection.convert_all()
+  batch-export - PaperworkCollection.export_all()
+  batch-export-direct - PaperworkCollection.export_direct_all()
+  hold-dict - keeps the convert() dictionaries of all documents
+  hold-compact - keeps the compact() MetadataNode trees of all documents
+  hold-payloads - keeps convert(payloads=True) dictionaries of all
+    documents, with the thumbnails left in the exported documents
+
+Every scenario reports its peak memory; the hold scenarios also report
+the memory still used by the metadata they keep (retained MB).
+
+Results are written to benchmarks/results/<version>.json; --compare
+prints the change against an earlier results file.
+
+Usage:
+
+  python benchmarks/suite.py --sizes 2k 64k 1m 10m --latency 0.002
+  python benchmarks/suite.py --compare benchmarks/results/1.1.1.json
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import gc
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import timeit
+
+import _setup
+import fakearcpy
+import hermes
+import corpus
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+TITLES = {"arcgis" : "dataIdInfo/idCitation/resTitle",
+          "fgdc" : "idinfo/citation/citeinfo/title",
+          "iso" : None}
+#--------------------------------------------------------------------------
+def measure(func, repeat):
+    """
+    returns (best seconds, peak MB, retained MB) of calling func, where
+    retained is the memory still held by its return value
+    """
+    gc.collect()
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    peak = retained = None
+    if tracemalloc is not None:
+        gc.collect()
+        tracemalloc.start()
+        result = func()
+        gc.collect()
+        retained, peak = [b / 1024.0 / 1024.0 for b in
+                          tracemalloc.get_traced_memory()]
+        tracemalloc.stop()
+        del result
+    return seconds, peak, retained
+#--------------------------------------------------------------------------
+def _retitle(d, style, n=[0]):
+    """changes the title in a converted dictionary"""
+    n[0] += 1
+    node = d[list(d)[0]]
+    path = TITLES[style]
+    if path is None:
+        node["benchmark"] = str(n[0])
+        return d
+    parts = path.split("/")
+    for part in parts[:-1]:
+        node = node[part]
+    value = node[parts[-1]]
+    if isinstance(value, dict):
+        value["#text"] = str(n[0])
+    else:
+        node[parts[-1]] = str(n[0])
+    return d
+#--------------------------------------------------------------------------
+def _view_retitle(dataset, style, n=[0]):
+    n[0] += 1
+    pw = hermes.Paperwork(dataset=dataset)
+    path = TITLES[style] or "benchmark"
+    pw.set(path + ("/#text" if TITLES[style] else ""), str(n[0]))
+    return pw.save()
+#--------------------------------------------------------------------------
+def scenarios(datasets, styles, sizes, out):
+    """yields (name, style, size, count, func) for every scenario"""
+    for style in styles:
+        for size in sizes:
+            matching = [d for d in datasets if
+                        os.path.basename(d).startswith("%s_%s_" % (style, size))]
+            if not matching:
+                continue
+            dataset = matching[0]
+            P = hermes.Paperwork
+            yield ("convert", style, size, 1,
+                   lambda: P(dataset=dataset).convert())
+            yield ("convert-stream", style, size, 1,
+                   lambda: P(dataset=dataset).convert(stream=True))
+            yield ("save", style, size, 1,
+                   lambda: P(dataset=dataset).save(
+                       _retitle(P(dataset=dataset).convert(), style)))
+            yield ("view-save", style, size, 1,
+                   lambda: _view_retitle(dataset, style))
+            yield ("export", style, size, 1,
+                   lambda: P(dataset=dataset).exportToXML(out, "export"))
+            yield ("export-direct", style, size, 1,
+                   lambda: P(dataset=dataset).exportToXML(out, "export",
+                                                          direct=True))
+    smallest = [d for d in datasets if "_%s_" % sizes[0] in
+                os.path.basename(d)]
+    collection = lambda: hermes.PaperworkCollection(smallest, workers=4)
+    yield ("batch-convert", "all", sizes[0], len(smallest),
+           lambda: list(collection().convert_all()))
+    yield ("batch-export", "all", sizes[0], len(smallest),
+           lambda: list(collection().export_all(out)))
+    yield ("batch-export-direct", "all", sizes[0], len(smallest),
+           lambda: list(collection().export_direct_all(out)))
+    everything = [d for d in datasets if os.path.getsize(d + ".xml") <=
+                  corpus.parse_size("1m")]
+    yield ("hold-dict", "all", "<=1m", len(everything),
+           lambda: [hermes.Paperwork(dataset=d).convert() for d in everything])
+    yield ("hold-compact", "all", "<=1m", len(everything),
+           lambda: [hermes.Paperwork(dataset=d).compact() for d in everything])
+    yield ("hold-payloads", "all", "<=1m", len(everything),
+           lambda: [hermes.Paperwork(dataset=d).convert(payloads=True)
+                    for d in everything])
+#--------------------------------------------------------------------------
+def compare(results, baseline):
+    """prints the change of every scenario against a baseline run"""
+    old = dict(((r["name"], r["style"], r["size"]), r)
+               for r in baseline["results"])
+    print("\nagainst %s:" % baseline["version"])
+    for r in results["results"]:
+        before = old.get((r["name"], r["style"], r["size"]))
+        if before is None:
+            continue
+        line = "%-15s %-7s %-5s time %+7.1f%%" % (
+            r["name"], r["style"], r["size"],
+            (r["seconds"] / before["seconds"] - 1) * 100)
+        if r["peak_mb"] and before.get("peak_mb"):
+            line += "  peak %+7.1f%%" % ((r["peak_mb"] / before["peak_mb"]
+                                         - 1) * 100)
+        if r.get("retained_mb") and before.get("retained_mb"):
+            line += "  retained %+7.1f%%" % (
+                (r["retained_mb"] / before["retained_mb"] - 1) * 100)
+        print(line)
+#--------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--styles", nargs="+", default=list(corpus.STYLES),
+                        choices=corpus.STYLES)
+    parser.add_argument("--sizes", nargs="+", default=["2k", "64k", "1m"])
+    parser.add_argument("--count", type=int, default=20,
+                        help="documents per style and size (batch runs)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated seconds per arcpy tool call")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None,
+                        help="results file, default results/<version>.json")
+    parser.add_argument("--compare", default=None,
+                        help="results file of an earlier run")
+    args = parser.parse_args()
+    folder = tempfile.mkdtemp(prefix="hermes-bench-")
+    try:
+        fakearcpy.reset(args.latency)
+        counts = dict((size, args.count if corpus.parse_size(size) <= 1048576
+                       else 1) for size in args.sizes)
+        for size in args.sizes:
+            corpus.write_corpus(os.path.join(folder, "corpus"), args.styles,
+                                [size], counts[size])
+        datasets = fakearcpy.load_directory(os.path.join(folder, "corpus"))
+        out = os.path.join(folder, "out")
+        os.makedirs(out)
+        results = {"version" : hermes.__version__,
+                   "python" : platform.python_version(),
+                   "platform" : platform.platform(),
+                   "date" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "latency" : args.latency,
+                   "results" : []}
+        print("%-15s %-7s %-5s %6s %10s %10s %12s" % (
+            "scenario", "style", "size", "docs", "seconds", "peak MB",
+            "retained MB"))
+        for name, style, size, count, func in scenarios(
+                datasets, args.styles, args.sizes, out):
+            seconds, peak, retained = measure(func, args.repeat)
+            if not name.startswith("hold-"):
+                retained = None
+            results["results"].append({"name" : name, "style" : style,
+                                       "size" : size, "count" : count,
+                                       "seconds" : seconds,
+                                       "peak_mb" : peak,
+                                       "retained_mb" : retained})
+            print("%-15s %-7s %-5s %6d %10.4f %10s %12s" % (
+                name, style, size, count, seconds,
+                "%.1f" % peak if peak is not None else "-",
+                "%.1f" % retained if retained is not None else "-"))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    output = args.output or os.path.join(_setup.HERE, "results",
+                                                hermes.__version__ + ".json")
+    if not os.path.isdir(os.path.dirname(os.path.abspath(output))):
+        os.makedirs(os.path.dirname(os.path.abspath(output)))
+    with open(output, 'w') as writer:
+        json.dump(results, writer, indent=2, sort_keys=True)
+    print("\nresults written to %s" % output)
+    if args.compare:
+        with open(args.compare) as reader:
+            compare(results, json.load(reader))
+
+if __name__ == "__main__":
+    main()
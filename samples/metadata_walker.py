@@ -17,7 +17,10 @@ def listKeyValues(d, path=""):
         if isinstance(v, dict):
             listKeyValues(v, path)
 if __name__ == "__main__":
-    arcpy.env.workspace = r"c:\temp\scratch.gdb"
-    for fc in arcpy.ListFeatureClasses():
-        data = hermes.Paperwork(dataset=os.path.join(arcpy.env.workspace, fc)).convert()
-        listKeyValues(data)
\ No newline at end of file
+    collection = hermes.PaperworkCollection(workspace=r"c:\temp\scratch.gdb",
+                                            workers=4)
+    for result in collection.convert_all():
+        if result.ok:
+            listKeyValues(result.value)
+        else:
+            print "Failed - %s - %s" % (result.dataset, result.error)
\ No newline at end of file
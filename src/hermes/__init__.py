@@ -12,6 +12,23 @@ limitations under the License.
 """
 from __future__ import absolute_import
 from __future__ import print_function
+import sys
 from .common import HermesErrorHandler, trace
 from .paperwork import Paperwork
+from .view import MetadataView
+from .compact import MetadataNode
+from .payload import BinaryPayload
+from .collection import PaperworkCollection
+from .index import MetadataIndex
+from .archive import MetadataArchive
+from .patch import MetadataPatch
+from .diff import MetadataDiff
+from .template import MetadataTemplate
+from .sync import BulkSync
+from .describe import DescribeCache
+from .export import JsonLinesExporter
+from .manifest import Manifest
+from . import stats
 from .version import __version__
+if sys.version_info >= (3, 5):
+    from .aio import AsyncPaperwork, WorkspaceLimiter
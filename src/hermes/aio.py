@@ -0,0 +1,160 @@
+"""
+An asyncio facade over Paperwork.  The arcpy calls and file work run in
+an executor, so they do not block the event loop, and a WorkspaceLimiter
+caps how many of them run against one workspace at a time, so a service
+can accept hundreds of metadata requests without flooding a single
+enterprise geodatabase.
+
+arcpy geoprocessing tools are not thread safe, so by default every call
+runs on one shared worker thread, one at a time.  Pass an executor with
+more threads to AsyncPaperwork to run calls concurrently where that is
+known to be safe.
+
+Requires Python 3.5 or later.
+
+Usage Example:
+
+  >>> async def titles(datasets):
+  ...     async def title(dataset):
+  ...         async with AsyncPaperwork(dataset) as pw:
+  ...             d = await pw.aconvert()
+  ...             return d['metadata']['dataIdInfo']['idCitation']['resTitle']
+  ...     return await asyncio.gather(*(title(d) for d in datasets))
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from .common import workspace_path, workspace_key
+from .paperwork import Paperwork
+
+_get_loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)
+########################################################################
+class WorkspaceLimiter(object):
+    """
+    Per-workspace semaphores limiting how many operations run against
+    each workspace at once.
+
+    Inputs:
+       limit - optional - concurrent operations allowed per workspace.
+       limits - optional - dictionary of workspace path to its own limit,
+        e.g. {r"c:\\connections\\prod.sde" : 2}.  Keys are matched to the
+        workspace of each dataset, see workspace_key().  Limits below 1
+        are raised to 1.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, limit=4, limits=None):
+        """Constructor"""
+        self.limit = max(1, int(limit))
+        self.limits = dict((workspace_key(workspace), max(1, int(value)))
+                           for workspace, value in (limits or {}).items())
+        self._semaphores = weakref.WeakKeyDictionary()
+    #----------------------------------------------------------------------
+    def slot(self, dataset):
+        """
+        returns the semaphore of the dataset's workspace, to be used as
+        'async with limiter.slot(dataset):'.  Semaphores are kept per
+        event loop.
+        """
+        semaphores = self._semaphores.setdefault(_get_loop(), {})
+        workspace = workspace_path(dataset)
+        semaphore = semaphores.get(workspace)
+        if semaphore is None:
+            semaphore = semaphores[workspace] = asyncio.Semaphore(
+                self.limits.get(os.path.normcase(workspace), self.limit))
+        return semaphore
+
+default_limiter = WorkspaceLimiter()
+default_executor = ThreadPoolExecutor(max_workers=1)
+########################################################################
+class AsyncPaperwork(object):
+    """
+    Awaitable versions of the Paperwork operations for one dataset.
+
+    Calls on one AsyncPaperwork object run one at a time, in the order
+    they were awaited; calls on different objects run concurrently up to
+    the limiter's per-workspace limit.
+
+    Inputs:
+       dataset - path of the dataset.
+       limiter - optional - WorkspaceLimiter, defaults to a limiter
+        shared by every AsyncPaperwork that does not pass its own.
+       executor - optional - concurrent.futures thread pool executor the
+        blocking calls run in, defaults to default_executor, a single
+        thread shared by every AsyncPaperwork that does not pass its
+        own.  arcpy is not thread safe: an executor with more threads
+        runs arcpy calls concurrently, so only pass one where that is
+        known to be safe.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, dataset, limiter=None, executor=None):
+        """Constructor"""
+        self.dataset = dataset
+        self.limiter = limiter or default_limiter
+        self.executor = executor or default_executor
+        self._paperwork = None
+        self._lock = None
+    #----------------------------------------------------------------------
+    async def __aenter__(self):
+        return self
+    #----------------------------------------------------------------------
+    async def __aexit__(self, exc_type, exc_value, tb):
+        await self.aclose()
+    #----------------------------------------------------------------------
+    def _get_paperwork(self):
+        """returns the wrapped Paperwork, creating it on first use"""
+        if self._paperwork is None:
+            self._paperwork = Paperwork(dataset=self.dataset)
+        return self._paperwork
+    #----------------------------------------------------------------------
+    async def _call(self, function):
+        """runs function(paperwork) in the executor within the limits"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        run = lambda: function(self._get_paperwork())
+        async with self._lock:
+            async with self.limiter.slot(self.dataset):
+                return await _get_loop().run_in_executor(self.executor, run)
+    #----------------------------------------------------------------------
+    async def aconvert(self, stream=False, exclude=None):
+        """awaitable Paperwork.convert()"""
+        return await self._call(
+            lambda pw: pw.convert(stream=stream, exclude=exclude))
+    #----------------------------------------------------------------------
+    async def asave(self, d=None, force=False):
+        """awaitable Paperwork.save()"""
+        return await self._call(lambda pw: pw.save(d=d, force=force))
+    #----------------------------------------------------------------------
+    async def aexport_to_xml(self, outFolder=None, outName=None,
+                             direct=False, method="auto"):
+        """awaitable Paperwork.exportToXML()"""
+        return await self._call(
+            lambda pw: pw.exportToXML(outFolder, outName, direct=direct,
+                                      method=method))
+    #----------------------------------------------------------------------
+    async def aproperties(self):
+        """awaitable Paperwork.datasetProperties"""
+        return await self._call(lambda pw: pw.datasetProperties)
+    #----------------------------------------------------------------------
+    async def afingerprint(self, canonical=False, exclude=None):
+        """awaitable Paperwork.fingerprint()"""
+        return await self._call(
+            lambda pw: pw.fingerprint(canonical=canonical, exclude=exclude))
+    #----------------------------------------------------------------------
+    async def aclose(self):
+        """closes the wrapped Paperwork and removes its scratch files"""
+        if self._paperwork is not None:
+            paperwork, self._paperwork = self._paperwork, None
+            await _get_loop().run_in_executor(self.executor, paperwork.close)
@@ -0,0 +1,449 @@
+"""
+A deduplicated archive of metadata snapshots.  Instead of a full xml
+copy per dataset per run, every document is cut into subtree chunks
+that are stored once in a local SQLite file under the sha1 of their
+content; a chunk refers to the chunks of its large children by hash.
+Sections that did not change since the last snapshot, and blocks that
+many datasets share such as contacts and constraints, cost one manifest
+row instead of another copy.
+
+Each snapshot keeps a manifest of dataset to root chunk, so the xml of
+any dataset can be rebuilt at any snapshot, and chunks no manifest
+reaches any more are removed by prune().
+
+Usage Example:
+
+  >>> archive = MetadataArchive(r"c:\\archive\\metadata.sqlite")
+  >>> archive.snapshot(PaperworkCollection(workspace=gdb), label="2015-06-01")
+  >>> archive.rebuild(r"c:\\data\\city.gdb\\parcels", snapshot="2015-06-01")
+  >>> Paperwork(dataset=fc).importSnapshot(archive, "2015-06-01")
+  >>> archive.prune(keep=12)
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import io
+import re
+import time
+import zlib
+import sqlite3
+import hashlib
+import binascii
+from .common import *
+from .converters import ET, _escape_text, _escape_attrib, _Namespaces
+from .paperwork import Paperwork
+from .collection import PaperworkCollection
+
+MIN_CHUNK = 512
+DECLARATION = b'<?xml version="1.0" encoding="UTF-8"?>\n'
+_REFERENCE = re.compile(br'<\?hermes-chunk ([0-9a-f]{40})\?>')
+_REFERENCE_SIZE = len("<?hermes-chunk ?>") + 40
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    hash BLOB PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS links (
+    parent BLOB NOT NULL,
+    child BLOB NOT NULL,
+    PRIMARY KEY (parent, child)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT UNIQUE NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS manifests (
+    snapshot INTEGER NOT NULL,
+    dataset TEXT NOT NULL,
+    root BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (snapshot, dataset)
+);
+CREATE INDEX IF NOT EXISTS manifests_dataset ON manifests (dataset);
+"""
+#--------------------------------------------------------------------------
+def _key(digest):
+    """returns the stored form of a hex chunk hash, 20 bytes"""
+    return sqlite3.Binary(binascii.unhexlify(digest))
+#--------------------------------------------------------------------------
+def _hex(key):
+    """returns the hex chunk hash of a stored key"""
+    return binascii.hexlify(bytes(key)).decode("ascii")
+#--------------------------------------------------------------------------
+def _start_tag(node):
+    """returns the start tag of an element without the closing bracket"""
+    if "{" not in node.tag and not any("{" in k for k in node.attrib):
+        return "<" + node.tag + "".join(
+            ' %s="%s"' % (k, _escape_attrib(v)) for k, v in node.attrib.items())
+    namespaces = _Namespaces()
+    declared = []
+    name = namespaces.qualify(node.tag, declared)
+    attributes = "".join(' %s="%s"' % (namespaces.qualify(k, declared),
+                                       _escape_attrib(v))
+                         for k, v in node.attrib.items())
+    return "<" + name + namespaces.declarations(declared) + attributes
+#--------------------------------------------------------------------------
+def chunk_document(root, min_chunk=MIN_CHUNK):
+    """
+    cuts an element tree into content addressed chunks and returns
+    (root hash, chunks), where chunks is an ordered list of (hash, xml
+    bytes, child hashes).
+
+    Elements are serialized bottom-up.  The root, and every element
+    whose xml is at least min_chunk characters long, becomes a chunk in
+    which each large child is replaced by a <?hermes-chunk hash?>
+    reference; smaller elements stay inline in their parent.  Each chunk
+    declares the namespaces it uses, and whitespace between elements is
+    not kept, so equal subtrees give equal chunks wherever they are.
+    """
+    chunks = []
+    stack = [(root, iter(root), [], [])]
+    while stack:
+        node, children, parts, links = stack[-1]
+        for child in children:
+            if isinstance(child.tag, string_types):
+                stack.append((child, iter(child), [], []))
+                break
+        else:
+            stack.pop()
+            start = _start_tag(node)
+            text = node.text or ""
+            if parts and not text.strip():
+                text = ""
+            if not text and not parts:
+                xml = start + " />"
+            else:
+                end = start.find(" ")
+                name = start[1:end] if end != -1 else start[1:]
+                xml = "%s>%s%s</%s>" % (start, _escape_text(text),
+                                        "".join(parts), name)
+            if not stack or len(xml) >= min_chunk:
+                data = xml.encode("utf-8")
+                key = hashlib.sha1(data).hexdigest()
+                chunks.append((key, data, links))
+                if not stack:
+                    return key, chunks
+                xml = "<?hermes-chunk %s?>" % key
+                stack[-1][3].append(key)
+            else:
+                stack[-1][3].extend(links)
+            if node.tail and node.tail.strip():
+                xml += _escape_text(node.tail)
+            stack[-1][2].append(xml)
+#--------------------------------------------------------------------------
+def _parse(source):
+    """returns the root element of an xml string, bytes, file or element"""
+    if isinstance(source, (string_types, bytes)):
+        text = source.decode("utf-8") if isinstance(source, bytes) else source
+        if not text.lstrip().startswith("<"):
+            return ET.parse(source).getroot()
+        if not isinstance(source, bytes):
+            source = source.encode("utf-8")
+        return ET.XML(source)
+    return source
+#--------------------------------------------------------------------------
+def _archive_record(dataset, min_chunk=MIN_CHUNK):
+    """returns the root hash and the chunks of a dataset's metadata"""
+    pw = Paperwork(dataset=dataset)
+    root, chunks = chunk_document(pw._getroot(), min_chunk)
+    return root, chunks
+########################################################################
+class MetadataArchive(object):
+    """
+    A SQLite backed store of metadata snapshots, deduplicated by subtree.
+
+    Inputs:
+       path - path of the SQLite file.  It is created if needed;
+        ":memory:" keeps the archive in memory.
+       min_chunk - optional - smallest element, in characters of xml,
+        stored as a chunk of its own.  Smaller chunks deduplicate more
+        finely and cost more rows.
+       level - optional - zlib compression level of the chunks.
+    """
+    _connection = None
+    min_chunk = None
+    level = None
+    #----------------------------------------------------------------------
+    def __init__(self, path, min_chunk=MIN_CHUNK, level=6):
+        """Constructor"""
+        self.min_chunk = min_chunk
+        self.level = level
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+    #----------------------------------------------------------------------
+    def __enter__(self):
+        return self
+    #----------------------------------------------------------------------
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+    #----------------------------------------------------------------------
+    def close(self):
+        """closes the SQLite file"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+    #----------------------------------------------------------------------
+    def _snapshot_id(self, snapshot, create=False):
+        """returns the id of a snapshot given by id or label"""
+        c = self._connection
+        if isinstance(snapshot, int):
+            row = c.execute("SELECT id FROM snapshots WHERE id = ?",
+                            (snapshot,)).fetchone()
+        else:
+            row = c.execute("SELECT id FROM snapshots WHERE label = ?",
+                            (snapshot,)).fetchone()
+            if row is None and create:
+                return c.execute("INSERT INTO snapshots (label, created) "
+                                 "VALUES (?, ?)",
+                                 (snapshot, time.time())).lastrowid
+        if row is None:
+            raise KeyError("no snapshot %r in the archive" % (snapshot,))
+        return row[0]
+    #----------------------------------------------------------------------
+    def _store(self, snapshot_id, dataset, root, chunks):
+        """writes the new chunks of a document and its manifest row"""
+        c = self._connection
+        added = [0, 0]
+        size = len(DECLARATION)
+        for key, data, links in chunks:
+            size += len(data) - len(links) * _REFERENCE_SIZE
+            if c.execute("SELECT 1 FROM chunks WHERE hash = ?",
+                         (_key(key),)).fetchone() is not None:
+                continue
+            blob = zlib.compress(data, self.level)
+            c.execute("INSERT INTO chunks VALUES (?, ?, ?)",
+                      (_key(key), sqlite3.Binary(blob), len(data)))
+            c.executemany("INSERT OR IGNORE INTO links VALUES (?, ?)",
+                          ((_key(key), _key(child)) for child in links))
+            added[0] += 1
+            added[1] += len(blob)
+        c.execute("INSERT OR REPLACE INTO manifests VALUES (?, ?, ?, ?)",
+                  (snapshot_id, dataset, _key(root), size))
+        return added
+    #----------------------------------------------------------------------
+    def add(self, snapshot, dataset, source):
+        """
+        archives one document under a dataset name in a snapshot, which
+        is created if needed, e.g. to load xml files exported before the
+        archive existed.  source is an xml string or bytes, the path of
+        an xml file or an element.  Returns the root chunk hash.
+        """
+        root, chunks = chunk_document(_parse(source), self.min_chunk)
+        with self._connection:
+            self._store(self._snapshot_id(snapshot, create=True), dataset,
+                        root, chunks)
+        return root
+    #----------------------------------------------------------------------
+    def snapshot(self, datasets, label=None, workers=1):
+        """
+        archives the metadata of a list of datasets or a
+        PaperworkCollection as a new snapshot.
+
+        Inputs:
+           datasets - list of dataset paths or a PaperworkCollection.
+           label - optional - name of the snapshot, by default the
+            current local time.  An existing label is added to.
+           workers - optional - number of threads used to read and chunk
+            the metadata when datasets is a list.
+        Output:
+           dictionary with the snapshot id, the counts of archived and
+           failed datasets, the number and stored bytes of the new
+           chunks, and the failed results.
+        """
+        if not isinstance(datasets, PaperworkCollection):
+            datasets = PaperworkCollection(datasets, workers=workers)
+        if label is None:
+            label = time.strftime("%Y-%m-%dT%H:%M:%S")
+        summary = {"snapshot" : None, "archived" : 0, "failed" : 0,
+                   "chunks" : 0, "bytes" : 0, "errors" : []}
+        with self._connection:
+            snapshot_id = self._snapshot_id(label, create=True)
+            summary["snapshot"] = snapshot_id
+            for result in datasets._run(_archive_record, self.min_chunk):
+                if not result.ok:
+                    summary["failed"] += 1
+                    summary["errors"].append(result)
+                    continue
+                root, chunks = result.value
+                count, size = self._store(snapshot_id, result.dataset, root,
+                                          chunks)
+                summary["archived"] += 1
+                summary["chunks"] += count
+                summary["bytes"] += size
+        return summary
+    #----------------------------------------------------------------------
+    def snapshots(self):
+        """returns (id, label, created) for every snapshot, oldest first"""
+        return list(self._connection.execute(
+            "SELECT id, label, created FROM snapshots ORDER BY id"))
+    #----------------------------------------------------------------------
+    def datasets(self, snapshot=None):
+        """returns the datasets of a snapshot, or of every snapshot"""
+        if snapshot is None:
+            rows = self._connection.execute(
+                "SELECT DISTINCT dataset FROM manifests ORDER BY dataset")
+        else:
+            rows = self._connection.execute(
+                "SELECT dataset FROM manifests WHERE snapshot = ? "
+                "ORDER BY dataset", (self._snapshot_id(snapshot),))
+        return [row[0] for row in rows]
+    #----------------------------------------------------------------------
+    def history(self, dataset):
+        """
+        returns (snapshot label, root hash) for every snapshot of a
+        dataset, oldest first.  Consecutive equal hashes mean the
+        metadata did not change.
+        """
+        return [(label, _hex(root)) for label, root in self._connection.execute(
+            "SELECT s.label, m.root FROM manifests m JOIN snapshots s "
+            "ON s.id = m.snapshot WHERE m.dataset = ? ORDER BY s.id",
+            (dataset,))]
+    #----------------------------------------------------------------------
+    def _root(self, dataset, snapshot=None):
+        """returns the root hash of a dataset at a snapshot or the latest"""
+        if snapshot is None:
+            row = self._connection.execute(
+                "SELECT root FROM manifests WHERE dataset = ? "
+                "ORDER BY snapshot DESC LIMIT 1", (dataset,)).fetchone()
+        else:
+            row = self._connection.execute(
+                "SELECT root FROM manifests WHERE dataset = ? AND "
+                "snapshot = ?", (dataset, self._snapshot_id(snapshot))
+                ).fetchone()
+        if row is None:
+            raise KeyError("%s is not in snapshot %r" % (dataset, snapshot))
+        return _hex(row[0])
+    #----------------------------------------------------------------------
+    def _load(self, root):
+        """returns a dictionary of every chunk under root, decompressed"""
+        loaded = {}
+        wanted = [root]
+        while wanted:
+            found = []
+            for i in range(0, len(wanted), 500):
+                batch = wanted[i:i + 500]
+                rows = self._connection.execute(
+                    "SELECT hash, data FROM chunks WHERE hash IN (%s)" %
+                    ",".join("?" * len(batch)), [_key(k) for k in batch])
+                for key, blob in rows:
+                    data = zlib.decompress(bytes(blob))
+                    loaded[_hex(key)] = data
+                    found.extend(_REFERENCE.findall(data))
+            missing = [key for key in wanted if key not in loaded]
+            if missing:
+                raise KeyError("chunk %s is missing from the archive" %
+                               missing[0])
+            wanted = list(set(key.decode("ascii") for key in found) -
+                          set(loaded))
+        return loaded
+    #----------------------------------------------------------------------
+    def write(self, dataset, writer, snapshot=None):
+        """
+        writes the xml document of a dataset at a snapshot, by default
+        the latest one that has the dataset, to a binary file object.
+        Returns the number of bytes written.
+        """
+        root = self._root(dataset, snapshot)
+        loaded = self._load(root)
+        writer.write(DECLARATION)
+        written = len(DECLARATION)
+        stack = [iter([(None, root)])]
+        while stack:
+            for literal, key in stack[-1]:
+                if literal:
+                    writer.write(literal)
+                    written += len(literal)
+                if key is not None:
+                    stack.append(_pieces(loaded[key]))
+                    break
+            else:
+                stack.pop()
+        return written
+    #----------------------------------------------------------------------
+    def rebuild(self, dataset, snapshot=None):
+        """returns the xml document of a dataset at a snapshot, as bytes"""
+        writer = io.BytesIO()
+        self.write(dataset, writer, snapshot)
+        return writer.getvalue()
+    #----------------------------------------------------------------------
+    def delete(self, snapshot):
+        """
+        removes a snapshot's manifest.  Its chunks stay until prune()
+        finds that no other snapshot uses them.
+        """
+        with self._connection:
+            snapshot_id = self._snapshot_id(snapshot)
+            self._connection.execute("DELETE FROM manifests WHERE "
+                                     "snapshot = ?", (snapshot_id,))
+            self._connection.execute("DELETE FROM snapshots WHERE id = ?",
+                                     (snapshot_id,))
+    #----------------------------------------------------------------------
+    def prune(self, keep=None):
+        """
+        removes the chunks no snapshot refers to, directly or through
+        another chunk.  If keep is given, all but the newest keep
+        snapshots are deleted first.  Returns the number of chunks
+        removed and their stored bytes.
+        """
+        if keep is not None:
+            for snapshot_id, label, created in self.snapshots()[:-keep or None]:
+                self.delete(snapshot_id)
+        c = self._connection
+        with c:
+            c.execute("CREATE TEMP TABLE IF NOT EXISTS live "
+                      "(hash BLOB PRIMARY KEY) WITHOUT ROWID")
+            c.execute("DELETE FROM live")
+            c.execute("WITH RECURSIVE reached(hash) AS ("
+                      "SELECT root FROM manifests UNION "
+                      "SELECT links.child FROM links JOIN reached "
+                      "ON links.parent = reached.hash) "
+                      "INSERT INTO live SELECT hash FROM reached")
+            removed, size = c.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM chunks "
+                "WHERE hash NOT IN (SELECT hash FROM live)").fetchone()
+            c.execute("DELETE FROM chunks WHERE hash NOT IN "
+                      "(SELECT hash FROM live)")
+            c.execute("DELETE FROM links WHERE parent NOT IN "
+                      "(SELECT hash FROM live)")
+            c.execute("DELETE FROM live")
+        return removed, size
+    #----------------------------------------------------------------------
+    def stats(self):
+        """
+        returns a dictionary with the number of snapshots, documents and
+        chunks, the bytes the chunks take in the archive ('stored') and
+        the bytes of the documents they rebuild ('documents_bytes')
+        """
+        c = self._connection
+        snapshots = c.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+        documents, logical = c.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM manifests"
+            ).fetchone()
+        chunks, stored = c.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM chunks"
+            ).fetchone()
+        return {"snapshots" : snapshots, "documents" : documents,
+                "chunks" : chunks, "stored" : stored,
+                "documents_bytes" : logical}
+#--------------------------------------------------------------------------
+def _pieces(data):
+    """yields (literal bytes, referenced hash or None) over a chunk"""
+    position = 0
+    for match in _REFERENCE.finditer(data):
+        yield data[position:match.start()], match.group(1).decode("ascii")
+        position = match.end()
+    yield data[position:], None
@@ -0,0 +1,304 @@
+"""
+Runs Paperwork operations over many datasets at once on a pool of
+threads or processes.
+
+Usage Example:
+
+  >>> collection = PaperworkCollection(workspace=r"c:\\temp\\scratch.gdb")
+  >>> for result in collection.convert_all():
+  ...     if result.ok:
+  ...         print(result.dataset, result.value['metadata'].keys())
+  >>> print(collection.errors)
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import arcpy
+import hashlib
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from collections import namedtuple, OrderedDict
+from .common import *
+from .paperwork import Paperwork
+from .describe import dataset_properties
+
+########################################################################
+class Result(namedtuple("Result", ["dataset", "value", "error"])):
+    """
+    The outcome of an operation on one dataset.  error is None when the
+    operation succeeded, otherwise it holds the error message and value
+    is None.
+    """
+    __slots__ = ()
+    #----------------------------------------------------------------------
+    @property
+    def ok(self):
+        """returns True if the operation succeeded"""
+        return self.error is None
+#--------------------------------------------------------------------------
+def _convert(dataset, exclude=None):
+    return Paperwork(dataset=dataset).convert(exclude=exclude)
+#--------------------------------------------------------------------------
+def _save(dataset, edit, force=False):
+    pw = Paperwork(dataset=dataset)
+    d = pw.convert()
+    changed = edit(dataset, d)
+    return pw.save(d if changed is None else changed, force=force)
+#--------------------------------------------------------------------------
+def _export(dataset, outFolder):
+    return Paperwork(dataset=dataset).exportToXML(outFolder,
+                                                  export_name(dataset))
+#--------------------------------------------------------------------------
+def _stamp(dataset, template, values=None, merge=False):
+    if callable(values):
+        values = values(dataset)
+    return Paperwork(dataset=dataset).stamp(template, values, merge)
+#--------------------------------------------------------------------------
+def export_name(dataset):
+    """
+    returns the xml file name a batch export gives a dataset: its
+    name and the first eight hex digits of the sha1 of its normalized
+    path, so the name is the same on every run and datasets with the same
+    name in different workspaces do not overwrite each other.
+    """
+    path = os.path.normcase(os.path.normpath(dataset))
+    if not isinstance(path, bytes):
+        path = path.encode("utf-8")
+    name = dataset.replace("\\", "/").rstrip("/").rsplit("/", 1)[-1]
+    return "%s_%s.xml" % (os.path.splitext(name)[0],
+                          hashlib.sha1(path).hexdigest()[:8])
+#--------------------------------------------------------------------------
+def _export_direct(dataset, outFolder, method="auto"):
+    with Paperwork(dataset=dataset) as pw:
+        return pw.exportToXML(outFolder, export_name(dataset), direct=True,
+                              method=method)
+#--------------------------------------------------------------------------
+def _sync(dataset, method="ALWAYS"):
+    return Paperwork(dataset=dataset).setSyncMethod(method)
+#--------------------------------------------------------------------------
+def _run_chunk(task):
+    """runs an operation over a chunk of datasets from one workspace"""
+    operation, datasets, args = task
+    results = []
+    for dataset in datasets:
+        try:
+            results.append(Result(dataset, operation(dataset, *args), None))
+        except Exception as e:
+            results.append(Result(dataset, None, str(e)))
+    return results
+########################################################################
+class PaperworkCollection(object):
+    """
+    A set of datasets whose metadata is read or written in bulk.
+
+    The datasets are grouped by workspace and handed to the workers in
+    chunks, so each worker processes consecutive datasets from the same
+    geodatabase and reuses its connection.  Every *_all method returns an
+    iterator that yields a Result per dataset as the chunks finish.  A
+    failure on one dataset is recorded in its Result and in errors; it
+    does not stop the run.  errors holds the failures of the latest run
+    only; it is emptied each time a *_all method is called.
+
+    Inputs:
+       datasets - optional - list of dataset paths.
+       workspace - optional - workspace whose feature classes, tables and
+        rasters are added (including those in feature datasets).
+       workers - optional - number of threads or processes.  1 (the
+        default) runs the operations in the calling thread.
+       pool - optional - "thread" (default) or "process".  arcpy
+        geoprocessing tools are not thread safe, so a thread pool is only
+        safe for operations that do not call arcpy at the same time; use
+        "process" to run arcpy-backed operations in parallel.  Process
+        pools need the edit functions passed to save_all to be
+        picklable, and the calling script to be guarded by
+        if __name__ == "__main__".
+       chunksize - optional - number of datasets handed to a worker at
+        once.
+    """
+    _datasets = None
+    _workers = None
+    _pool = None
+    _chunksize = None
+    errors = None
+    #----------------------------------------------------------------------
+    def __init__(self, datasets=None, workspace=None, workers=1,
+                 pool="thread", chunksize=25):
+        """Constructor"""
+        if pool not in ("thread", "process"):
+            raise HermesErrorHandler(
+                {
+                    "function": "PaperworkCollection",
+                    "line": 0,
+                    "filename": "collection.py",
+                    "synerror": "Invalid pool type: %s" % pool,
+                    "arc" : ""
+                }
+            )
+        self._datasets = list(datasets or [])
+        if workspace is not None:
+            self._datasets.extend(self._walk(workspace))
+        self._workers = max(1, int(workers))
+        self._pool = pool
+        self._chunksize = max(1, int(chunksize))
+        self.errors = []
+    #----------------------------------------------------------------------
+    @staticmethod
+    def _walk(workspace):
+        """lists the datasets that carry metadata in a workspace"""
+        datasets = []
+        for dirpath, dirnames, filenames in arcpy.da.Walk(
+            workspace, datatype=["FeatureClass", "Table", "RasterDataset"]):
+            datasets.extend(os.path.join(dirpath, name) for name in filenames)
+        return datasets
+    #----------------------------------------------------------------------
+    @property
+    def datasets(self):
+        """gets the dataset paths in the collection"""
+        return list(self._datasets)
+    #----------------------------------------------------------------------
+    def __len__(self):
+        return len(self._datasets)
+    #----------------------------------------------------------------------
+    def __iter__(self):
+        return iter(self._datasets)
+    #----------------------------------------------------------------------
+    def _chunks(self):
+        """splits the datasets into per-workspace chunks"""
+        groups = OrderedDict()
+        for dataset in self._datasets:
+            groups.setdefault(workspace_path(dataset), []).append(dataset)
+        for datasets in groups.values():
+            for i in range(0, len(datasets), self._chunksize):
+                yield datasets[i:i + self._chunksize]
+    #----------------------------------------------------------------------
+    def _run(self, operation, *args, **kwargs):
+        """
+        empties errors and returns an iterator of the results of running
+        operation over every dataset.  With a lookup dictionary keyed by
+        dataset, operation is called as operation(dataset, entries, *args)
+        where entries holds only the lookup entries of the dataset's
+        chunk, so a process pool does not pickle the whole dictionary
+        for every chunk.
+        """
+        self.errors = []
+        return self._results(operation, args, kwargs.get("lookup"))
+    #----------------------------------------------------------------------
+    def _results(self, operation, args, lookup=None):
+        """runs operation over every dataset and yields the results"""
+        if lookup is None:
+            tasks = ((operation, chunk, args) for chunk in self._chunks())
+        else:
+            tasks = ((operation, chunk,
+                      (dict((d, lookup[d]) for d in chunk if d in lookup),)
+                      + args) for chunk in self._chunks())
+        if self._workers == 1:
+            pool = None
+            chunks = (_run_chunk(task) for task in tasks)
+        else:
+            if self._pool == "process":
+                pool = multiprocessing.Pool(self._workers)
+            else:
+                pool = ThreadPool(self._workers)
+            chunks = pool.imap_unordered(_run_chunk, tasks)
+        try:
+            for results in chunks:
+                for result in results:
+                    if not result.ok:
+                        self.errors.append(result)
+                    yield result
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+    #----------------------------------------------------------------------
+    def convert_all(self, exclude=None):
+        """
+        converts the metadata of every dataset.  Each Result value is the
+        dictionary from Paperwork.convert().
+
+        Inputs:
+           exclude - optional - element paths to leave out, see
+            Paperwork.convert().
+        """
+        return self._run(_convert, exclude)
+    #----------------------------------------------------------------------
+    def save_all(self, edit, force=False):
+        """
+        edits and saves the metadata of every dataset.  Each Result value
+        is the return value of Paperwork.save(), False when the edit
+        changed nothing.
+
+        Inputs:
+           edit - function called as edit(dataset, d) with the converted
+            dictionary.  It changes d in place and returns None, or
+            returns the dictionary to save.
+           force - optional - write the metadata even if nothing changed.
+        """
+        return self._run(_save, edit, force)
+    #----------------------------------------------------------------------
+    def stamp_all(self, template, values=None, merge=False):
+        """
+        writes a MetadataTemplate to every dataset, see
+        Paperwork.stamp().  Each Result value is the return value of
+        Paperwork.stamp().
+
+        Inputs:
+           template - the MetadataTemplate, compiled once for all
+            datasets.
+           values - optional - slot values: a dictionary used for every
+            dataset, or a function called as values(dataset) returning
+            the dictionary for that dataset.
+           merge - optional - see Paperwork.stamp().
+        """
+        return self._run(_stamp, template, values, merge)
+    #----------------------------------------------------------------------
+    def export_all(self, outFolder):
+        """
+        exports the metadata of every dataset to an xml file in
+        outFolder.  Files are named by export_name(), so datasets with
+        the same name in different workspaces get different files.  Each
+        Result value is the path of the xml file.
+        """
+        if not os.path.isdir(outFolder):
+            os.makedirs(outFolder)
+        return self._run(_export, outFolder)
+    #----------------------------------------------------------------------
+    def export_direct_all(self, outFolder, method="auto"):
+        """
+        exports the metadata of every dataset to outFolder as arcpy
+        writes it, without converting it, see
+        Paperwork.exportToXML(direct=True).  Files are named by
+        export_name().  Each Result value is the path of the xml file.
+        """
+        if not os.path.isdir(outFolder):
+            os.makedirs(outFolder)
+        return self._run(_export_direct, outFolder, method)
+    #----------------------------------------------------------------------
+    def sync_all(self, method="ALWAYS"):
+        """
+        synchronizes the metadata of every dataset, see
+        Paperwork.setSyncMethod().  Each Result value is the dataset path.
+        hermes.sync.BulkSync adds per-workspace caps, a rate limit and
+        retries of lock errors.
+        """
+        return self._run(_sync, method)
+    #----------------------------------------------------------------------
+    def properties_all(self):
+        """
+        returns the dataset properties of every dataset, see
+        Paperwork.datasetProperties.  Workspaces are described once
+        through hermes.describe.describe_cache, not once per dataset.
+        """
+        return self._run(dataset_properties)
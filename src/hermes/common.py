@@ -18,6 +18,11 @@ import sys
 import os
 from .version import __version__
 
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
 def trace():
     """
         trace finds the line, the filename
@@ -37,6 +42,33 @@ def trace():
     synerror = traceback.format_exc().splitlines()[-1]
     return line, fileName, synerror
 #--------------------------------------------------------------------------
+def workspace_path(dataset):
+    """
+    returns the workspace holding a dataset: the first geodatabase or
+    connection file on its path (so feature datasets are skipped), or the
+    folder holding it.
+    """
+    path = os.path.dirname(dataset)
+    parent = path
+    while parent:
+        if os.path.splitext(parent)[1].lower() in ('.gdb', '.sde', '.mdb'):
+            return parent
+        head = os.path.dirname(parent)
+        if head == parent:
+            break
+        parent = head
+    return path
+#--------------------------------------------------------------------------
+def workspace_key(path):
+    """
+    returns the workspace a workspace, feature dataset or dataset folder
+    path names, as workspace_path() gives it for the datasets inside,
+    with its case and separators normalized by os.path.normcase().  Used
+    to match per-workspace settings to os.path.normcase(workspace_path()).
+    """
+    path = path.rstrip("/\\") or path
+    return os.path.normcase(workspace_path(os.path.join(path, "_")))
+#--------------------------------------------------------------------------
 class HermesErrorHandler(Exception):
     """Error handler for hermes package"""
     pass
@@ -0,0 +1,206 @@
+"""
+A compact, read-mostly representation of converted metadata for
+processes that hold the metadata of many datasets at once.
+
+Each element is a MetadataNode with __slots__ instead of a dictionary;
+tag and attribute names are interned, so the thousands of 'Sync',
+'attrlabl' or 'dataIdInfo' strings in a catalog are one object each;
+attributes and children are kept in tuples.  Converting to and from the
+dictionary format of Paperwork.convert() is lossless, and, unlike the
+dictionary, a node keeps the order of differently named siblings.
+
+Usage Example:
+
+  >>> catalog = dict((fc, Paperwork(dataset=fc).compact()) for fc in fcs)
+  >>> catalog[fc].find("dataIdInfo/idCitation/resTitle").text
+  >>> Paperwork(dataset=fc).save(catalog[fc])
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import sys
+from .common import string_types
+from .converters import ET, metadata_to_dictionary
+from .payload import BinaryPayload
+
+SHORT = 32
+try:
+    _intern = sys.intern
+except AttributeError:
+    _intern = intern
+#--------------------------------------------------------------------------
+def intern_name(value):
+    """
+    returns the shared copy of a string.  Python 2 unicode strings
+    cannot be interned and are returned as they are.
+    """
+    try:
+        return _intern(value)
+    except TypeError:
+        return value
+#--------------------------------------------------------------------------
+def _text(value):
+    """returns stripped text, shared when short, or None when empty"""
+    if value:
+        value = value.strip()
+        if value:
+            return intern_name(value) if len(value) <= SHORT else value
+    return None
+########################################################################
+class MetadataNode(object):
+    """
+    One metadata element: an interned tag, a flat tuple of attribute
+    names and values (name1, value1, name2, value2, ...) sorted by name,
+    the stripped text and a tuple of child nodes.  Empty attributes and
+    children are None.  Short texts and attribute values are interned
+    like the names, since values such as 'TRUE' or 'String' repeat
+    throughout a catalog.
+
+    Nodes iterate over their children and have an attrib dictionary, so
+    they can be passed to the converters like ElementTree elements.
+    """
+    __slots__ = ('tag', 'attributes', 'text', 'children')
+    #----------------------------------------------------------------------
+    def __init__(self, tag, attributes=None, text=None, children=None):
+        """Constructor"""
+        self.tag = intern_name(tag)
+        if attributes:
+            if isinstance(attributes, dict):
+                attributes = attributes.items()
+            flat = []
+            for k, v in sorted(attributes):
+                flat.append(intern_name(k))
+                flat.append(intern_name(v) if len(v) <= SHORT else v)
+            attributes = tuple(flat)
+        self.attributes = attributes or None
+        self.text = _text(text)
+        self.children = tuple(children) if children else None
+    #----------------------------------------------------------------------
+    @property
+    def attrib(self):
+        """returns the attributes as a new dictionary"""
+        a = self.attributes
+        return dict(zip(a[::2], a[1::2])) if a else {}
+    #----------------------------------------------------------------------
+    def get(self, name, default=None):
+        """returns the value of an attribute"""
+        a = self.attributes or ()
+        for i in range(0, len(a), 2):
+            if a[i] == name:
+                return a[i + 1]
+        return default
+    #----------------------------------------------------------------------
+    def __iter__(self):
+        return iter(self.children or ())
+    #----------------------------------------------------------------------
+    def __len__(self):
+        return len(self.children) if self.children else 0
+    #----------------------------------------------------------------------
+    def __eq__(self, other):
+        if not isinstance(other, MetadataNode):
+            return NotImplemented
+        return self.tag == other.tag and self.text == other.text and \
+               self.attributes == other.attributes and \
+               self.children == other.children
+    #----------------------------------------------------------------------
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+    __hash__ = None
+    #----------------------------------------------------------------------
+    def __repr__(self):
+        return "<MetadataNode %s>" % self.tag
+    #----------------------------------------------------------------------
+    def find(self, path):
+        """returns the first node of a slash separated path of tags"""
+        node = self
+        for tag in path.split("/"):
+            for child in node:
+                if child.tag == tag:
+                    node = child
+                    break
+            else:
+                return None
+        return node
+    #----------------------------------------------------------------------
+    def findall(self, path):
+        """returns every node of a slash separated path of tags"""
+        nodes = [self]
+        for tag in path.split("/"):
+            nodes = [child for node in nodes for child in node
+                     if child.tag == tag]
+        return nodes
+    #----------------------------------------------------------------------
+    @classmethod
+    def from_element(cls, element):
+        """builds a node tree from an ElementTree element"""
+        stack = [(element, iter(element), [])]
+        node = None
+        while stack:
+            current, children, built = stack[-1]
+            for child in children:
+                if len(child):
+                    stack.append((child, iter(child), []))
+                    break
+                built.append(cls(child.tag, child.attrib, child.text))
+            else:
+                stack.pop()
+                node = cls(current.tag, current.attrib, current.text, built)
+                if stack:
+                    stack[-1][2].append(node)
+        return node
+    #----------------------------------------------------------------------
+    def to_element(self):
+        """returns the node tree as an ElementTree element"""
+        root = ET.Element(self.tag, self.attrib)
+        root.text = self.text
+        stack = [(root, self)]
+        while stack:
+            element, node = stack.pop()
+            for child in node:
+                sub = ET.SubElement(element, child.tag, child.attrib)
+                sub.text = child.text
+                if child.children:
+                    stack.append((sub, child))
+        return root
+    #----------------------------------------------------------------------
+    @classmethod
+    def from_dict(cls, d):
+        """builds a node tree from a single keyed convert() dictionary"""
+        assert isinstance(d, dict) and len(d) == 1
+        tag, value = next(iter(d.items()))
+        return cls._from_value(tag, value)
+    #----------------------------------------------------------------------
+    @classmethod
+    def _from_value(cls, tag, value):
+        if isinstance(value, BinaryPayload):
+            value = value.text()
+        if value is None or isinstance(value, string_types):
+            return cls(tag, text=value)
+        attributes = []
+        children = []
+        text = None
+        for key, item in value.items():
+            if key == '#text':
+                text = item.text() if isinstance(item, BinaryPayload) else item
+            elif key.startswith('@'):
+                attributes.append((key[1:], item))
+            else:
+                for entry in item if isinstance(item, list) else [item]:
+                    children.append(cls._from_value(key, entry))
+        return cls(tag, attributes, text, children)
+    #----------------------------------------------------------------------
+    def to_dict(self):
+        """returns the node tree in the dictionary format of convert()"""
+        return metadata_to_dictionary(self)
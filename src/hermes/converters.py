@@ -0,0 +1,469 @@
+"""
+Converters between metadata XML elements and the dictionary format used
+by Paperwork.
+
+All attributes begin with a '@', element text is stored as '#text' when
+the element also has attributes or children, and repeated elements are
+collected into a list.
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import re
+import fnmatch
+import hashlib
+from collections import defaultdict
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from .common import string_types
+from .payload import BinaryPayload
+
+XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+VOLATILE = ('metadata/Esri/ModDate', 'metadata/Esri/ModTime',
+            'metadata/Esri/SyncDate', 'metadata/Esri/SyncTime')
+
+#--------------------------------------------------------------------------
+def _element_value(node, children):
+    """
+    returns the dictionary value of an element given the dictionary of
+    its already converted children (empty when it has none)
+    """
+    attrib = node.attrib
+    text = node.text
+    if children or attrib:
+        for k, v in attrib.items():
+            children['@' + k] = v
+        if text:
+            text = text.strip()
+            if text:
+                children['#text'] = text
+        return children
+    elif text:
+        return text.strip()
+    return None
+#--------------------------------------------------------------------------
+def metadata_to_dictionary(element):
+    """
+    converts an xml element to a dictionary object
+
+    The tree is walked with an explicit stack, so the document depth is
+    not limited by the recursion limit.  Each element costs at most one
+    dictionary, and childless elements are converted without being
+    pushed on the stack.
+    """
+    value = None
+    stack = [(element, iter(element), {})]
+    while stack:
+        node, children, converted = stack[-1]
+        for child in children:
+            if len(child):
+                stack.append((child, iter(child), {}))
+                break
+            child_value = _element_value(child, {})
+            tag = child.tag
+            if tag in converted:
+                existing = converted[tag]
+                if isinstance(existing, list):
+                    existing.append(child_value)
+                else:
+                    converted[tag] = [existing, child_value]
+            else:
+                converted[tag] = child_value
+        else:
+            stack.pop()
+            value = _element_value(node, converted)
+            if stack:
+                converted = stack[-1][2]
+                tag = node.tag
+                if tag in converted:
+                    existing = converted[tag]
+                    if isinstance(existing, list):
+                        existing.append(value)
+                    else:
+                        converted[tag] = [existing, value]
+                else:
+                    converted[tag] = value
+    return {element.tag: value}
+#--------------------------------------------------------------------------
+def _path_filter(exclude):
+    """
+    returns a function testing an element path against exclude, which is
+    either a callable or a list of fnmatch patterns such as
+    'metadata/Binary' or '*/Enclosure'
+    """
+    if exclude is None or callable(exclude):
+        return exclude
+    if isinstance(exclude, string_types):
+        exclude = [exclude]
+    pattern = re.compile("|".join(fnmatch.translate(p) for p in exclude))
+    return lambda path: pattern.match(path) is not None
+#--------------------------------------------------------------------------
+def iterparse_to_dictionary(source, exclude=None):
+    """
+    converts an xml file to a dictionary object without building the
+    whole element tree.
+
+    The document is read with iterparse and every element is converted,
+    cleared and detached from its parent as soon as it ends, so memory
+    use follows the size of the dictionary being kept rather than the
+    size of the file.  The text of a single element (for example a
+    base64 thumbnail) is still read into memory while that element is
+    parsed.
+
+    Inputs:
+       source - path or file object of the xml document
+       exclude - optional - element paths to leave out, including all
+        of their children.  Either a list of fnmatch patterns matched
+        against the slash separated path from the root tag, e.g.
+        ['metadata/Binary', '*/Enclosure'], or a function taking the
+        path and returning True to skip it.
+    Output:
+       dictionary in the same format as metadata_to_dictionary
+    """
+    skip = _path_filter(exclude)
+    value = None
+    path = []
+    elements = []
+    stack = []
+    skipping = 0
+    for event, node in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            elements.append(node)
+            if skipping:
+                skipping += 1
+                continue
+            path.append(node.tag)
+            if skip is not None and skip("/".join(path)):
+                path.pop()
+                skipping = 1
+            else:
+                stack.append({})
+            continue
+        elements.pop()
+        if skipping:
+            skipping -= 1
+        else:
+            path.pop()
+            value = _element_value(node, stack.pop())
+            if stack:
+                converted = stack[-1]
+                tag = node.tag
+                if tag in converted:
+                    existing = converted[tag]
+                    if isinstance(existing, list):
+                        existing.append(value)
+                    else:
+                        converted[tag] = [existing, value]
+                else:
+                    converted[tag] = value
+            else:
+                return {node.tag: value}
+        node.clear()
+        if elements:
+            elements[-1].remove(node)
+    return {}
+#--------------------------------------------------------------------------
+def canonical_digest(source, exclude=None, algorithm="sha1"):
+    """
+    returns a hex digest of an xml document's content that does not
+    depend on how it is serialized: the xml declaration, indentation,
+    attribute order and whitespace around text are ignored.  The
+    document is streamed with iterparse, so the tree is never built.
+
+    Inputs:
+       source - path or file object of the xml document
+       exclude - optional - element paths to leave out of the digest, in
+        the format of iterparse_to_dictionary(), e.g.
+        ['metadata/Esri/ModDate'].
+       algorithm - optional - hashlib algorithm name.
+    """
+    skip = _path_filter(exclude)
+    digest = hashlib.new(algorithm)
+    path = []
+    elements = []
+    skipping = 0
+    for event, node in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            elements.append(node)
+            if skipping:
+                skipping += 1
+                continue
+            path.append(node.tag)
+            if skip is not None and skip("/".join(path)):
+                path.pop()
+                skipping = 1
+                continue
+            parts = [u"\x01", node.tag]
+            for key in sorted(node.attrib):
+                parts.extend((u"\x02", key, u"\x03", node.attrib[key]))
+            digest.update(u"".join(parts).encode('utf-8'))
+            continue
+        elements.pop()
+        if skipping:
+            skipping -= 1
+        else:
+            path.pop()
+            text = (node.text or u"").strip()
+            digest.update((u"\x04" + text + u"\x05").encode('utf-8'))
+        node.clear()
+        if elements:
+            elements[-1].remove(node)
+    return digest.hexdigest()
+#--------------------------------------------------------------------------
+def metadata_to_dictionary_recursive(t):
+    """
+    converts an xml element to a dictionary object (recursivly)
+
+    This is the original converter, kept as the reference implementation
+    for the parity tests and benchmarks.
+    """
+    d = {t.tag: {} if t.attrib else None}
+    children = list(t)
+    if children:
+        dd = defaultdict(list)
+        for dc in map(metadata_to_dictionary_recursive, children):
+            for k, v in dc.items():
+                dd[k].append(v)
+        d = {t.tag: {k: v[0] if len(v) == 1 else v for k, v in dd.items()}}
+    if t.attrib:
+        d[t.tag].update(('@' + k, v) for k, v in t.attrib.items())
+    if t.text:
+        text = t.text.strip()
+        if children or t.attrib:
+            if text:
+                d[t.tag]['#text'] = text
+        else:
+            d[t.tag] = text
+    return d
+#--------------------------------------------------------------------------
+def fill_element(root, d):
+    """ adds the dictionary value d to the element root"""
+    if isinstance(d, BinaryPayload):
+        root.text = d.text()
+    elif not d:
+        pass
+    elif isinstance(d, string_types):
+        root.text = d
+    elif isinstance(d, dict):
+        for k,v in d.items():
+            assert isinstance(k, string_types)
+            if k.startswith('#'):
+                assert k == '#text'
+                root.text = v.text() if isinstance(v, BinaryPayload) else v
+                assert isinstance(root.text, string_types)
+            elif k.startswith('@'):
+                assert isinstance(v, string_types)
+                root.set(k[1:], v)
+            elif isinstance(v, list):
+                for e in v:
+                    fill_element(ET.SubElement(root, k), e)
+            else:
+                fill_element(ET.SubElement(root, k), v)
+    else: assert d == 'invalid type'
+#--------------------------------------------------------------------------
+def dictionary_to_element(d):
+    """ converts a single keyed dictionary to an xml element"""
+    assert isinstance(d, dict) and len(d) == 1
+    tag, body = next(iter(d.items()))
+    node = ET.Element(tag)
+    fill_element(node, body)
+    return node
+#--------------------------------------------------------------------------
+def dictionary_to_metadata(d):
+    """ converts a dictionary to xml"""
+    return ET.tostring(dictionary_to_element(d))
+#--------------------------------------------------------------------------
+def _escape_text(text):
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+#--------------------------------------------------------------------------
+def _text_parts(text):
+    """
+    returns the escaped xml of element text: the text escaped, or the
+    chunks of a BinaryPayload as they are in the exported document
+    """
+    if isinstance(text, BinaryPayload):
+        return text.iter_raw()
+    return (_escape_text(text),)
+#--------------------------------------------------------------------------
+def _escape_attrib(text):
+    text = _escape_text(text)
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
+#--------------------------------------------------------------------------
+def _known_prefixes():
+    """returns the namespace prefixes registered with ElementTree"""
+    from xml.etree import ElementTree
+    prefixes = dict(getattr(ElementTree, "_namespace_map", {}))
+    prefixes[XML_NAMESPACE] = "xml"
+    return prefixes
+########################################################################
+class _Namespaces(object):
+    """
+    the namespace prefixes in scope while a document is written.  A
+    namespace is declared on the first element that uses it and goes out
+    of scope when that element is closed.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self):
+        self.known = _known_prefixes()
+        self.prefixes = {XML_NAMESPACE : "xml"}
+    #----------------------------------------------------------------------
+    def qualify(self, name, declared):
+        """returns the prefixed name of a {uri}name, declaring the uri"""
+        if name[:1] != "{":
+            return name
+        uri, local = name[1:].split("}", 1)
+        prefix = self.prefixes.get(uri)
+        if prefix is None:
+            prefix = self.known.get(uri)
+            in_use = set(self.prefixes.values())
+            count = 0
+            while prefix is None or prefix in in_use:
+                prefix = "ns%d" % count
+                count += 1
+            self.prefixes[uri] = prefix
+            declared.append(uri)
+        return prefix + ":" + local
+    #----------------------------------------------------------------------
+    def declarations(self, declared):
+        """returns the xmlns attributes of newly declared uris"""
+        return "".join(' xmlns:%s="%s"' % (self.prefixes[uri],
+                                            _escape_attrib(uri))
+                       for uri in declared)
+    #----------------------------------------------------------------------
+    def release(self, declared):
+        for uri in declared:
+            del self.prefixes[uri]
+#--------------------------------------------------------------------------
+def iter_dictionary_xml(d):
+    """
+    yields the xml of a single keyed dictionary as a series of strings,
+    the same document dictionary_to_metadata() builds, without building
+    an element tree or the whole string.  '{uri}name' tags and
+    attributes get a prefix declared where the namespace is first used.
+    """
+    assert isinstance(d, dict) and len(d) == 1
+    namespaces = _Namespaces()
+    stack = [iter(d.items())]
+    closing = [None]
+    while stack:
+        for tag, value in stack[-1]:
+            declared = []
+            name = namespaces.qualify(tag, declared)
+            if isinstance(value, dict):
+                attributes = []
+                text = None
+                children = []
+                for k, v in value.items():
+                    if k.startswith('#'):
+                        assert k == '#text' and \
+                               isinstance(v, (string_types, BinaryPayload))
+                        text = v
+                    elif k.startswith('@'):
+                        assert isinstance(v, string_types)
+                        attributes.append(' %s="%s"' % (
+                            namespaces.qualify(k[1:], declared),
+                            _escape_attrib(v)))
+                    elif isinstance(v, list):
+                        children.extend((k, e) for e in v)
+                    else:
+                        children.append((k, v))
+                start = "<%s%s%s" % (name, namespaces.declarations(declared),
+                                     "".join(attributes))
+                if not text and not children:
+                    namespaces.release(declared)
+                    yield start + " />"
+                    continue
+                yield start + ">"
+                if text:
+                    for part in _text_parts(text):
+                        yield part
+                if children:
+                    stack.append(iter(children))
+                    closing.append((name, declared))
+                    break
+                namespaces.release(declared)
+                yield "</%s>" % name
+                continue
+            start = "<" + name + namespaces.declarations(declared)
+            namespaces.release(declared)
+            if not value:
+                yield start + " />"
+            elif isinstance(value, string_types):
+                yield "%s>%s</%s>" % (start, _escape_text(value), name)
+            elif isinstance(value, BinaryPayload):
+                yield start + ">"
+                for part in value.iter_raw():
+                    yield part
+                yield "</%s>" % name
+            else:
+                raise TypeError("invalid metadata value for %s: %r" %
+                                (tag, value))
+        else:
+            stack.pop()
+            frame = closing.pop()
+            if frame is not None:
+                namespaces.release(frame[1])
+                yield "</%s>" % frame[0]
+#--------------------------------------------------------------------------
+def write_dictionary(d, writer, encoding="UTF-8", chunk_size=65536):
+    """
+    writes a single keyed dictionary as an xml document to a binary file
+    object, starting with the xml declaration ArcGIS writes.  The xml is
+    encoded and written in chunks of about chunk_size characters, so
+    memory use does not grow with the size of the document.  Returns the
+    number of bytes written.
+    """
+    written = 0
+    pending = ['<?xml version="1.0" encoding="%s"?>\n' % encoding]
+    size = 0
+    for part in iter_dictionary_xml(d):
+        pending.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            data = "".join(pending).encode(encoding, "xmlcharrefreplace")
+            writer.write(data)
+            written += len(data)
+            pending = []
+            size = 0
+    data = "".join(pending).encode(encoding, "xmlcharrefreplace")
+    writer.write(data)
+    return written + len(data)
+#--------------------------------------------------------------------------
+def write_element(element, writer, encoding="UTF-8"):
+    """
+    writes an element tree as an xml document to a binary file object,
+    with the same xml declaration as write_dictionary().  ElementTree
+    writes the document piece by piece, so it is never held as one
+    string.
+    """
+    writer.write(('<?xml version="1.0" encoding="%s"?>\n' %
+                  encoding).encode(encoding))
+    ET.ElementTree(element).write(writer, encoding=encoding,
+                                  xml_declaration=False)
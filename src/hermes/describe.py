@@ -0,0 +1,119 @@
+"""
+A process-wide cache of arcpy.Describe results for workspaces.  Every
+dataset in a geodatabase shares the same workspace description, so it is
+described once and reused until the entry expires, instead of once per
+dataset (a round-trip per call against enterprise geodatabases).
+
+Usage Example:
+
+  >>> import hermes.describe
+  >>> hermes.describe.describe_cache.ttl = 3600
+  >>> for result in PaperworkCollection(workspace=sde).properties_all():
+  ...     print(result.dataset, result.value["owner"])
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import time
+import threading
+import arcpy
+
+########################################################################
+class DescribeCache(object):
+    """
+    Caches arcpy.Describe objects by path for ttl seconds.  Safe to use
+    from several threads; a path being described by one thread is not
+    described again by another at the same time.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, ttl=300):
+        """Constructor"""
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+    #----------------------------------------------------------------------
+    def describe(self, path):
+        """returns the cached Describe object of path, describing it if needed"""
+        key = os.path.normcase(os.path.normpath(path))
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.time():
+                    self.hits += 1
+                    return entry[1]
+                event = self._pending.get(key)
+                if event is None:
+                    event = self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+            event.wait()
+        try:
+            desc = arcpy.Describe(path)
+            with self._lock:
+                self._entries[key] = (time.time() + self.ttl, desc)
+            return desc
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+    #----------------------------------------------------------------------
+    def clear(self, path=None):
+        """removes one path, or every path, from the cache"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.normcase(os.path.normpath(path)),
+                                  None)
+
+describe_cache = DescribeCache()
+#--------------------------------------------------------------------------
+def dataset_properties(dataset, cache=None):
+    """
+    returns a collection of common dataset properties including
+    information about the workspace, describing the workspace through
+    the cache.  The return object is a dictionary {}
+    """
+    cache = cache or describe_cache
+    validationWorkspace = os.path.dirname(dataset)
+    desc = arcpy.Describe(dataset)
+    descWrksp = cache.describe(desc.path)
+    database, owner, tableName = [i.strip() if i.strip() != "(null)" else "" \
+                                  for i in arcpy.ParseTableName(desc.name,
+                                                                validationWorkspace).split(",")]
+    datasetType = desc.datasetType if hasattr(desc, "datasetType") else ""
+    workspaceFactoryProgID = descWrksp.workspaceFactoryProgID if hasattr(descWrksp, "workspaceFactoryProgID") else ""
+    workspaceType = descWrksp.workspaceType if hasattr(descWrksp, "workspaceType") else ""
+    connectionString = descWrksp.connectionString if hasattr(descWrksp, "connectionString") else ""
+    alias = desc.aliasName if hasattr(desc, "aliasName") else ""
+    dataType = descWrksp.dataType if hasattr(descWrksp, "dataType") else ""
+    return {
+        "owner" : owner,
+        "tableName" : tableName,
+        "alias" : alias,
+        "database" : database,
+        "dataType" : dataType,
+        "datasetType" : datasetType,
+        "workspace" : {
+            "type" : descWrksp.dataType,
+            "path" : desc.path,
+            "connectionString" : connectionString,
+            "workspaceType" : workspaceType,
+            "workspaceFactoryProgID" : workspaceFactoryProgID
+        }
+    }
@@ -0,0 +1,584 @@
+"""
+Structural diff between two metadata documents, e.g. the staging and the
+production copy of a dataset.
+
+Both trees are hashed bottom-up once, so identical branches are skipped
+by comparing one digest.  Repeated elements are matched by content
+first and then by a key child, such as attrlabl for the attr elements of
+eainfo, so reordered or partly changed field lists are not compared
+element by element.  The result is a MetadataDiff: a list of path based
+changes that converts to a MetadataPatch, which Paperwork.save() and
+MetadataPatch.apply() can write to the first dataset to make it match
+the second.
+
+Usage Example:
+
+  >>> changes = diff_datasets(production_fc, staging_fc, exclude=VOLATILE)
+  >>> for change in changes:
+  ...     print(change.op, change.path)
+  >>> Paperwork(dataset=production_fc).save(changes)
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import re
+import hashlib
+from collections import namedtuple, deque
+from .common import *
+from .converters import ET, fill_element, _path_filter
+from .xpath import element_value
+from .paperwork import Paperwork
+from .collection import PaperworkCollection
+from .patch import MetadataPatch
+
+KEYS = {'attr' : 'attrlabl', 'edom' : 'edomv', 'theme' : 'themekt',
+        'place' : 'placekt'}
+
+Change = namedtuple("Change", ["op", "path", "old", "new"])
+#--------------------------------------------------------------------------
+def _bytes(value):
+    return value if isinstance(value, bytes) else value.encode("utf-8")
+#--------------------------------------------------------------------------
+def subtree_digests(root, skip=None):
+    """
+    returns a dictionary of every element of root's tree to the sha1
+    digest of its tag, attributes, stripped text and the digests of its
+    children in order.  Elements whose slash separated path skip()
+    accepts are left out, of the dictionary and of their parent's digest.
+    """
+    digests = {}
+    stack = [(root, root.tag, iter(root), [])]
+    while stack:
+        node, path, children, parts = stack[-1]
+        for child in children:
+            child_path = path + "/" + child.tag
+            if skip is not None and skip(child_path):
+                continue
+            stack.append((child, child_path, iter(child), []))
+            break
+        else:
+            stack.pop()
+            h = hashlib.sha1(_bytes(node.tag))
+            for name, value in sorted(node.attrib.items()):
+                h.update(b"\x01" + _bytes(name) + b"\x02" + _bytes(value))
+            h.update(b"\x03" + _bytes((node.text or "").strip()) + b"\x04")
+            for digest in parts:
+                h.update(digest)
+            digest = h.digest()
+            digests[node] = digest
+            if stack:
+                stack[-1][3].append(digest)
+    return digests
+#--------------------------------------------------------------------------
+def _key_text(node, key):
+    """returns the stripped text of node's key child, or None"""
+    child = node.find(key)
+    if child is None:
+        return None
+    return "".join(child.itertext()).strip()
+#--------------------------------------------------------------------------
+def _key_counts(nodes, key):
+    """returns a dictionary of key text to the number of nodes having it"""
+    counts = {}
+    for node in nodes:
+        for child in node.findall(key):
+            text = "".join(child.itertext()).strip()
+            counts[text] = counts.get(text, 0) + 1
+    return counts
+#--------------------------------------------------------------------------
+def _key_step(tag, key, counts, node, other=None):
+    """
+    returns a path step selecting node among its same tag siblings by the
+    text of its key child, or None if the key does not single it out or
+    the changes to the matching element other could change it.  counts
+    is the _key_counts() of the siblings.
+    """
+    child = node.find(key)
+    if child is None or len(child):
+        return None
+    if other is not None:
+        other_child = other.find(key)
+        if other_child is not None and len(other_child):
+            return None
+    value = child.text or ""
+    # the predicate compares the raw text, the counts the stripped text
+    if value != value.strip() or counts.get(value) != 1:
+        return None
+    if "'" not in value:
+        return "%s[%s='%s']" % (tag, key, value)
+    elif '"' not in value:
+        return '%s[%s="%s"]' % (tag, key, value)
+    return None
+#--------------------------------------------------------------------------
+def _operation(change):
+    """returns a Change as a MetadataPatch operation"""
+    if change.op == 'remove':
+        return {"op" : "remove", "path" : change.path}
+    elif change.op == 'append':
+        return {"op" : "append", "path" : change.path, "value" : change.new,
+                "unique" : False}
+    return {"op" : "set", "path" : change.path, "value" : change.new}
+########################################################################
+class MetadataDiff(object):
+    """
+    The changes that turn one metadata document into another, in the
+    order they have to be applied.  Each Change has an op ('set',
+    'remove' or 'append'), a path relative to the root (see
+    Paperwork.get()), and the old and new values in the format of
+    convert().
+
+    Repeated elements matched by content or key are compared
+    regardless of their order, and appended elements are added after
+    their existing siblings, so applying the diff gives a document with
+    the same content, not necessarily the same order.
+    """
+    changes = None
+    #----------------------------------------------------------------------
+    def __init__(self, changes):
+        """Constructor"""
+        self.changes = list(changes)
+    #----------------------------------------------------------------------
+    def __len__(self):
+        return len(self.changes)
+    #----------------------------------------------------------------------
+    def __iter__(self):
+        return iter(self.changes)
+    #----------------------------------------------------------------------
+    def __str__(self):
+        lines = []
+        for change in self.changes:
+            if change.op == 'set':
+                lines.append("~ %s: %r -> %r" % (change.path, change.old,
+                                                 change.new))
+            elif change.op == 'remove':
+                lines.append("- %s" % change.path)
+            else:
+                lines.append("+ %s: %r" % (change.path, change.new))
+        return "\n".join(lines)
+    #----------------------------------------------------------------------
+    def operations(self):
+        """returns the changes as MetadataPatch operations"""
+        return [_operation(change) for change in self.changes]
+    #----------------------------------------------------------------------
+    def patch(self):
+        """returns a MetadataPatch applying the changes"""
+        return MetadataPatch(self.operations())
+    #----------------------------------------------------------------------
+    def apply_tree(self, root, on_change=None):
+        """
+        applies the changes to an element tree and returns the indexes of
+        the changes that changed it, as MetadataPatch.apply_tree() would.
+
+        The paths diff() writes are resolved through an index of each
+        parent's children by tag and by key text, kept up to date as
+        elements are removed and appended, so a diff over thousands of
+        repeated elements is applied in linear time.  Other paths, and
+        sets that have to create their path, go through MetadataPatch.
+        """
+        on_change = on_change or (lambda section: None)
+        index = _ChildIndex()
+        changed = []
+        for position, change in enumerate(self.changes):
+            parsed = _parse_path(change.path)
+            if parsed is not None and \
+               (change.op, parsed[1] is None) in (('set', True),
+                                                  ('append', False)):
+                # element sets and attribute appends are left to the patch
+                parsed = None
+            if parsed is None or not _apply_change(root, change, parsed,
+                                                   index, on_change):
+                if parsed is not None and (change.op == 'remove' or
+                                           not _needs_patch(root, change,
+                                                            parsed, index)):
+                    continue
+                if MetadataPatch(_operation(change)).apply_tree(root,
+                                                                on_change):
+                    changed.append(position)
+                index.clear()
+                continue
+            changed.append(position)
+        return changed
+########################################################################
+class _ChildIndex(object):
+    """
+    the children of the parents a diff is applied to, by tag and by key
+    text, built on first use and updated as elements are removed and
+    appended
+    """
+    #----------------------------------------------------------------------
+    def __init__(self):
+        self._parents = {}
+    #----------------------------------------------------------------------
+    def clear(self):
+        self._parents.clear()
+    #----------------------------------------------------------------------
+    def _entry(self, parent):
+        entry = self._parents.get(id(parent))
+        if entry is None:
+            tags = {}
+            for child in parent:
+                tags.setdefault(child.tag, []).append(child)
+            entry = self._parents[id(parent)] = (parent, tags, {})
+        return entry
+    #----------------------------------------------------------------------
+    def children(self, parent, tag):
+        """returns the children of parent with a tag, in order"""
+        return self._entry(parent)[1].get(tag, [])
+    #----------------------------------------------------------------------
+    def keyed(self, parent, tag, key, value):
+        """returns the tag children of parent with a key child of value"""
+        parent, tags, keys = self._entry(parent)
+        values = keys.get((tag, key))
+        if values is None:
+            values = keys[(tag, key)] = {}
+            for child in tags.get(tag, []):
+                self._add_key(values, child, key)
+        return values.get(value, [])
+    #----------------------------------------------------------------------
+    @staticmethod
+    def _add_key(values, node, key):
+        for text in set("".join(k.itertext()) for k in node.findall(key)):
+            values.setdefault(text, []).append(node)
+    #----------------------------------------------------------------------
+    def removed(self, parent, node):
+        """records that node was removed from parent"""
+        entry = self._parents.get(id(parent))
+        if entry is None:
+            return
+        entry[1][node.tag].remove(node)
+        for (tag, key), values in entry[2].items():
+            if tag == node.tag:
+                for text in set("".join(k.itertext())
+                                for k in node.findall(key)):
+                    values[text].remove(node)
+    #----------------------------------------------------------------------
+    def appended(self, parent, node):
+        """records that node was added after its same tag siblings"""
+        entry = self._parents.get(id(parent))
+        if entry is None:
+            return
+        entry[1].setdefault(node.tag, []).append(node)
+        for (tag, key), values in entry[2].items():
+            if tag == node.tag:
+                self._add_key(values, node, key)
+    #----------------------------------------------------------------------
+    def text_changed(self, node, parent, grandparent):
+        """
+        drops the key lookup of grandparent that node, the child of
+        parent, takes part in, after the text of node changed or node
+        was added or removed
+        """
+        if parent is None or grandparent is None:
+            return
+        entry = self._parents.get(id(grandparent))
+        if entry is not None:
+            entry[2].pop((parent.tag, node.tag), None)
+#--------------------------------------------------------------------------
+_STEP = re.compile(r"((?:\{[^}]*\})?[^/\[{@#]+)(?:\[(?:(\d+)|([^=\]]+)="
+                   r"(?:'([^']*)'|\"([^\"]*)\"))\])?(?:/|$)")
+#--------------------------------------------------------------------------
+def _parse_path(path):
+    """
+    returns (steps, target) for a path of the form diff() writes, where
+    steps are (tag, position, key, value) and target is '@name', '#text'
+    or None, or None for any other path
+    """
+    steps = []
+    position = 0
+    while position < len(path):
+        if path[position] in "@#":
+            target = path[position:]
+            if target != "#text" and (target[:1] != "@" or "/" in
+                                      target.split("}")[-1]):
+                return None
+            return steps, target
+        match = _STEP.match(path, position)
+        if match is None or match.end() == position:
+            return None
+        tag, number, key, quoted, double = match.groups()
+        value = quoted if quoted is not None else double
+        steps.append((tag, int(number) if number else None, key, value))
+        position = match.end()
+    return steps, None
+#--------------------------------------------------------------------------
+def _resolve(root, steps, index):
+    """returns (node, parent, grandparent) for every node steps select"""
+    found = [(root, None, None)]
+    for tag, number, key, value in steps:
+        selected = []
+        for node, parent, grandparent in found:
+            if number is not None:
+                children = index.children(node, tag)
+                children = children[number - 1:number] if number > 0 else []
+            elif key is not None:
+                children = index.keyed(node, tag, key, value)
+            else:
+                children = index.children(node, tag)
+            selected.extend((child, node, parent) for child in children)
+        found = selected
+    return found
+#--------------------------------------------------------------------------
+def _needs_patch(root, change, parsed, index):
+    """returns True if a change that selected nothing has to be created"""
+    steps, target = parsed
+    if change.op == 'append':
+        steps = steps[:-1]
+    return not _resolve(root, steps, index)
+#--------------------------------------------------------------------------
+def _apply_change(root, change, parsed, index, on_change):
+    """
+    applies one change through the index.  Returns True if the tree
+    changed, False if it did not or if the path selected nothing.
+    """
+    steps, target = parsed
+    section = steps[0][0] if steps else root.tag
+    if change.op == 'append':
+        if target is not None or not steps:
+            return False
+        tag = steps[-1][0]
+        parents = _resolve(root, steps[:-1], index)
+        for parent, grandparent, ancestor in parents:
+            siblings = index.children(parent, tag)
+            node = ET.Element(tag)
+            fill_element(node, change.new)
+            if not siblings or siblings[-1] is parent[-1]:
+                parent.append(node)
+            else:
+                parent.insert(list(parent).index(siblings[-1]) + 1, node)
+            index.appended(parent, node)
+            index.text_changed(node, parent, grandparent)
+            on_change(tag if parent is root else section)
+        return bool(parents)
+    changed = False
+    for node, parent, grandparent in _resolve(root, steps, index):
+        if target is None:
+            if change.op != 'remove' or parent is None:
+                return False
+            parent.remove(node)
+            index.removed(parent, node)
+            index.text_changed(node, parent, grandparent)
+        elif target == "#text":
+            if change.op == 'set':
+                if (node.text or "").strip() == change.new:
+                    continue
+                node.text = change.new
+            elif node.text and node.text.strip():
+                node.text = None
+            else:
+                continue
+            index.text_changed(node, parent, grandparent)
+        else:
+            name = target[1:]
+            if change.op == 'set':
+                if node.get(name) == change.new:
+                    continue
+                node.set(name, change.new)
+            elif name in node.attrib:
+                del node.attrib[name]
+            else:
+                continue
+        changed = True
+        on_change(section)
+    return changed
+#--------------------------------------------------------------------------
+def diff(source, target, keys=None, exclude=None):
+    """
+    compares two metadata element trees and returns the MetadataDiff
+    that turns source into target.
+
+    Inputs:
+       source - root element of the document to change.
+       target - root element of the document to match.
+       keys - optional - dictionary of repeated element tag to the tag of
+        the child whose text identifies it.  Defaults to KEYS.
+       exclude - optional - element paths to ignore, as fnmatch patterns
+        against the slash separated path (see converters.VOLATILE) or a
+        function taking the path.
+    """
+    if source.tag != target.tag:
+        raise ValueError("the documents have different roots: <%s>, <%s>" %
+                         (source.tag, target.tag))
+    keys = KEYS if keys is None else keys
+    skip = _path_filter(exclude)
+    digests = subtree_digests(source, skip)
+    digests.update(subtree_digests(target, skip))
+    changes = []
+    if digests[source] == digests[target]:
+        return MetadataDiff(changes)
+    # tasks are ('diff', a, b, path, full path) or ('emit', Change), run
+    # last in first out, so the removals and additions of a group are
+    # emitted after the changes inside its matched elements, whose paths
+    # may count positions
+    tasks = [('diff', source, target, "", source.tag)]
+    while tasks:
+        task = tasks.pop()
+        if task[0] == 'emit':
+            changes.append(task[1])
+            continue
+        a, b, path, full = task[1:]
+        prefix = path + "/" if path else ""
+        for name, value in b.attrib.items():
+            if a.get(name) != value:
+                changes.append(Change('set', prefix + "@" + name,
+                                      a.get(name), value))
+        for name, value in a.attrib.items():
+            if name not in b.attrib:
+                changes.append(Change('remove', prefix + "@" + name,
+                                      value, None))
+        text_a = (a.text or "").strip()
+        text_b = (b.text or "").strip()
+        if text_a != text_b:
+            if text_b:
+                changes.append(Change('set', prefix + "#text", text_a or None,
+                                      text_b))
+            else:
+                changes.append(Change('remove', prefix + "#text", text_a,
+                                      None))
+        groups = []
+        children_a = {}
+        children_b = {}
+        for side, node in ((children_a, a), (children_b, b)):
+            for child in node:
+                if skip is not None and skip(full + "/" + child.tag):
+                    continue
+                if child.tag not in children_a and \
+                   child.tag not in children_b:
+                    groups.append(child.tag)
+                side.setdefault(child.tag, []).append(child)
+        pending = []
+        for tag in groups:
+            pending.extend(_diff_group(tag, children_a.get(tag, []),
+                                       children_b.get(tag, []), prefix,
+                                       full, keys.get(tag), digests))
+        tasks.extend(reversed(pending))
+    return MetadataDiff(changes)
+#--------------------------------------------------------------------------
+def _diff_group(tag, old, new, prefix, full, key, digests):
+    """
+    returns the tasks comparing the same tag children of two matched
+    elements: diff tasks for matched pairs that differ, then emit tasks
+    for the removed and the added elements
+    """
+    if not new:
+        return [('emit', Change('remove', prefix + tag,
+                                [element_value(n) for n in old], None))]
+    tasks = []
+    if len(old) == 1 and len(new) == 1:
+        if digests[old[0]] != digests[new[0]]:
+            tasks.append(('diff', old[0], new[0], prefix + tag,
+                          full + "/" + tag))
+        return tasks
+    unmatched = {}
+    for position, node in enumerate(new):
+        unmatched.setdefault(digests[node], deque()).append(position)
+    pairs = []
+    left = []
+    for node in old:
+        positions = unmatched.get(digests[node])
+        if positions:
+            positions.popleft()
+        else:
+            left.append(node)
+    right = sorted(p for positions in unmatched.values() for p in positions)
+    right = [new[p] for p in right]
+    if key is not None:
+        by_key = {}
+        for node in right:
+            text = _key_text(node, key)
+            if text is not None:
+                by_key.setdefault(text, deque()).append(node)
+        remaining = []
+        for node in left:
+            text = _key_text(node, key)
+            match = by_key.get(text) if text is not None else None
+            if match:
+                pairs.append((node, match.popleft()))
+            else:
+                remaining.append(node)
+        matched = set(id(b) for a, b in pairs)
+        left = remaining
+        right = [node for node in right if id(node) not in matched]
+    else:
+        count = min(len(left), len(right))
+        pairs = list(zip(left[:count], right[:count]))
+        left = left[count:]
+        right = right[count:]
+    positions = dict((id(node), i + 1) for i, node in enumerate(old))
+    counts = _key_counts(old, key) if key is not None else None
+    #----------------------------------------------------------------------
+    def step(node, other=None):
+        if len(old) == 1:
+            return tag
+        if key is not None:
+            keyed = _key_step(tag, key, counts, node, other)
+            if keyed is not None:
+                return keyed
+        return "%s[%d]" % (tag, positions[id(node)])
+    for a, b in pairs:
+        tasks.append(('diff', a, b, prefix + step(a, b), full + "/" + tag))
+    for node in sorted(left, key=lambda n: -positions[id(n)]):
+        tasks.append(('emit', Change('remove', prefix + step(node),
+                                     element_value(node), None)))
+    for node in right:
+        tasks.append(('emit', Change('append', prefix + tag, None,
+                                     element_value(node))))
+    return tasks
+#--------------------------------------------------------------------------
+def diff_datasets(source, target, keys=None, exclude=None):
+    """
+    returns the MetadataDiff that turns the metadata of the source
+    dataset into that of the target dataset.  Either can also be a
+    Paperwork object.
+    """
+    try:
+        if not isinstance(source, Paperwork):
+            source = Paperwork(dataset=source)
+        if not isinstance(target, Paperwork):
+            target = Paperwork(dataset=target)
+        return diff(source._getroot(), target._getroot(), keys, exclude)
+    except:
+        line, filename, synerror = trace()
+        raise HermesErrorHandler(
+            {
+                "function": "diff_datasets",
+                "line": line,
+                "filename": filename,
+                "synerror": synerror,
+                "arc" : synerror
+            }
+        )
+#--------------------------------------------------------------------------
+def _diff_pair(dataset, targets, keys=None, exclude=None):
+    return diff_datasets(dataset, targets[dataset], keys, exclude)
+#--------------------------------------------------------------------------
+def diff_all(pairs, keys=None, exclude=None, workers=1, pool="thread"):
+    """
+    compares many pairs of datasets, e.g. every staging dataset with its
+    production copy, on a PaperworkCollection.
+
+    Inputs:
+       pairs - dictionary of source dataset to target dataset.
+       keys, exclude - optional - see diff().
+       workers - optional - number of threads or processes, see
+        PaperworkCollection.  1 (the default) compares the pairs in the
+        calling thread.
+       pool - optional - "thread" or "process".  The comparisons export
+        metadata with arcpy, which is not thread safe, so use "process"
+        to compare pairs in parallel.
+    Output:
+       generator of collection Results, one per source dataset, whose
+       value is the MetadataDiff.
+    """
+    collection = PaperworkCollection(list(pairs), workers=workers, pool=pool)
+    return collection._run(_diff_pair, keys, exclude, lookup=dict(pairs))
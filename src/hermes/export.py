@@ -0,0 +1,219 @@
+"""
+Streams the metadata of many datasets to a JSON Lines file, one record
+per dataset:
+
+  {"dataset": ..., "properties": {...}, "metadata": {...}}
+
+Records are written in batches.  After each batch the output is synced
+to disk and one line is appended to a checkpoint file with the output
+offset and the datasets of the batch:
+
+  {"offset": ..., "datasets": [...]}
+
+The checkpoint is synced too, so an export that crashed can be run again
+and continues after the last complete batch.  A checkpoint line cut
+short by the crash is ignored.
+Gzip output is written as one gzip member per batch, which any gzip
+reader reads as a single stream.
+
+Usage Example:
+
+  >>> exporter = JsonLinesExporter(r"c:\\temp\\catalog.jsonl.gz")
+  >>> print(exporter.export(PaperworkCollection(workspace=gdb).datasets))
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import gzip
+import json
+from .common import *
+from .paperwork import Paperwork
+from .collection import PaperworkCollection
+
+try:
+    import orjson
+    def dumps(obj):
+        """encodes an object as a line of utf-8 json"""
+        return orjson.dumps(obj) + b"\n"
+except ImportError:
+    try:
+        import ujson as _json
+    except ImportError:
+        try:
+            import simplejson as _json
+        except ImportError:
+            import json as _json
+    def dumps(obj):
+        """encodes an object as a line of utf-8 json"""
+        return (_json.dumps(obj) + "\n").encode('utf-8')
+#--------------------------------------------------------------------------
+def _record(dataset, properties=True, exclude=None):
+    """builds the export record of one dataset"""
+    with Paperwork(dataset=dataset) as pw:
+        return {
+            "dataset" : dataset,
+            "properties" : pw.datasetProperties if properties else None,
+            "metadata" : pw.convert(exclude=exclude)
+        }
+########################################################################
+class JsonLinesExporter(object):
+    """
+    Writes dataset metadata records to a JSON Lines file.
+
+    Inputs:
+       path - output file.  A path ending in .gz is gzip compressed
+        unless compress says otherwise.
+       compress - optional - True for gzip, False for plain text.
+       checkpoint - optional - checkpoint file path, defaults to the
+        output path + '.checkpoint'.
+       batch_size - optional - number of records between checkpoints.
+       properties - optional - include Paperwork.datasetProperties.
+       exclude - optional - element paths left out of the metadata, see
+        Paperwork.convert(), e.g. ['metadata/Binary'].
+       workers - optional - number of threads reading metadata.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, path, compress=None, checkpoint=None, batch_size=100,
+                 properties=True, exclude=None, workers=1):
+        """Constructor"""
+        self.path = path
+        self.compress = path.lower().endswith(".gz") if compress is None \
+                        else bool(compress)
+        self.checkpoint = checkpoint or path + ".checkpoint"
+        self.batch_size = max(1, int(batch_size))
+        self.properties = properties
+        self.exclude = exclude
+        self.workers = max(1, int(workers))
+    #----------------------------------------------------------------------
+    def _load_checkpoint(self):
+        """
+        returns the exported datasets, the output offset of the last
+        complete batch and the length of the checkpoint up to its last
+        complete record.  Reading stops at a record that is not newline
+        terminated or does not parse, as left by a crash while writing it.
+        """
+        done = set()
+        offset = 0
+        length = 0
+        if os.path.isfile(self.checkpoint):
+            with open(self.checkpoint, 'rb') as reader:
+                for line in reader:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line.decode('utf-8'))
+                        position = int(record["offset"])
+                        datasets = list(record["datasets"])
+                    except (ValueError, KeyError, TypeError):
+                        break
+                    offset = position
+                    done.update(datasets)
+                    length += len(line)
+        return done, offset, length
+    #----------------------------------------------------------------------
+    def _records(self, batch):
+        """yields the (dataset, record, error) of a batch"""
+        if self.workers == 1:
+            for dataset in batch:
+                try:
+                    yield dataset, _record(dataset, self.properties,
+                                           self.exclude), None
+                except Exception as e:
+                    yield dataset, None, str(e)
+            return
+        collection = PaperworkCollection(batch, workers=self.workers,
+                                         chunksize=1)
+        for result in collection._run(_record, self.properties, self.exclude):
+            yield result
+    #----------------------------------------------------------------------
+    def _write_batch(self, output, checkpoint, batch, summary):
+        """writes one batch of records and checkpoints it"""
+        if self.compress:
+            writer = gzip.GzipFile(fileobj=output, mode='wb')
+        else:
+            writer = output
+        written = []
+        for dataset, record, error in self._records(batch):
+            if error is not None:
+                summary["failed"] += 1
+                summary["errors"].append((dataset, error))
+                continue
+            writer.write(dumps(record))
+            written.append(dataset)
+        if self.compress:
+            writer.close()
+        output.flush()
+        os.fsync(output.fileno())
+        checkpoint.write(dumps({"offset" : output.tell(),
+                                "datasets" : written}))
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+        summary["written"] += len(written)
+    #----------------------------------------------------------------------
+    def export(self, datasets, resume=True):
+        """
+        exports the metadata of every dataset in an iterable, reading it
+        one batch at a time.
+
+        Inputs:
+           datasets - iterable of dataset paths.
+           resume - optional - if True and a checkpoint exists, datasets
+            that were already exported are skipped and the output is
+            continued after the last complete batch.  If False the
+            export starts over.
+        Output:
+           dictionary with the counts of written, skipped and failed
+           datasets and the (dataset, error) pairs of the failures.
+        """
+        try:
+            if resume:
+                done, offset, length = self._load_checkpoint()
+            else:
+                done, offset, length = set(), 0, 0
+            summary = {"written" : 0, "skipped" : 0, "failed" : 0,
+                       "errors" : []}
+            mode = 'r+b' if os.path.isfile(self.path) else 'wb'
+            checkpoint_mode = 'r+b' if os.path.isfile(self.checkpoint) \
+                              else 'wb'
+            with open(self.path, mode) as output, \
+                 open(self.checkpoint, checkpoint_mode) as checkpoint:
+                output.truncate(offset)
+                output.seek(offset)
+                # drops a partial record left by a crash
+                checkpoint.truncate(length)
+                checkpoint.seek(length)
+                batch = []
+                for dataset in datasets:
+                    if dataset in done:
+                        summary["skipped"] += 1
+                        continue
+                    batch.append(dataset)
+                    if len(batch) >= self.batch_size:
+                        self._write_batch(output, checkpoint, batch, summary)
+                        batch = []
+                if batch:
+                    self._write_batch(output, checkpoint, batch, summary)
+            return summary
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "export",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : synerror
+                }
+            )
@@ -0,0 +1,254 @@
+"""
+A persistent search index over the metadata of many datasets.  The
+converted metadata is flattened into a table of path/value rows and an
+inverted keyword table in a local SQLite file, so catalog wide questions
+("which datasets have keyword X", "which have no abstract") can be
+answered without arcpy.
+
+Usage Example:
+
+  >>> index = MetadataIndex(r"c:\\temp\\catalog.sqlite")
+  >>> index.refresh(PaperworkCollection(workspace=r"c:\\temp\\scratch.gdb"))
+  >>> index.keyword("parcels")
+  >>> index.missing("metadata/dataIdInfo/idAbs")
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import time
+import sqlite3
+from .common import *
+from .paperwork import Paperwork
+from .collection import PaperworkCollection
+
+KEYWORD_TAGS = ('keyword', 'themekey', 'placekey', 'stratkey', 'tempkey')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    indexed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    dataset TEXT NOT NULL,
+    path TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_path ON items (path, value);
+CREATE INDEX IF NOT EXISTS items_dataset ON items (dataset);
+CREATE TABLE IF NOT EXISTS keywords (
+    keyword TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    PRIMARY KEY (keyword, dataset)
+);
+CREATE INDEX IF NOT EXISTS keywords_dataset ON keywords (dataset);
+"""
+#--------------------------------------------------------------------------
+def flatten(d):
+    """
+    yields a (path, value) pair for every non-empty text and attribute
+    value of a converted metadata dictionary.  Paths are slash separated
+    from the root tag; attributes end in '/@name' and repeated elements
+    share a path.
+    """
+    stack = [("", d)]
+    while stack:
+        path, value = stack.pop()
+        if isinstance(value, dict):
+            for k, v in value.items():
+                if k == '#text':
+                    if v:
+                        yield path, v
+                elif k.startswith('@'):
+                    if v:
+                        yield path + "/" + k, v
+                else:
+                    stack.append((path + "/" + k if path else k, v))
+        elif isinstance(value, list):
+            stack.extend((path, v) for v in value)
+        elif value:
+            yield path, value
+#--------------------------------------------------------------------------
+def _index_record(dataset, known):
+    """returns the fingerprint and, if it changed, the flattened metadata"""
+    pw = Paperwork(dataset=dataset)
+    fingerprint = pw.fingerprint()
+    if known.get(dataset) == fingerprint:
+        return fingerprint, None
+    return fingerprint, list(flatten(pw.convert()))
+########################################################################
+class MetadataIndex(object):
+    """
+    A SQLite backed index of flattened metadata.
+
+    refresh() only converts the datasets whose metadata fingerprint
+    changed since they were last indexed.  The query methods read the
+    SQLite file only and never call arcpy.
+
+    Inputs:
+       path - path of the SQLite file.  It is created if needed;
+        ":memory:" keeps the index in memory.
+    """
+    _connection = None
+    #----------------------------------------------------------------------
+    def __init__(self, path):
+        """Constructor"""
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+    #----------------------------------------------------------------------
+    def __enter__(self):
+        return self
+    #----------------------------------------------------------------------
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+    #----------------------------------------------------------------------
+    def close(self):
+        """closes the SQLite file"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+    #----------------------------------------------------------------------
+    def _write(self, dataset, fingerprint, items):
+        """replaces the rows of one dataset"""
+        c = self._connection
+        c.execute("DELETE FROM items WHERE dataset = ?", (dataset,))
+        c.execute("DELETE FROM keywords WHERE dataset = ?", (dataset,))
+        c.executemany("INSERT INTO items VALUES (?, ?, ?)",
+                      ((dataset, path, value) for path, value in items))
+        c.executemany("INSERT OR IGNORE INTO keywords VALUES (?, ?)",
+                      ((value.strip().lower(), dataset)
+                       for path, value in items
+                       if path.rsplit("/", 1)[-1] in KEYWORD_TAGS))
+        c.execute("INSERT OR REPLACE INTO datasets VALUES (?, ?, ?)",
+                  (dataset, fingerprint, time.time()))
+    #----------------------------------------------------------------------
+    def add(self, dataset, d, fingerprint=""):
+        """
+        indexes an already converted metadata dictionary for a dataset,
+        replacing what was indexed for it before.
+        """
+        with self._connection:
+            self._write(dataset, fingerprint, list(flatten(d)))
+    #----------------------------------------------------------------------
+    def remove(self, dataset):
+        """removes a dataset from the index"""
+        with self._connection:
+            c = self._connection
+            c.execute("DELETE FROM items WHERE dataset = ?", (dataset,))
+            c.execute("DELETE FROM keywords WHERE dataset = ?", (dataset,))
+            c.execute("DELETE FROM datasets WHERE dataset = ?", (dataset,))
+    #----------------------------------------------------------------------
+    def refresh(self, datasets, workers=1, prune=False):
+        """
+        brings the index up to date for a list of datasets or a
+        PaperworkCollection.  Datasets whose metadata fingerprint matches
+        the indexed one are not converted again.
+
+        Inputs:
+           datasets - list of dataset paths or a PaperworkCollection.
+           workers - optional - number of threads used to read the
+            metadata when datasets is a list.
+           prune - optional - if True, indexed datasets that are not in
+            datasets are removed.
+        Output:
+           dictionary with the counts of added, updated, unchanged,
+           removed and failed datasets, and the failed results.
+        """
+        if not isinstance(datasets, PaperworkCollection):
+            datasets = PaperworkCollection(datasets, workers=workers)
+        known = dict(self._connection.execute(
+            "SELECT dataset, fingerprint FROM datasets"))
+        summary = {"added" : 0, "updated" : 0, "unchanged" : 0,
+                   "removed" : 0, "failed" : 0, "errors" : []}
+        seen = set()
+        with self._connection:
+            for result in datasets._run(_index_record, lookup=known):
+                seen.add(result.dataset)
+                if not result.ok:
+                    summary["failed"] += 1
+                    summary["errors"].append(result)
+                    continue
+                fingerprint, items = result.value
+                if items is None:
+                    summary["unchanged"] += 1
+                    continue
+                summary["updated" if result.dataset in known else "added"] += 1
+                self._write(result.dataset, fingerprint, items)
+        if prune:
+            for dataset in set(known) - seen:
+                self.remove(dataset)
+                summary["removed"] += 1
+        return summary
+    #----------------------------------------------------------------------
+    def _datasets(self, sql, params=()):
+        """returns the sorted dataset column of a query"""
+        return [row[0] for row in self._connection.execute(sql, params)]
+    #----------------------------------------------------------------------
+    def datasets(self):
+        """returns the indexed datasets"""
+        return self._datasets("SELECT dataset FROM datasets ORDER BY dataset")
+    #----------------------------------------------------------------------
+    def fingerprint(self, dataset):
+        """returns the indexed fingerprint of a dataset or None"""
+        row = self._connection.execute(
+            "SELECT fingerprint FROM datasets WHERE dataset = ?",
+            (dataset,)).fetchone()
+        return row[0] if row else None
+    #----------------------------------------------------------------------
+    def keyword(self, keyword):
+        """returns the datasets with a keyword (case insensitive)"""
+        return self._datasets(
+            "SELECT dataset FROM keywords WHERE keyword = ? ORDER BY dataset",
+            (keyword.strip().lower(),))
+    #----------------------------------------------------------------------
+    def find(self, path, value=None, contains=None):
+        """
+        returns the datasets that have a value at path.
+
+        Inputs:
+           path - slash separated path from the root tag, e.g.
+            'metadata/dataIdInfo/idCitation/resTitle'.  '*' and '?' are
+            wildcards.
+           value - optional - the exact value to look for.
+           contains - optional - text the value has to contain (case
+            insensitive).
+        """
+        sql = "SELECT DISTINCT dataset FROM items WHERE path %s ?" % \
+              ("GLOB" if "*" in path or "?" in path else "=")
+        params = [path]
+        if value is not None:
+            sql += " AND value = ?"
+            params.append(value)
+        if contains is not None:
+            sql += " AND value LIKE ? ESCAPE '\\'"
+            params.append("%" + contains.replace("\\", "\\\\")
+                          .replace("%", "\\%").replace("_", "\\_") + "%")
+        return self._datasets(sql + " ORDER BY dataset", params)
+    #----------------------------------------------------------------------
+    def missing(self, path):
+        """returns the indexed datasets with no value at path"""
+        return self._datasets(
+            "SELECT dataset FROM datasets WHERE dataset NOT IN "
+            "(SELECT dataset FROM items WHERE path = ?) ORDER BY dataset",
+            (path,))
+    #----------------------------------------------------------------------
+    def values(self, dataset, path=None):
+        """returns the (path, value) pairs indexed for a dataset"""
+        sql = "SELECT path, value FROM items WHERE dataset = ?"
+        params = [dataset]
+        if path is not None:
+            sql += " AND path = ?"
+            params.append(path)
+        return [tuple(row) for row in
+                self._connection.execute(sql + " ORDER BY rowid", params)]
@@ -0,0 +1,195 @@
+"""
+A manifest records the metadata fingerprint of every harvested dataset,
+so the next harvest only has to process the datasets whose metadata
+changed since.  Fingerprints are taken over the canonical content of the
+exported document (see converters.canonical_digest) and by default leave
+out the ModDate/ModTime and SyncDate/SyncTime stamps, which ArcGIS
+rewrites without the metadata itself changing.
+
+Usage Example:
+
+  >>> manifest = Manifest(r"c:\\temp\\harvest.manifest")
+  >>> changes = manifest.compare(PaperworkCollection(workspace=gdb))
+  >>> exporter.export(changes.datasets)
+  >>> manifest.update(changes)
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import json
+import tempfile
+from .common import *
+from .converters import VOLATILE
+from .paperwork import Paperwork
+from .collection import PaperworkCollection
+
+VERSION = 1
+#--------------------------------------------------------------------------
+def _fingerprint(dataset, exclude):
+    return Paperwork(dataset=dataset).fingerprint(canonical=True,
+                                                  exclude=exclude)
+########################################################################
+class ManifestChanges(object):
+    """
+    The result of comparing datasets against a manifest.
+
+    added - datasets that are not in the manifest.
+    changed - datasets whose fingerprint differs from the manifest.
+    unchanged - datasets whose fingerprint matches the manifest.
+    removed - manifest datasets that were not in the compared datasets.
+    failed - dictionary of dataset to error message.
+    fingerprints - dictionary of dataset to its current fingerprint.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self):
+        """Constructor"""
+        self.added = []
+        self.changed = []
+        self.unchanged = []
+        self.removed = []
+        self.failed = {}
+        self.fingerprints = {}
+    #----------------------------------------------------------------------
+    @property
+    def datasets(self):
+        """gets the added and changed datasets, the ones to harvest"""
+        return self.added + self.changed
+    #----------------------------------------------------------------------
+    def __str__(self):
+        return "%d added, %d changed, %d unchanged, %d removed, %d failed" % \
+               (len(self.added), len(self.changed), len(self.unchanged),
+                len(self.removed), len(self.failed))
+########################################################################
+class Manifest(object):
+    """
+    A file mapping dataset paths to metadata fingerprints.
+
+    Inputs:
+       path - path of the manifest file.  It does not need to exist yet.
+       exclude - optional - element paths left out of the fingerprints,
+        see Paperwork.fingerprint().  A manifest written with other
+        exclusions is ignored, so every dataset counts as added.
+    """
+    path = None
+    exclude = None
+    _entries = None
+    #----------------------------------------------------------------------
+    def __init__(self, path, exclude=VOLATILE):
+        """Constructor"""
+        self.path = path
+        self.exclude = list(exclude or [])
+    #----------------------------------------------------------------------
+    @property
+    def entries(self):
+        """gets the dictionary of dataset to fingerprint in the manifest"""
+        if self._entries is None:
+            self._entries = {}
+            if os.path.isfile(self.path):
+                with open(self.path, 'rb') as reader:
+                    content = json.loads(reader.read().decode('utf-8'))
+                if content.get("version") == VERSION and \
+                   content.get("exclude") == self.exclude:
+                    self._entries = content.get("datasets", {})
+        return self._entries
+    #----------------------------------------------------------------------
+    def compare(self, datasets, workers=1):
+        """
+        fingerprints a list of datasets or a PaperworkCollection and
+        compares them with the manifest.  The manifest is not changed;
+        pass the result to update() once the changes are processed.
+        """
+        try:
+            if not isinstance(datasets, PaperworkCollection):
+                datasets = PaperworkCollection(datasets, workers=workers)
+            entries = self.entries
+            changes = ManifestChanges()
+            for result in datasets._run(_fingerprint, self.exclude):
+                if not result.ok:
+                    changes.failed[result.dataset] = result.error
+                    continue
+                changes.fingerprints[result.dataset] = result.value
+                known = entries.get(result.dataset)
+                if known is None:
+                    changes.added.append(result.dataset)
+                elif known != result.value:
+                    changes.changed.append(result.dataset)
+                else:
+                    changes.unchanged.append(result.dataset)
+            seen = set(changes.fingerprints) | set(changes.failed)
+            changes.removed = sorted(set(entries) - seen)
+            for names in (changes.added, changes.changed, changes.unchanged):
+                names.sort()
+            return changes
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "compare",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : synerror
+                }
+            )
+    #----------------------------------------------------------------------
+    def changed(self, datasets, workers=1):
+        """
+        returns the datasets whose metadata was added or changed since
+        the manifest was written, and writes the new fingerprints.
+        """
+        changes = self.compare(datasets, workers)
+        self.update(changes)
+        return changes.datasets
+    #----------------------------------------------------------------------
+    def update(self, changes, prune=True):
+        """
+        records the fingerprints of a compare() result and writes the
+        manifest.  Failed datasets keep their previous fingerprint.
+
+        Inputs:
+           changes - ManifestChanges from compare().
+           prune - optional - if True, removed datasets are dropped from
+            the manifest.
+        """
+        entries = dict(self.entries)
+        entries.update(changes.fingerprints)
+        if prune:
+            for dataset in changes.removed:
+                entries.pop(dataset, None)
+        self.save(entries)
+    #----------------------------------------------------------------------
+    def save(self, entries=None):
+        """writes the manifest, replacing the previous file in one step"""
+        if entries is not None:
+            self._entries = entries
+        content = json.dumps({"version" : VERSION,
+                              "exclude" : self.exclude,
+                              "datasets" : self.entries},
+                             indent=0, sort_keys=True)
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, temp = tempfile.mkstemp(".manifest", dir=folder)
+        try:
+            with os.fdopen(fd, 'wb') as writer:
+                writer.write(content.encode('utf-8'))
+            if hasattr(os, "replace"):
+                os.replace(temp, self.path)
+            else:
+                if os.path.isfile(self.path):
+                    os.remove(self.path)
+                os.rename(temp, self.path)
+        except:
+            if os.path.isfile(temp):
+                os.remove(temp)
+            raise
@@ -24,11 +24,25 @@ from __future__ import print_function
 from __future__ import absolute_import
 import os
 import arcpy
+import io
 import json
+import hashlib
 import tempfile
-import xml.etree.cElementTree as ET
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 from .common import *
-from collections import defaultdict
+from .converters import metadata_to_dictionary, dictionary_to_metadata, \
+     iterparse_to_dictionary, fill_element, canonical_digest, \
+     write_dictionary, write_element
+from .view import MetadataView
+from .compact import MetadataNode
+from .payload import find_payloads, attach_payloads
+from .xpath import compile_path, set_path
+from .scratch import get_scratch, place_file, ScratchFile
+from .describe import dataset_properties
+from . import stats
 from .version import __version__
 ########################################################################
 class Paperwork(object):
@@ -47,6 +61,16 @@ class Paperwork(object):
       >>> pw = Paperwork(dataset=fc)
       >>> print pw.convert()
 
+    Paperwork objects can be used as context managers; the temporary
+    files are removed when the block ends:
+
+      >>> with Paperwork(dataset=fc) as pw:
+      ...     print pw.convert()
+
+    The metadata is not exported from the dataset until it is first
+    needed (convert, json, str, xmlfile or exportToXML).  Pass
+    preload=True, or call preload(), to export it up front.
+
     Usage Update Example (add searchKeys to the metadata):
 
       >>> fc = r"c:\temp\scratch.gdb\states"
@@ -83,24 +107,61 @@ class Paperwork(object):
     _xmlText = None
     _temp_xml_file = None
     _temp_workspace = None
+    _tree = None
+    _dict = None
+    _changes = None
+    _payloads = None
+    _payload_file = None
     #----------------------------------------------------------------------
-    def __init__(self, dataset):
+    def __init__(self, dataset, preload=False):
         """Constructor"""
         self.dataset = dataset
+        if preload:
+            self.preload()
+    #----------------------------------------------------------------------
+    def __enter__(self):
+        return self
+    #----------------------------------------------------------------------
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+    #----------------------------------------------------------------------
+    def __del__(self):
+        try:
+            self._reset()
+        except Exception:
+            pass
+    #----------------------------------------------------------------------
+    def close(self):
+        """removes the temporary files and drops the loaded metadata"""
+        self._reset()
     #----------------------------------------------------------------------
     def _setup(self):
-        """creates a blank metadata file"""
+        """
+        exports the dataset's metadata to a scratch file.  Documents up to
+        the scratch space's inline limit are read into memory and the
+        file is removed straight away.
+        """
         try:
-            fd, filepath = tempfile.mkstemp(".xml",
-                                            dir=self.save_location,
-                                            text=True)
+            scratch = get_scratch()
+            fd, filepath = scratch.mkstemp(".xml")
             self._temp_xml_file = filepath
             with os.fdopen(fd, "w") as f:
                 f.write("<metadata />")
                 f.close()
             del fd
+            started = stats.start()
             arcpy.MetadataImporter_conversion(self._dataset, filepath)
+            size = os.path.getsize(filepath)
+            stats.stop(started, "export", self._dataset, size)
+            if size <= scratch.inline_limit:
+                started = stats.start()
+                with open(filepath, 'rb') as reader:
+                    self._xmlText = reader.read()
+                stats.stop(started, "read", self._dataset, size)
+                os.remove(filepath)
+                self._temp_xml_file = None
         except:
+            self._reset()
             line, filename, synerror = trace()
             raise HermesErrorHandler(
                 {
@@ -112,6 +173,54 @@ class Paperwork(object):
                 }
             )
     #----------------------------------------------------------------------
+    def _reset(self):
+        """removes the exported metadata file so the next access reloads it"""
+        self._payloads = None
+        if self._payload_file is not None:
+            # payload handles still reading the file keep it until the
+            # last of them is gone
+            self._payload_file = None
+        elif self._temp_xml_file is not None and \
+           os.path.isfile(self._temp_xml_file):
+            os.remove(self._temp_xml_file)
+        self._temp_xml_file = None
+        self._xmlText = None
+        self._tree = None
+        self._dict = None
+        self._changes = set()
+    #----------------------------------------------------------------------
+    def preload(self):
+        """
+        exports the dataset's metadata now instead of waiting for the
+        first access that needs it.  Returns the Paperwork object.
+        """
+        if not self.loaded:
+            self._setup()
+        return self
+    #----------------------------------------------------------------------
+    @property
+    def loaded(self):
+        """returns True if the metadata has been exported from the dataset"""
+        return self._xmlText is not None or self._temp_xml_file is not None
+    #----------------------------------------------------------------------
+    def _read(self):
+        """returns the exported xml document as bytes"""
+        self.preload()
+        if self._xmlText is not None:
+            return self._xmlText
+        started = stats.start()
+        with open(self._temp_xml_file, 'rb') as reader:
+            data = reader.read()
+        stats.stop(started, "read", self._dataset, len(data))
+        return data
+    #----------------------------------------------------------------------
+    def _open(self):
+        """returns a binary file object over the exported xml document"""
+        self.preload()
+        if self._xmlText is not None:
+            return io.BytesIO(self._xmlText)
+        return open(self._temp_xml_file, 'rb')
+    #----------------------------------------------------------------------
     @property
     def dataset(self):
         """get/sets the dataset metadata"""
@@ -121,11 +230,9 @@ class Paperwork(object):
     def dataset(self, value):
         """get/sets the dataset metadata"""
         if arcpy.Exists(value):
+            self._reset()
             self._dataset = value
-            self._temp_xml_file = None
             self._temp_workspace = None
-            self._xmlText = None
-            self._setup()
         else:
             synerror = "dataset does not exist or cannot be accessed."
             raise HermesErrorHandler(
@@ -140,10 +247,17 @@ class Paperwork(object):
     #----------------------------------------------------------------------
     @property
     def xmlfile(self):
-        """gets the temporary xml file path"""
+        """
+        gets the temporary xml file path.  If the document is held in
+        memory it is written to a scratch file first.
+        """
         try:
+            self.preload()
             if self._temp_xml_file is None:
-                self._setup()
+                fd, filepath = get_scratch().mkstemp(".xml")
+                with os.fdopen(fd, "wb") as writer:
+                    writer.write(self._xmlText)
+                self._temp_xml_file = filepath
             return self._temp_xml_file
         except:
             line, filename, synerror = trace()
@@ -162,7 +276,7 @@ class Paperwork(object):
         """returns the location where the xml file is saved"""
         try:
             if self._temp_workspace is None:
-                self._temp_workspace = tempfile.gettempdir()
+                self._temp_workspace = get_scratch().directory
             return self._temp_workspace
         except:
             line, filename, synerror = trace()
@@ -178,71 +292,298 @@ class Paperwork(object):
     #----------------------------------------------------------------------
     def __str__(self):
         """returns the xml text of a metadata file"""
-        if self._temp_xml_file is None:
-            self._setup()
-        return open(self._temp_xml_file, 'rb').read()
+        text = self._read()
+        if str is bytes:
+            return text
+        return text.decode('utf-8')
+    #----------------------------------------------------------------------
+    def fingerprint(self, canonical=False, exclude=None):
+        """
+        returns a sha1 hex digest of the dataset's exported metadata, so
+        callers can tell whether it changed without converting it.
+
+        Inputs:
+           canonical - optional - if True the digest is taken over the
+            document content (see converters.canonical_digest), so it
+            does not change when only the formatting does.
+           exclude - optional - element paths left out of a canonical
+            digest, e.g. converters.VOLATILE for the ModDate/ModTime and
+            SyncDate/SyncTime stamps ArcGIS rewrites on every sync.
+            Implies canonical.
+        """
+        try:
+            if canonical or exclude:
+                with self._open() as reader:
+                    return canonical_digest(reader, exclude)
+            digest = hashlib.sha1()
+            with self._open() as reader:
+                for block in iter(lambda: reader.read(65536), b""):
+                    digest.update(block)
+            return digest.hexdigest()
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "fingerprint",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : str(arcpy.GetMessages(2))
+                }
+            )
     #----------------------------------------------------------------------
     @property
     def json(self):
         """returns the object as json from the xml document"""
-        return json.dumps(self.convert())
+        return json.dumps(self._metadata())
     #----------------------------------------------------------------------
     def _metadata_to_dictionary(self, t):
-        """ converts the xml to a dictionary object (recursivly)"""
-        d = {t.tag: {} if t.attrib else None}
-        children = list(t)
-        if children:
-            dd = defaultdict(list)
-            for dc in map(self._metadata_to_dictionary, children):
-                for k, v in dc.iteritems():
-                    dd[k].append(v)
-            d = {t.tag: {k: v[0] if len(v) == 1 else v for k, v in dd.iteritems()}}
-        if t.attrib:
-            d[t.tag].update(('@' + k, v) for k, v in t.attrib.iteritems())
-        if t.text:
-            text = t.text.strip()
-            if children or t.attrib:
-                if text:
-                    d[t.tag]['#text'] = text
-            else:
-                d[t.tag] = text
-        return d
+        """ converts the xml to a dictionary object"""
+        return metadata_to_dictionary(t)
     #----------------------------------------------------------------------
     def _dictionary_to_metadata(self, d):
         """ converts a dictionary to xml"""
-        def _to_etree(d, root):
-            if not d:
-                pass
-            elif isinstance(d, basestring):
-                root.text = d
-            elif isinstance(d, dict):
-                for k,v in d.items():
-                    assert isinstance(k, basestring)
-                    if k.startswith('#'):
-                        assert k == '#text' and isinstance(v, basestring)
-                        root.text = v
-                    elif k.startswith('@'):
-                        assert isinstance(v, basestring)
-                        root.set(k[1:], v)
-                    elif isinstance(v, list):
-                        for e in v:
-                            _to_etree(e, ET.SubElement(root, k))
-                    else:
-                        _to_etree(v, ET.SubElement(root, k))
-            else: assert d == 'invalid type'
-        assert isinstance(d, dict) and len(d) == 1
-        tag, body = next(iter(d.items()))
-        node = ET.Element(tag)
-        _to_etree(body, node)
-        return ET.tostring(node)
-    #----------------------------------------------------------------------
-    def convert(self):
-        """ converts an xml document to a dictionary """
+        return dictionary_to_metadata(d)
+    #----------------------------------------------------------------------
+    def _write_metadata(self, d, writer):
+        """
+        writes a dictionary as an xml document to a binary file object
+        in chunks, returns the number of bytes written
+        """
+        return write_dictionary(d, writer)
+    #----------------------------------------------------------------------
+    def _getroot(self):
+        """returns the parsed xml document, parsing it on first use"""
+        if self._tree is None:
+            data = self._read()
+            started = stats.start()
+            self._tree = ET.XML(data)
+            stats.stop(started, "parse", self._dataset, len(data))
+        return self._tree
+    #----------------------------------------------------------------------
+    def _metadata(self):
+        """
+        returns the cached dictionary of the xml document.  The object is
+        shared, so it must not be modified or handed to the user.
+        """
+        if self._dict is None:
+            root = self._getroot()
+            started = stats.start()
+            self._dict = self._metadata_to_dictionary(root)
+            stats.stop(started, "convert", self._dataset)
+        return self._dict
+    #----------------------------------------------------------------------
+    def _touched(self, section):
+        """records a change to a top level section of the cached tree"""
+        self._changes.add(section)
+        self._dict = None
+    #----------------------------------------------------------------------
+    def _splice(self, d):
+        """
+        applies the top level sections of dictionary d that differ from
+        the cached dictionary to the cached tree, leaving the unchanged
+        sections as they are.  Returns False if d does not have the same
+        root as the document, in which case it has to be rebuilt.
+        """
+        root = self._getroot()
+        if len(d) != 1 or root.tag not in d:
+            return False
+        body = d[root.tag]
+        base = self._metadata()[root.tag]
+        if not isinstance(body, dict) or not isinstance(base, dict):
+            return body == base
+        for key in list(base) + [k for k in body if k not in base]:
+            if key in body and key in base and body[key] == base[key]:
+                continue
+            value = body.get(key)
+            if key == '#text':
+                root.text = value
+            elif key.startswith('@'):
+                if key in body:
+                    root.set(key[1:], value)
+                else:
+                    del root.attrib[key[1:]]
+            else:
+                children = [node for node in root if node.tag == key]
+                index = list(root).index(children[0]) if children else len(root)
+                for node in children:
+                    root.remove(node)
+                if key in body:
+                    values = value if isinstance(value, list) else [value]
+                    for offset, item in enumerate(values):
+                        node = ET.Element(key)
+                        fill_element(node, item)
+                        root.insert(index + offset, node)
+            self._touched(key)
+        return True
+    #----------------------------------------------------------------------
+    def _import(self, write):
+        """
+        writes the xml to a temp file with write(writer) and imports it
+        to the dataset
+        """
+        fd, filepath = get_scratch().mkstemp(".xml")
         try:
-            if self._temp_xml_file is None:
-                self._setup()
-            tree = ET.XML(text=open(self._temp_xml_file, 'rb').read())
-            return self._metadata_to_dictionary(tree)
+            started = stats.start()
+            with os.fdopen(fd, "wb") as writer:
+                write(writer)
+                size = writer.tell()
+            stats.stop(started, "serialize", self._dataset, size)
+            started = stats.start()
+            arcpy.MetadataImporter_conversion(filepath, self._dataset)
+            stats.stop(started, "import", self._dataset, size)
+        finally:
+            os.remove(filepath)
+        self._reset()
+    #----------------------------------------------------------------------
+    def view(self):
+        """
+        returns a MetadataView, a dictionary-like proxy over the parsed
+        xml document.  Nothing is converted until it is accessed, and
+        changes made through the view go straight into the document.
+        Pass the view to save() to write them to the dataset.
+
+        Example:
+        >>> view = pw.view()
+        >>> view['metadata']['dataIdInfo']['idPurp'] = "Hermes Was Here"
+        >>> pw.save(view)
+        """
+        try:
+            return MetadataView(self._getroot(), self._touched)
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "view",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : str(arcpy.GetMessages(2))
+                }
+            )
+    #----------------------------------------------------------------------
+    def get(self, path, default=None):
+        """
+        returns the value at a path in the metadata without converting
+        the whole document, or default if the path selects nothing.
+        Elements are returned in the format of convert().
+
+        Paths use ElementTree's XPath subset and may end in '/@name' or
+        '/#text'.  They are relative to the root element unless they
+        start with '/' and the root tag.  Compiled paths are cached.
+
+        Example:
+        >>> pw.get("dataIdInfo/idCitation/resTitle")
+        >>> pw.get("/metadata/Esri/ArcGISFormat/#text")
+        >>> pw.get("eainfo/detailed/attr[attrlabl='NAME']/attrdef")
+        """
+        try:
+            values = compile_path(path).values(self._getroot())
+            return values[0] if values else default
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "get",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : synerror
+                }
+            )
+    #----------------------------------------------------------------------
+    def findall(self, path):
+        """
+        returns a list of every value a path selects in the metadata,
+        see get().
+        """
+        try:
+            return compile_path(path).values(self._getroot())
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "findall",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : synerror
+                }
+            )
+    #----------------------------------------------------------------------
+    def set(self, path, value):
+        """
+        sets the value of everything a path selects in the metadata, see
+        get().  The elements of a plain path are created if it selects
+        nothing.  The change is written to the dataset by save().
+
+        Inputs:
+           path - the path to set.
+           value - a string for attributes and text, otherwise a value in
+            the format of convert().  A list replaces the selected
+            elements with one element per item.
+        Output:
+           True if the metadata changed.
+
+        Example:
+        >>> pw.set("dataIdInfo/searchKeys/keyword", ["states", "USA"])
+        >>> pw.save()
+        """
+        try:
+            return set_path(self._getroot(), path, value, self._touched)
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "set",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : synerror
+                }
+            )
+    #----------------------------------------------------------------------
+    def convert(self, stream=False, exclude=None, payloads=False):
+        """
+        converts an xml document to a dictionary
+
+        The document is parsed and converted once; each call returns a
+        new copy of the cached dictionary, so callers can change it
+        freely.  The cache is dropped by save(), importXMLFile(),
+        setSyncMethod() and by setting the dataset.
+
+        Inputs:
+           stream - optional - if True, the exported file is converted
+            with iterparse instead of being loaded as a whole tree.  This
+            keeps memory down on very large documents.  Streamed results
+            are not cached.
+           exclude - optional - element paths to leave out of a streamed
+            conversion, e.g. ['metadata/Binary'].  Either fnmatch
+            patterns against the slash separated path or a function
+            taking the path and returning True to skip it.  Setting
+            exclude implies stream=True.
+           payloads - optional - if True, the text of the thumbnail and
+            enclosure Data elements is replaced by BinaryPayload handles
+            that read it from the exported document when asked, see
+            payloads().  Unless changes made with set() are pending,
+            this implies stream=True, so the payload text is not cached.
+        """
+        try:
+            if payloads and not self._changes:
+                stream = True
+            if stream or exclude is not None:
+                if self._dict is not None and exclude is None:
+                    d = _copy_metadata(self._dict)
+                else:
+                    started = stats.start()
+                    with self._open() as reader:
+                        d = iterparse_to_dictionary(reader, exclude)
+                    stats.stop(started, "convert", self._dataset)
+            else:
+                d = _copy_metadata(self._metadata())
+            if payloads and 'Binary' not in self._changes:
+                attach_payloads(d, self.payloads())
+            return d
         except:
             line, filename, synerror = trace()
             raise HermesErrorHandler(
@@ -255,41 +596,172 @@ class Paperwork(object):
                 }
             )
     #----------------------------------------------------------------------
-    def save(self, d=None):
+    def payloads(self):
+        """
+        returns a BinaryPayload handle for every thumbnail and enclosure
+        embedded in the exported document, see hermes.payload.  Nothing
+        is decoded until a handle is read.  The handles read the exported
+        document from its scratch file, which stays there while handles
+        to it exist, even after the Paperwork object is closed.
+        """
+        try:
+            if self._payloads is None:
+                self.preload()
+                if self._xmlText is not None:
+                    self._payloads = find_payloads(self._xmlText)
+                    if not self._payloads:
+                        return []
+                # handles read the scratch file, so they do not keep a
+                # document held in memory alive
+                filepath = self.xmlfile
+                self._payload_file = ScratchFile(filepath)
+                self._payloads = find_payloads(filepath, mapped=True,
+                                               owner=self._payload_file)
+            return list(self._payloads)
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "payloads",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : str(arcpy.GetMessages(2))
+                }
+            )
+    #----------------------------------------------------------------------
+    def extractPayloads(self, outFolder):
+        """
+        decodes every embedded thumbnail and enclosure into a file in
+        outFolder, streaming them without loading the document.
+        Enclosures keep their original file names; the thumbnail is
+        named thumbnail with an extension guessed from its content.
+
+        Inputs:
+           outFolder - the folder to write the files to.  It is created
+            if needed.
+        Output:
+           list of the paths of the files written
+        """
+        try:
+            if not os.path.isdir(outFolder):
+                os.makedirs(outFolder)
+            paths = []
+            names = set()
+            for number, payload in enumerate(self.payloads()):
+                kind = payload.location[-2][0].lower()
+                name = os.path.basename(
+                    payload.attributes.get('OriginalFileName') or "")
+                root, extension = os.path.splitext(name)
+                if not root:
+                    root = kind if kind == "thumbnail" else \
+                           "%s_%d" % (kind, number)
+                if not extension:
+                    extension = payload.extension()
+                name = root + extension
+                if name.lower() in names:
+                    name = "%s_%d%s" % (root, number, extension)
+                names.add(name.lower())
+                paths.append(payload.extract(os.path.join(outFolder, name)))
+            return paths
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "extractPayloads",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : synerror
+                }
+            )
+    #----------------------------------------------------------------------
+    def compact(self):
+        """
+        returns the metadata as a MetadataNode tree, which takes much
+        less memory than the dictionary from convert() when the metadata
+        of many datasets is kept.  See hermes.compact.
+        """
+        try:
+            root = self._getroot()
+            started = stats.start()
+            node = MetadataNode.from_element(root)
+            stats.stop(started, "convert", self._dataset)
+            return node
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "compact",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : str(arcpy.GetMessages(2))
+                }
+            )
+    #----------------------------------------------------------------------
+    def save(self, d=None, force=False):
         """
            commits the xml changes from the dictionary to the dataset
-           If d is set to None, then dictionary from convert() will be
-           used.
+           If d is set to None, then the changes made through view() will
+           be used.
+
+           Only the top level sections of the document that differ from
+           what was loaded are rebuilt; the rest of the parsed document is
+           written back as it is.  When nothing changed, the dataset is
+           not written at all.  If the metadata cannot be written, the
+           cached document is dropped, so the next access reloads it from
+           the dataset; pending changes made with set() or view() are
+           lost with it.
 
            Inputs:
-              d - optional - either None or dictionary to be converted to
-                metdata xml and applied to the dataset.
+              d - optional - either None, a dictionary to be converted to
+                metdata xml and applied to the dataset, a MetadataView
+                from view() whose document is written as is, a
+                MetadataNode tree from compact(), or a MetadataPatch or
+                MetadataDiff whose changes are applied to the document.
+              force - optional - if True, the metadata is written to the
+                dataset even if nothing changed.
+           Output:
+              True if the metadata was written, False if nothing changed.
            Raises:
               HermesErrorHandler
         """
         try:
+            if hasattr(d, "apply_tree"):
+                d.apply_tree(self._getroot(), self._touched)
+                d = None
             if d is None:
-                d = self.convert()
-            if isinstance(d, dict):
-                res = self._dictionary_to_metadata(d)
-                writer = None
-                with open(self.xmlfile, 'wb') as writer:
-                    writer.write(res)
-                    writer.flush()
-                    writer.close()
-                del writer
-                arcpy.MetadataImporter_conversion (self._temp_xml_file, self._dataset)
-                if os.path.isfile(self._temp_xml_file):
-                    os.remove(self._temp_xml_file)
-                self._temp_xml_file = None
+                d = self.view()
+            if isinstance(d, (dict, MetadataView, MetadataNode)):
+                if isinstance(d, MetadataNode):
+                    if not force and \
+                       d == MetadataNode.from_element(self._getroot()):
+                        return False
+                    element = d.to_element()
+                    write = lambda writer: write_element(element, writer)
+                elif isinstance(d, MetadataView):
+                    if d.element is self._tree and \
+                       not self._changes and not force:
+                        return False
+                    write = lambda writer: write_element(d.element, writer)
+                elif self._splice(d):
+                    if not self._changes and not force:
+                        return False
+                    root = self._getroot()
+                    write = lambda writer: write_element(root, writer)
+                else:
+                    write = lambda writer: self._write_metadata(d, writer)
+                self._import(write)
                 self._temp_workspace = None
-                self._xmlText = None
                 return True
             else:
                 raise Exception("Input must be of type dictionary")
             return False
         except:
             line, filename, synerror = trace()
+            # the cached tree may hold changes the dataset never got
+            self._reset()
             raise HermesErrorHandler(
                 {
                     "function": "save",
@@ -300,12 +772,72 @@ class Paperwork(object):
                 }
             )
     #----------------------------------------------------------------------
-    def exportToXML(self, outFolder=None, outName=None):
+    def stamp(self, template, values=None, merge=False):
+        """
+        writes a MetadataTemplate rendered with values to the dataset,
+        see hermes.template.
+
+        Without merge the rendered document replaces the metadata, and
+        the existing metadata is never exported or parsed.  With merge
+        True (or 'replace') each top level section of the template
+        replaces the same section of the existing metadata and the other
+        sections are kept; with merge 'keep' only the sections the
+        metadata does not have yet are added.
+
+        Inputs:
+           template - a MetadataTemplate.
+           values - optional - dictionary of slot values.
+           merge - optional - False, True/'replace' or 'keep'.
+        Output:
+           True if the metadata was written, False if merging changed
+           nothing.
+        """
+        try:
+            if merge not in (False, True, 'replace', 'keep'):
+                raise ValueError("merge must be False, True, 'replace' or "
+                                 "'keep'")
+            if not merge:
+                self._import(lambda writer: template.write(writer, values))
+                self._temp_workspace = None
+                return True
+            root = self._getroot()
+            for section in template.merge_into(root, values,
+                                               keep=merge == 'keep'):
+                self._touched(section)
+            if not self._changes:
+                return False
+            self._import(lambda writer: write_element(root, writer))
+            self._temp_workspace = None
+            return True
+        except:
+            line, filename, synerror = trace()
+            self._reset()
+            raise HermesErrorHandler(
+                {
+                    "function": "stamp",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : synerror
+                }
+            )
+    #----------------------------------------------------------------------
+    def exportToXML(self, outFolder=None, outName=None, direct=False,
+                    method="auto"):
         """
         Exports a metadata file (.xml) to a save location and a given name.
         To get the save changes, call the save() before running the
         function.
 
+        With direct=True the document is written as arcpy exported it,
+        comments and element order included, without converting it to a
+        dictionary and back: metadata that has not been loaded yet is
+        exported straight to the file, a document held in memory is
+        written as it is and a scratch file is placed with the given
+        method (see hermes.scratch.place_file).  Changes made with set()
+        or through a view and not saved are written from the parsed
+        document.
+
         Example:
         >>> fc = r"c:\temp\scratch.gdb\states"
         >>> pw = Paperwork(dataset=fc)
@@ -321,6 +853,12 @@ class Paperwork(object):
           outName - optional - is the name of the xml file.  This can be
            provided, or created by the system.  The file create will be
            randomly generated.
+          direct - optional - writes the exported document without
+           converting it.
+          method - optional - 'auto', 'hardlink' or 'copy', how a direct
+           export places a scratch file.  A hard linked file shares its
+           data with the scratch file until the Paperwork object is
+           closed, so it must not be changed in place before then.
         Output:
            path to xml file
         """
@@ -339,15 +877,15 @@ class Paperwork(object):
                     fullPath = os.path.join(outFolder, outName + ".xml")
             else:
                 from uuid import uuid4
-                fullPath = os.path.join(outFolder, uuid4().get_hex() + ".xml")
-            d = self.convert()
-            res = self._dictionary_to_metadata(d)
-            writer = None
+                fullPath = os.path.join(outFolder, uuid4().hex + ".xml")
+            if direct:
+                self._export_direct(fullPath, method)
+                return fullPath
+            d = self._metadata()
+            started = stats.start()
             with open(fullPath, 'wb') as writer:
-                writer.write(res)
-                writer.flush()
-                writer.close()
-            del writer
+                size = self._write_metadata(d, writer)
+            stats.stop(started, "serialize", self._dataset, size)
             return fullPath
         except:
             line, filename, synerror = trace()
@@ -361,6 +899,27 @@ class Paperwork(object):
                 }
             )
     #----------------------------------------------------------------------
+    def _export_direct(self, fullPath, method="auto"):
+        """writes the exported document to fullPath without converting it"""
+        if self._changes:
+            started = stats.start()
+            with open(fullPath, 'wb') as writer:
+                write_element(self._getroot(), writer)
+                size = writer.tell()
+            stats.stop(started, "serialize", self._dataset, size)
+        elif not self.loaded:
+            with open(fullPath, "w") as f:
+                f.write("<metadata />")
+            started = stats.start()
+            arcpy.MetadataImporter_conversion(self._dataset, fullPath)
+            stats.stop(started, "export", self._dataset,
+                       os.path.getsize(fullPath))
+        elif self._xmlText is not None:
+            with open(fullPath, 'wb') as writer:
+                writer.write(self._xmlText)
+        else:
+            place_file(self._temp_xml_file, fullPath, method)
+    #----------------------------------------------------------------------
     def importXMLFile(self, xmlFile):
         """
         imports an xml metadata file to the target dataset.
@@ -372,12 +931,51 @@ class Paperwork(object):
         """
         if os.path.isfile(xmlFile) and \
            xmlFile.lower().endswith(".xml"):
+            started = stats.start()
             arcpy.MetadataImporter_conversion(source=xmlFile,
                                               target=self.dataset)
-            self._setup()
+            stats.stop(started, "import", self._dataset,
+                       os.path.getsize(xmlFile))
+            self._reset()
             return self.convert()
         return None
     #----------------------------------------------------------------------
+    def importSnapshot(self, archive, snapshot=None, dataset=None):
+        """
+        restores the metadata of the dataset from a snapshot in a
+        hermes.archive.MetadataArchive.  The document is rebuilt from the
+        archive straight into the file that is imported; the current
+        metadata is not exported.
+
+        Inputs:
+           archive - a MetadataArchive.
+           snapshot - optional - id or label of the snapshot, by default
+            the latest one that has the dataset.
+           dataset - optional - the name the metadata was archived
+            under, by default the path of this dataset, e.g. to restore
+            one dataset's metadata to a copy of it.
+        Output:
+           the number of bytes imported.
+        """
+        try:
+            name = self._dataset if dataset is None else dataset
+            size = []
+            self._import(lambda writer: size.append(
+                archive.write(name, writer, snapshot)))
+            self._temp_workspace = None
+            return size[0]
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "importSnapshot",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : synerror
+                }
+            )
+    #----------------------------------------------------------------------
     def setSyncMethod(self, method="ALWAYS"):
         """
         Automatically updates an ArcGIS item's metadata with the current
@@ -424,6 +1022,7 @@ class Paperwork(object):
             if method.upper() in methods:
                 arcpy.SynchronizeMetadata_conversion(source=self._dataset,
                                                      synctype=method)
+                self._reset()
                 return self.dataset
             else:
                 raise Exception("Invalid method type: %s" % method)
@@ -444,37 +1043,12 @@ class Paperwork(object):
     def datasetProperties(self):
         """
         returns a collection of common dataset properties including
-        information about the workspace.
+        information about the workspace.  The workspace description
+        comes from the process-wide cache in hermes.describe.
         The return object is a dictionary {}
         """
         try:
-            validationWorkspace = os.path.dirname(self._dataset)
-            desc = arcpy.Describe(self._dataset)
-            descWrksp = arcpy.Describe(desc.path)
-            database, owner, tableName = [i.strip() if i.strip() != "(null)" else "" \
-                                          for i in arcpy.ParseTableName(desc.name,
-                                                                        validationWorkspace).split(",")]
-            datasetType = desc.datasetType if hasattr(desc, "datasetType") else ""
-            workspaceFactoryProgID = descWrksp.workspaceFactoryProgID if hasattr(descWrksp, "workspaceFactoryProgID") else ""
-            workspaceType = descWrksp.workspaceType if hasattr(descWrksp, "workspaceType") else ""
-            connectionString = descWrksp.connectionString if hasattr(descWrksp, "connectionString") else ""
-            alias = desc.aliasName if hasattr(desc, "aliasName") else ""
-            dataType = descWrksp.dataType if hasattr(descWrksp, "dataType") else ""
-            return {
-                "owner" : owner,
-                "tableName" : tableName,
-                "alias" : alias,
-                "database" : database,
-                "dataType" : dataType,
-                "datasetType" : datasetType,
-                "workspace" : {
-                    "type" : descWrksp.dataType,
-                    "path" : desc.path,
-                    "connectionString" : connectionString,
-                    "workspaceType" : workspaceType,
-                    "workspaceFactoryProgID" : workspaceFactoryProgID
-                }
-            }
+            return dataset_properties(self._dataset)
         except:
             line, filename, synerror = trace()
             raise HermesErrorHandler(
@@ -486,3 +1060,14 @@ class Paperwork(object):
                     "arc" : str(arcpy.GetMessages(2))
                 }
             )
+#--------------------------------------------------------------------------
+def _copy_metadata(value):
+    """
+    copies a converted metadata value.  The values are only ever dict,
+    list, str or None, so this is much cheaper than copy.deepcopy.
+    """
+    if isinstance(value, dict):
+        return {k: _copy_metadata(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [_copy_metadata(v) for v in value]
+    return value
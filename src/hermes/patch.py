@@ -0,0 +1,357 @@
+"""
+A patch is a fixed list of edits that is validated and compiled once and
+then applied to any number of datasets.  Each dataset is parsed once,
+edited in its tree, and serialized and imported once, only if the patch
+changed something.
+
+Usage Example:
+
+  >>> patch = MetadataPatch([
+  ...     {"op" : "set", "path" : "dataIdInfo/resConst/Consts/useLimit",
+  ...      "value" : "Not for navigation."},
+  ...     {"op" : "append", "path" : "dataIdInfo/searchKeys/keyword",
+  ...      "value" : "hydrography"},
+  ...     {"op" : "remove", "path" : "dataIdInfo/idCredit"},
+  ...     {"op" : "merge", "path" : "mdContact",
+  ...      "value" : {"rpOrgName" : "GIS Office", "role" : {
+  ...          "RoleCd" : {"@value" : "007"}}}},
+  ... ])
+  >>> report = patch.apply_all(PaperworkCollection(workspace=gdb))
+  >>> print(report)
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+from .common import *
+from .converters import ET, fill_element
+from .xpath import compile_path, set_path, element_value, create_path, \
+     section_tag, PLAIN_STEP
+from .paperwork import Paperwork
+from .collection import PaperworkCollection
+
+OPERATIONS = ('set', 'append', 'remove', 'merge')
+#--------------------------------------------------------------------------
+def _invalid(message):
+    """returns the error raised for an invalid patch"""
+    return HermesErrorHandler(
+        {
+            "function": "MetadataPatch",
+            "line": 0,
+            "filename": "patch.py",
+            "synerror": message,
+            "arc" : message
+        }
+    )
+#--------------------------------------------------------------------------
+def _split_last(path):
+    """
+    splits a path into its parent path and its last step at the last
+    slash outside predicates and namespaces.  Returns (None, None) if the
+    last step is not a plain tag or the path has no parent.
+    """
+    depth = 0
+    quote = None
+    split = -1
+    for position, char in enumerate(path):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in "'\"" and depth:
+            quote = char
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+        elif char == "/" and not depth:
+            split = position
+    parent, last = path[:split], path[split + 1:]
+    if split <= 0 or parent.endswith("/") or not PLAIN_STEP.match(last):
+        return None, None
+    return parent, last
+#--------------------------------------------------------------------------
+def _merge(node, value, on_change, section):
+    """merges a dictionary value into an element, returns True if changed"""
+    if not isinstance(value, dict):
+        if element_value(node) == value:
+            return False
+        tail = node.tail
+        node.clear()
+        node.tail = tail
+        fill_element(node, value)
+        on_change(section)
+        return True
+    changed = False
+    for key, item in value.items():
+        if key == '#text':
+            if (node.text or "").strip() != item:
+                node.text = item
+                changed = True
+        elif key.startswith('@'):
+            if node.get(key[1:]) != item:
+                node.set(key[1:], item)
+                changed = True
+        else:
+            children = [child for child in node if child.tag == key]
+            if len(children) == 1 and not isinstance(item, list):
+                if _merge(children[0], item, on_change, section):
+                    changed = True
+                continue
+            if [element_value(child) for child in children] == \
+               (item if isinstance(item, list) else [item]):
+                continue
+            index = list(node).index(children[0]) if children else len(node)
+            for child in children:
+                node.remove(child)
+            for offset, entry in enumerate(item if isinstance(item, list)
+                                           else [item]):
+                child = ET.Element(key)
+                fill_element(child, entry)
+                node.insert(index + offset, child)
+            changed = True
+    if changed:
+        on_change(section)
+    return changed
+########################################################################
+class _Operation(object):
+    """one compiled patch operation"""
+    __slots__ = ('op', 'path', 'value', 'unique', 'compiled', 'parent', 'tag')
+    #----------------------------------------------------------------------
+    def __init__(self, spec):
+        """Constructor"""
+        if not isinstance(spec, dict):
+            raise _invalid("operation must be a dictionary: %r" % (spec,))
+        unknown = set(spec) - set(['op', 'path', 'value', 'unique'])
+        if unknown:
+            raise _invalid("unknown keys %s in %r" % (sorted(unknown), spec))
+        self.op = spec.get('op')
+        self.path = spec.get('path')
+        self.value = spec.get('value')
+        self.unique = spec.get('unique', True)
+        if self.op not in OPERATIONS:
+            raise _invalid("op must be one of %s: %r" % (OPERATIONS, spec))
+        if not isinstance(self.path, string_types) or not self.path:
+            raise _invalid("path must be a non-empty string: %r" % (spec,))
+        if self.op != 'remove' and 'value' not in spec:
+            raise _invalid("%s needs a value: %r" % (self.op, spec))
+        try:
+            self.compiled = compile_path(self.path)
+        except SyntaxError as e:
+            raise _invalid("invalid path %s: %s" % (self.path, e))
+        self.parent = self.tag = None
+        if self.op in ('append', 'merge') and self.compiled.target is not None:
+            raise _invalid("%s needs an element path: %r" % (self.op, spec))
+        if self.op == 'merge' and not isinstance(self.value, dict):
+            raise _invalid("merge needs a dictionary value: %r" % (spec,))
+        if self.op == 'append':
+            steps = self.compiled.steps
+            if steps:
+                parent = "/".join(steps[:-1]) or "."
+                if self.compiled.root is not None:
+                    parent = "/" + self.compiled.root + "/" + parent
+                self.tag = steps[-1]
+            else:
+                parent, self.tag = _split_last(self.path)
+                if parent is None:
+                    raise _invalid("append needs a plain last step: %r" %
+                                   (spec,))
+            self.parent = compile_path(parent)
+        if self.op == 'set' and self.compiled.target is not None and \
+           not isinstance(self.value, string_types):
+            raise _invalid("attributes and text need a string: %r" % (spec,))
+    #----------------------------------------------------------------------
+    def apply(self, root, on_change):
+        """applies the operation to a tree, returns True if it changed"""
+        if self.op == 'set':
+            return set_path(root, self.compiled, self.value, on_change)
+        elif self.op == 'remove':
+            return self._remove(root, on_change)
+        elif self.op == 'append':
+            return self._append(root, on_change)
+        nodes = self.compiled.findall(root) or [create_path(root, self.compiled)]
+        changed = False
+        for node in nodes:
+            section = self.compiled.steps[0] if self.compiled.steps \
+                      else root.tag
+            if _merge(node, self.value, on_change, section):
+                changed = True
+        return changed
+    #----------------------------------------------------------------------
+    def _remove(self, root, on_change):
+        nodes = self.compiled.findall(root)
+        if self.compiled.target is not None:
+            changed = False
+            for node in nodes:
+                if self.compiled.target == '#text':
+                    if node.text and node.text.strip():
+                        node.text = None
+                        changed = True
+                elif self.compiled.target[1:] in node.attrib:
+                    del node.attrib[self.compiled.target[1:]]
+                    changed = True
+            if changed:
+                on_change(self.compiled.steps[0] if self.compiled.steps
+                          else root.tag)
+            return changed
+        if not nodes:
+            return False
+        parents = dict((child, parent) for parent in root.iter()
+                       for child in parent)
+        for node in nodes:
+            parent = parents.get(node)
+            if parent is None:
+                raise ValueError("the root element cannot be removed")
+            section = node.tag if parent is root else \
+                      (self.compiled.steps[0] if self.compiled.steps
+                       else root.tag)
+            parent.remove(node)
+            on_change(section)
+        return True
+    #----------------------------------------------------------------------
+    def _append(self, root, on_change):
+        parents = self.parent.findall(root) or [create_path(root, self.parent)]
+        changed = False
+        for parent in parents:
+            siblings = [child for child in parent if child.tag == self.tag]
+            if self.unique and any(element_value(child) == self.value
+                                   for child in siblings):
+                continue
+            node = ET.Element(self.tag)
+            fill_element(node, self.value)
+            if siblings:
+                parent.insert(list(parent).index(siblings[-1]) + 1, node)
+            else:
+                parent.append(node)
+            on_change(self.tag if parent is root else
+                      section_tag(root, parent, self.compiled))
+            changed = True
+        return changed
+########################################################################
+class PatchReport(object):
+    """
+    The summary of applying a patch to many datasets.
+
+    changed - dictionary of dataset to the indexes of the operations
+     that changed it.
+    unchanged - datasets the patch did not change, which were not written.
+    failed - dictionary of dataset to error message.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self):
+        """Constructor"""
+        self.changed = {}
+        self.unchanged = []
+        self.failed = {}
+    #----------------------------------------------------------------------
+    def __str__(self):
+        return "%d changed, %d unchanged, %d failed" % \
+               (len(self.changed), len(self.unchanged), len(self.failed))
+#--------------------------------------------------------------------------
+def _apply_patch(dataset, patch):
+    return patch.apply(Paperwork(dataset=dataset))
+########################################################################
+class MetadataPatch(object):
+    """
+    A validated, compiled list of metadata edits.
+
+    Each operation is a dictionary with an 'op', a 'path' (see
+    Paperwork.get()) and, except for remove, a 'value' in the format of
+    convert():
+
+      set - sets everything the path selects, creating a plain path if
+       needed.  A list value replaces repeated elements.
+      append - adds a new element for the last step of the path, which
+       must be a plain tag, after its existing siblings.  A plain parent
+       path is created if needed.  Unless 'unique' is False, nothing is
+       added when an equal sibling already exists.
+      remove - removes the selected elements, attributes or text.
+      merge - merges a dictionary into the selected elements, keeping
+       the children it does not mention.
+
+    Raises HermesErrorHandler when an operation is invalid.
+    """
+    _operations = None
+    #----------------------------------------------------------------------
+    def __init__(self, operations):
+        """Constructor"""
+        if isinstance(operations, dict):
+            operations = [operations]
+        self._operations = [_Operation(spec) for spec in operations]
+    #----------------------------------------------------------------------
+    def __getstate__(self):
+        return [dict(op=o.op, path=o.path, value=o.value, unique=o.unique)
+                for o in self._operations]
+    #----------------------------------------------------------------------
+    def __setstate__(self, state):
+        self._operations = [_Operation(spec) for spec in state]
+    #----------------------------------------------------------------------
+    def __len__(self):
+        return len(self._operations)
+    #----------------------------------------------------------------------
+    def apply_tree(self, root, on_change=None):
+        """
+        applies the patch to a metadata element tree and returns the
+        indexes of the operations that changed it.
+        """
+        on_change = on_change or (lambda section: None)
+        return [i for i, operation in enumerate(self._operations)
+                if operation.apply(root, on_change)]
+    #----------------------------------------------------------------------
+    def apply(self, paperwork, force=False):
+        """
+        applies the patch to a Paperwork object and saves it if anything
+        changed.  Returns the indexes of the operations that changed it.
+        """
+        try:
+            changed = self.apply_tree(paperwork._getroot(), paperwork._touched)
+            if changed or force:
+                paperwork.save(force=force)
+            return changed
+        except HermesErrorHandler:
+            raise
+        except:
+            line, filename, synerror = trace()
+            raise HermesErrorHandler(
+                {
+                    "function": "apply",
+                    "line": line,
+                    "filename": filename,
+                    "synerror": synerror,
+                    "arc" : synerror
+                }
+            )
+    #----------------------------------------------------------------------
+    def apply_all(self, datasets, workers=1, callback=None):
+        """
+        applies the patch to a list of datasets or a PaperworkCollection.
+
+        Inputs:
+           datasets - list of dataset paths or a PaperworkCollection.
+           workers - optional - number of threads when datasets is a list.
+           callback - optional - called with each Result as it finishes.
+        Output:
+           PatchReport
+        """
+        if not isinstance(datasets, PaperworkCollection):
+            datasets = PaperworkCollection(datasets, workers=workers)
+        report = PatchReport()
+        for result in datasets._run(_apply_patch, self):
+            if not result.ok:
+                report.failed[result.dataset] = result.error
+            elif result.value:
+                report.changed[result.dataset] = result.value
+            else:
+                report.unchanged.append(result.dataset)
+            if callback is not None:
+                callback(result)
+        return report
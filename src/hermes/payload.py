@@ -0,0 +1,302 @@
+"""
+Lazy handles for the base64 payloads ArcGIS embeds in metadata: the
+thumbnail under Binary/Thumbnail/Data and attached files under
+Binary/Enclosure/Data.
+
+A BinaryPayload records where the base64 text of a payload sits in the
+exported document (the bytes held in memory or the scratch file) and
+reads it only when asked; scratch files are read through a memory map.
+convert(payloads=True) puts handles in place of the payload text, so a
+5 MB thumbnail is not copied into every dictionary of a batch, and
+save() writes the text of an unchanged handle straight from the exported
+document.
+
+Usage Example:
+
+  >>> pw = Paperwork(dataset=fc)
+  >>> for payload in pw.payloads():
+  ...     print(payload.path, payload.size)
+  >>> pw.extractPayloads(r"c:\\temp\\attachments")
+  >>> d = pw.convert(payloads=True)
+  >>> d['metadata']['dataIdInfo']['idPurp'] = "thumbnail kept as it is"
+  >>> pw.save(d)
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import re
+import mmap
+import codecs
+import binascii
+from contextlib import contextmanager
+from xml.parsers import expat
+from .common import string_types
+
+PAYLOADS = ('Binary/Thumbnail/Data', 'Binary/Enclosure/Data')
+CHUNK_SIZE = 1024 * 1024
+_ROOT = re.compile(br'<([^?!\s/>][^\s/>]*)')
+_BINARY = re.compile(br'<Binary[\s/>]')
+_START_TAG = re.compile(br'<[^>"\']*(?:(?:"[^"]*"|\'[^\']*\')[^>"\']*)*>')
+_NOT_BASE64 = re.compile(br'[^A-Za-z0-9+/=]')
+_EXTENSIONS = ((b'\xff\xd8', '.jpg'), (b'\x89PNG', '.png'),
+               (b'GIF8', '.gif'), (b'BM', '.bmp'), (b'%PDF', '.pdf'))
+########################################################################
+class BinaryPayload(object):
+    """
+    The base64 text of one embedded payload: length bytes at offset in
+    source, which is the exported document as bytes or, when mapped is
+    True, the path of the file holding it.  owner is any object that
+    keeps that file in place while the handle exists, such as a
+    hermes.scratch.ScratchFile.
+
+    location is the path of the Data element as (tag, index) pairs, the
+    index counting the siblings with the same tag, and attributes holds
+    the Data element's attributes.
+    """
+    __slots__ = ('source', 'mapped', 'owner', 'offset', 'length',
+                 'location', 'attributes')
+    #----------------------------------------------------------------------
+    def __init__(self, source, offset, length, location, attributes=None,
+                 mapped=False, owner=None):
+        """Constructor"""
+        self.source = source
+        self.mapped = mapped
+        self.owner = owner
+        self.offset = offset
+        self.length = length
+        self.location = tuple(location)
+        self.attributes = attributes or {}
+    #----------------------------------------------------------------------
+    @property
+    def path(self):
+        """gets the slash separated path of the Data element"""
+        return "/".join(tag for tag, index in self.location)
+    #----------------------------------------------------------------------
+    @property
+    def size(self):
+        """gets the approximate size of the decoded payload in bytes"""
+        return self.length * 3 // 4
+    #----------------------------------------------------------------------
+    def __len__(self):
+        return self.length
+    #----------------------------------------------------------------------
+    def __repr__(self):
+        return "<BinaryPayload %s, %d bytes>" % (self.path, self.length)
+    #----------------------------------------------------------------------
+    def _buffer(self):
+        """returns a context yielding the document"""
+        if self.mapped and not os.path.isfile(self.source):
+            raise IOError("the file holding %r was removed" % self)
+        return _document(self.source, self.mapped)
+    #----------------------------------------------------------------------
+    def raw(self):
+        """returns the payload text as it is in the document, as bytes"""
+        with self._buffer() as buf:
+            return bytes(buf[self.offset:self.offset + self.length])
+    #----------------------------------------------------------------------
+    def text(self):
+        """returns the payload text as convert() would, entities resolved"""
+        raw = self.raw()
+        if b'&' in raw:
+            from .converters import ET
+            return ET.XML(b"<Data>" + raw + b"</Data>").text.strip()
+        return raw.decode("utf-8").strip()
+    #----------------------------------------------------------------------
+    def iter_raw(self, chunk_size=CHUNK_SIZE):
+        """
+        yields the payload text as it is in the document, already
+        escaped, as strings of about chunk_size characters
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        end = self.offset + self.length
+        with self._buffer() as buf:
+            for start in range(self.offset, end, chunk_size):
+                yield decoder.decode(buf[start:min(start + chunk_size, end)])
+        tail = decoder.decode(b"", True)
+        if tail:
+            yield tail
+    #----------------------------------------------------------------------
+    def iter_decoded(self, chunk_size=CHUNK_SIZE):
+        """yields the decoded payload in chunks"""
+        end = self.offset + self.length
+        with self._buffer() as buf:
+            if buf.find(b'&', self.offset, end) != -1:
+                yield binascii.a2b_base64(self.text().encode("ascii"))
+                return
+            pending = b""
+            for start in range(self.offset, end, chunk_size):
+                pending += _NOT_BASE64.sub(
+                    b"", buf[start:min(start + chunk_size, end)])
+                usable = len(pending) - len(pending) % 4
+                if usable:
+                    yield binascii.a2b_base64(pending[:usable])
+                    pending = pending[usable:]
+            if pending:
+                yield binascii.a2b_base64(pending)
+    #----------------------------------------------------------------------
+    def decode(self):
+        """returns the decoded payload as bytes"""
+        return b"".join(self.iter_decoded())
+    #----------------------------------------------------------------------
+    def extension(self):
+        """returns a file extension guessed from the decoded payload"""
+        name = self.attributes.get('OriginalFileName')
+        if name and os.path.splitext(name)[1]:
+            return os.path.splitext(name)[1]
+        chunks = self.iter_decoded(16)
+        head = next(chunks, b"")
+        chunks.close()
+        for magic, extension in _EXTENSIONS:
+            if head.startswith(magic):
+                return extension
+        return ".bin"
+    #----------------------------------------------------------------------
+    def extract(self, path):
+        """
+        decodes the payload into a file in chunks, without holding it in
+        memory.  Returns the path.
+        """
+        with open(path, 'wb') as writer:
+            for chunk in self.iter_decoded():
+                writer.write(chunk)
+        return path
+    #----------------------------------------------------------------------
+    def __eq__(self, other):
+        if isinstance(other, BinaryPayload):
+            return self.raw() == other.raw()
+        if isinstance(other, string_types):
+            return self.text() == other.strip()
+        return NotImplemented
+    #----------------------------------------------------------------------
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+    __hash__ = None
+#--------------------------------------------------------------------------
+@contextmanager
+def _document(source, mapped):
+    """yields the document bytes, or a read only memory map of a file"""
+    if not mapped:
+        yield source
+        return
+    with open(source, 'rb') as reader:
+        buf = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield buf
+        finally:
+            buf.close()
+########################################################################
+class _Closed(Exception):
+    """stops the scan of a Binary element once it is closed"""
+    pass
+#--------------------------------------------------------------------------
+def _outside_markup(buf, position):
+    """returns True if position is not inside a comment or CDATA section"""
+    return buf.rfind(b"<!--", 0, position) <= buf.rfind(b"-->", 0, position) \
+       and buf.rfind(b"<![CDATA[", 0, position) <= \
+           buf.rfind(b"]]>", 0, position)
+#--------------------------------------------------------------------------
+def _scan_binary(buf, position, root, number, endings):
+    """
+    returns (elements, closed) for the payload Data elements of the
+    number-th Binary element, starting at position, where elements is
+    the list of (tag, index, start offset, attributes) from root down.
+    Only the Binary element is fed to expat, in chunks.
+    """
+    parser = expat.ParserCreate()
+    stack = [root]
+    counts = [{"Binary" : number}]
+    found = []
+    #----------------------------------------------------------------------
+    def start(tag, attrib):
+        index = counts[-1].get(tag, 0)
+        counts[-1][tag] = index + 1
+        counts.append({})
+        stack.append((tag, index, position + parser.CurrentByteIndex,
+                      attrib))
+    #----------------------------------------------------------------------
+    def end(tag):
+        if tuple(item[0] for item in stack[1:]) in endings:
+            found.append((stack[:], position + parser.CurrentByteIndex))
+        stack.pop()
+        counts.pop()
+        if len(stack) == 1:
+            raise _Closed()
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    try:
+        for offset in range(position, len(buf), CHUNK_SIZE):
+            parser.Parse(bytes(buf[offset:offset + CHUNK_SIZE]), False)
+    except _Closed:
+        pass
+    return found
+#--------------------------------------------------------------------------
+def find_payloads(source, mapped=False, owner=None):
+    """
+    returns a BinaryPayload for every Binary/Thumbnail/Data and
+    Binary/Enclosure/Data element under the root of the exported
+    document.  source is the document as bytes or, when mapped is True,
+    the path of the file holding it, kept in place by owner.
+
+    The Binary elements are found with a byte search and only they are
+    scanned with expat, for element positions; the rest of the document
+    and the payload text are not parsed.
+    """
+    endings = set(tuple(p.split("/")) for p in PAYLOADS)
+    payloads = []
+    with _document(source, mapped) as buf:
+        for root in _ROOT.finditer(buf):
+            if _outside_markup(buf, root.start()):
+                break
+        else:
+            return payloads
+        root = (root.group(1).decode("utf-8"), 0, root.start(), {})
+        number = 0
+        for hit in _BINARY.finditer(buf, root[2] + 1):
+            if not _outside_markup(buf, hit.start()):
+                continue
+            found = _scan_binary(buf, hit.start(), root, number, endings)
+            number += 1
+            for elements, closed in found:
+                tag, index, opened, attrib = elements[-1]
+                match = _START_TAG.match(buf, opened)
+                if match is None or match.group().endswith(b"/>"):
+                    continue
+                location = [(t, i) for t, i, o, a in elements]
+                payloads.append(BinaryPayload(source, match.end(),
+                                              closed - match.end(),
+                                              location, attrib, mapped,
+                                              owner))
+    return payloads
+#--------------------------------------------------------------------------
+def attach_payloads(d, payloads):
+    """
+    puts each payload handle in place of its text in a dictionary from
+    convert().  Returns d.
+    """
+    for payload in payloads:
+        parent, key = None, None
+        node = d
+        for tag, index in payload.location:
+            parent, key = node, tag
+            node = node.get(tag) if isinstance(node, dict) else None
+            if isinstance(node, list):
+                parent, key = node, index
+                node = node[index] if index < len(node) else None
+        if isinstance(node, dict) and '#text' in node:
+            node['#text'] = payload
+        elif isinstance(node, string_types):
+            parent[key] = payload
+    return d
@@ -0,0 +1,237 @@
+"""
+Scratch space for the temporary xml files Paperwork exchanges with
+arcpy.  Each process gets its own folder, hermes-<host>-<pid>, under a
+configurable root (the system temp folder by default, or
+HERMES_SCRATCH_DIR), which is removed when the process exits.  Folders
+left behind by processes of this host that died are removed the first
+time the scratch space is used.  The root may be shared by several
+hosts: folders of other hosts are left alone, since whether their
+process is alive cannot be checked from here.
+
+Usage Example (put the scratch files on a RAM disk):
+
+  >>> import hermes.scratch
+  >>> hermes.scratch.configure(r"R:\\hermes")
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import sys
+import re
+import errno
+import atexit
+import socket
+import shutil
+import tempfile
+import threading
+
+PREFIX = "hermes-"
+FICLONE = 0x40049409
+INLINE_LIMIT = 16 * 1024 * 1024
+_scratch = None
+_settings = {"root" : None, "inline_limit" : INLINE_LIMIT}
+_lock = threading.Lock()
+#--------------------------------------------------------------------------
+def _host():
+    """returns the host name as it appears in scratch folder names"""
+    return re.sub(r"[^A-Za-z0-9.]", "_", socket.gethostname()) or "localhost"
+#--------------------------------------------------------------------------
+def _pid_alive(pid):
+    """returns True if a process with the given id is running"""
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return code.value == 259
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+########################################################################
+class ScratchSpace(object):
+    """
+    A per-process folder for temporary xml files.
+
+    Inputs:
+       root - optional - folder the per-process folder is created in.
+        Defaults to HERMES_SCRATCH_DIR or the system temp folder.
+       inline_limit - optional - exported metadata up to this many bytes
+        is read into memory and its file removed straight away; larger
+        documents stay on disk until the Paperwork object is closed.
+    """
+    _root = None
+    _directory = None
+    pid = None
+    host = None
+    inline_limit = None
+    #----------------------------------------------------------------------
+    def __init__(self, root=None, inline_limit=INLINE_LIMIT):
+        """Constructor"""
+        self._root = root or os.environ.get("HERMES_SCRATCH_DIR") or \
+                     tempfile.gettempdir()
+        self.inline_limit = inline_limit
+        self.pid = os.getpid()
+        self.host = _host()
+    #----------------------------------------------------------------------
+    @property
+    def root(self):
+        """gets the folder holding the per-process folders"""
+        return self._root
+    #----------------------------------------------------------------------
+    @property
+    def directory(self):
+        """gets this process's scratch folder, creating it if needed"""
+        if self._directory is None or not os.path.isdir(self._directory):
+            self._directory = os.path.join(self._root, "%s%s-%d" % (
+                PREFIX, self.host, self.pid))
+            if not os.path.isdir(self._directory):
+                os.makedirs(self._directory)
+        return self._directory
+    #----------------------------------------------------------------------
+    def mkstemp(self, suffix=".xml"):
+        """creates a scratch file and returns (file descriptor, path)"""
+        return tempfile.mkstemp(suffix, dir=self.directory)
+    #----------------------------------------------------------------------
+    def cleanup_stale(self):
+        """
+        removes the scratch folders of this host's processes that are no
+        longer running.  Folders of other hosts are kept.  Returns the
+        number of folders removed.
+        """
+        removed = 0
+        if not os.path.isdir(self._root):
+            return removed
+        prefix = "%s%s-" % (PREFIX, self.host)
+        for name in os.listdir(self._root):
+            if not name.startswith(prefix):
+                continue
+            try:
+                pid = int(name[len(prefix):])
+            except ValueError:
+                continue
+            if pid == self.pid or _pid_alive(pid):
+                continue
+            shutil.rmtree(os.path.join(self._root, name), ignore_errors=True)
+            removed += 1
+        return removed
+    #----------------------------------------------------------------------
+    def cleanup(self):
+        """removes this process's scratch folder"""
+        if self._directory is not None and self.pid == os.getpid():
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+########################################################################
+class ScratchFile(object):
+    """
+    Shared ownership of a scratch file: the file is removed when the
+    last reference to the ScratchFile is dropped.
+    """
+    path = None
+    #----------------------------------------------------------------------
+    def __init__(self, path):
+        """Constructor"""
+        self.path = path
+    #----------------------------------------------------------------------
+    def __del__(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+#--------------------------------------------------------------------------
+def _reflink(source, destination):
+    """
+    clones source to destination with the Linux FICLONE ioctl, which
+    shares the data blocks on file systems that support it (btrfs, xfs).
+    Returns False if the clone is not possible.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(source, 'rb') as reader:
+        with open(destination, 'wb') as writer:
+            try:
+                fcntl.ioctl(writer.fileno(), FICLONE, reader.fileno())
+                return True
+            except (IOError, OSError):
+                return False
+#--------------------------------------------------------------------------
+def place_file(source, destination, method="auto"):
+    """
+    puts the content of a scratch file at destination without reading it
+    into Python, replacing any file there.
+
+    Inputs:
+       source - the file to place.
+       destination - the path of the new file.
+       method - optional - 'auto' clones the file where the file system
+        supports it and copies it otherwise; 'hardlink' links
+        destination to the same data as source (both must be on one
+        volume), falling back to a copy; 'copy' always copies.
+    Output:
+       the method used: 'reflink', 'hardlink' or 'copy'
+    """
+    if method not in ("auto", "hardlink", "copy"):
+        raise ValueError("method must be 'auto', 'hardlink' or 'copy'")
+    if os.path.lexists(destination):
+        os.remove(destination)
+    if method == "hardlink" and hasattr(os, "link"):
+        try:
+            os.link(source, destination)
+            return "hardlink"
+        except OSError:
+            pass
+    elif method == "auto" and _reflink(source, destination):
+        return "reflink"
+    shutil.copyfile(source, destination)
+    return "copy"
+#--------------------------------------------------------------------------
+def configure(root=None, inline_limit=None):
+    """
+    sets where scratch files are written and how large an exported
+    document can be to be held in memory.  Applies to files created
+    after the call.
+
+    Inputs:
+       root - optional - folder the per-process scratch folders are
+        created in, None for HERMES_SCRATCH_DIR or the system temp
+        folder.
+       inline_limit - optional - see ScratchSpace.
+    """
+    global _scratch
+    with _lock:
+        _settings["root"] = root
+        if inline_limit is not None:
+            _settings["inline_limit"] = inline_limit
+        _scratch = None
+#--------------------------------------------------------------------------
+def get_scratch():
+    """returns the scratch space of the current process"""
+    global _scratch
+    with _lock:
+        if _scratch is None or _scratch.pid != os.getpid():
+            _scratch = ScratchSpace(_settings["root"],
+                                    _settings["inline_limit"])
+            _scratch.cleanup_stale()
+            atexit.register(_scratch.cleanup)
+        return _scratch
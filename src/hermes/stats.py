@@ -0,0 +1,197 @@
+"""
+Optional per-stage instrumentation of Paperwork.  When a listener is
+registered, every stage of reading and writing a dataset's metadata
+reports a StageEvent with its wall time and byte count:
+
+  export - MetadataImporter_conversion writing the metadata to a file
+  read - reading the exported file
+  parse - parsing the xml document
+  convert - converting the document to a dictionary
+  serialize - building the xml of the document to save or export
+  import - MetadataImporter_conversion writing the metadata back
+
+With no listener registered the instrumentation points return straight
+away, so it costs a function call per stage.
+
+Usage Example:
+
+  >>> with hermes.stats.collect() as stats:
+  ...     list(PaperworkCollection(workspace=gdb).convert_all())
+  >>> print(stats)
+  >>> stats.percentile("export", 95)
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import time
+import threading
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+
+STAGES = ('export', 'read', 'parse', 'convert', 'serialize', 'import')
+clock = getattr(time, "perf_counter", time.time)
+_listeners = ()
+_lock = threading.Lock()
+
+StageEvent = namedtuple("StageEvent", ["dataset", "stage", "seconds", "nbytes"])
+#--------------------------------------------------------------------------
+def add_listener(listener):
+    """registers a function called with every StageEvent"""
+    global _listeners
+    with _lock:
+        _listeners = _listeners + (listener,)
+#--------------------------------------------------------------------------
+def remove_listener(listener):
+    """unregisters a listener added with add_listener()"""
+    global _listeners
+    with _lock:
+        _listeners = tuple(l for l in _listeners if l != listener)
+#--------------------------------------------------------------------------
+def start():
+    """returns the start time of a stage, or None when nothing listens"""
+    if _listeners:
+        return clock()
+    return None
+#--------------------------------------------------------------------------
+def stop(started, stage, dataset, nbytes=0):
+    """reports a stage that began at started to every listener"""
+    if started is None:
+        return
+    event = StageEvent(dataset, stage, clock() - started, nbytes)
+    for listener in _listeners:
+        listener(event)
+#--------------------------------------------------------------------------
+def _percentile(samples, p):
+    """returns the p-th percentile of sorted samples, interpolated"""
+    if not samples:
+        return None
+    position = (len(samples) - 1) * p / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(samples) - 1)
+    return samples[lower] + (samples[upper] - samples[lower]) * \
+           (position - lower)
+########################################################################
+class StageStats(object):
+    """
+    A listener aggregating StageEvents: per stage call counts, total time
+    and bytes, and time percentiles; and, unless per_dataset is False,
+    the total time and bytes per dataset and stage.
+
+    datasets - dictionary of dataset to {stage : seconds}.
+    dataset_bytes - dictionary of dataset to {stage : bytes}.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, per_dataset=True):
+        """Constructor"""
+        self.per_dataset = per_dataset
+        self._lock = threading.Lock()
+        self._samples = OrderedDict((stage, []) for stage in STAGES)
+        self._bytes = dict((stage, 0) for stage in STAGES)
+        self._sorted = {}
+        self.datasets = {}
+        self.dataset_bytes = {}
+    #----------------------------------------------------------------------
+    def __call__(self, event):
+        with self._lock:
+            self._samples.setdefault(event.stage, []).append(event.seconds)
+            self._bytes[event.stage] = self._bytes.get(event.stage, 0) + \
+                                       event.nbytes
+            self._sorted.pop(event.stage, None)
+            if self.per_dataset:
+                stages = self.datasets.setdefault(event.dataset, {})
+                stages[event.stage] = stages.get(event.stage, 0.0) + \
+                                      event.seconds
+                nbytes = self.dataset_bytes.setdefault(event.dataset, {})
+                nbytes[event.stage] = nbytes.get(event.stage, 0) + \
+                                      event.nbytes
+    #----------------------------------------------------------------------
+    def count(self, stage):
+        """returns the number of times a stage ran"""
+        return len(self._samples.get(stage, ()))
+    #----------------------------------------------------------------------
+    def total(self, stage):
+        """returns the total seconds spent in a stage"""
+        return sum(self._samples.get(stage, ()))
+    #----------------------------------------------------------------------
+    def nbytes(self, stage):
+        """returns the total bytes a stage processed"""
+        return self._bytes.get(stage, 0)
+    #----------------------------------------------------------------------
+    def percentile(self, stage, p):
+        """returns the p-th percentile (0-100) of a stage's seconds"""
+        with self._lock:
+            samples = self._sorted.get(stage)
+            if samples is None:
+                samples = self._sorted[stage] = \
+                          sorted(self._samples.get(stage, ()))
+        return _percentile(samples, p)
+    #----------------------------------------------------------------------
+    def summary(self):
+        """
+        returns a dictionary of stage to its count, total, bytes and
+        p50/p90/p99 seconds, for the stages that ran.
+        """
+        result = OrderedDict()
+        for stage in list(self._samples):
+            if not self.count(stage):
+                continue
+            result[stage] = {
+                "count" : self.count(stage),
+                "total" : self.total(stage),
+                "bytes" : self.nbytes(stage),
+                "p50" : self.percentile(stage, 50),
+                "p90" : self.percentile(stage, 90),
+                "p99" : self.percentile(stage, 99)
+            }
+        return result
+    #----------------------------------------------------------------------
+    def dataset_summary(self, dataset):
+        """
+        returns a dictionary of stage to the total seconds and bytes it
+        took for one dataset, for the stages that ran on it.
+        """
+        with self._lock:
+            seconds = dict(self.datasets.get(dataset, {}))
+            nbytes = dict(self.dataset_bytes.get(dataset, {}))
+        result = OrderedDict()
+        for stage in list(self._samples):
+            if stage in seconds:
+                result[stage] = {
+                    "total" : seconds[stage],
+                    "bytes" : nbytes.get(stage, 0)
+                }
+        return result
+    #----------------------------------------------------------------------
+    def __str__(self):
+        lines = ["%-10s %7s %10s %12s %9s %9s %9s" %
+                 ("stage", "count", "total s", "bytes", "p50 ms", "p90 ms",
+                  "p99 ms")]
+        for stage, s in self.summary().items():
+            lines.append("%-10s %7d %10.3f %12d %9.2f %9.2f %9.2f" %
+                         (stage, s["count"], s["total"], s["bytes"],
+                          s["p50"] * 1000, s["p90"] * 1000, s["p99"] * 1000))
+        return "\n".join(lines)
+#--------------------------------------------------------------------------
+@contextmanager
+def collect(per_dataset=True):
+    """
+    registers a new StageStats for the duration of a with block and
+    yields it.
+    """
+    stats = StageStats(per_dataset)
+    add_listener(stats)
+    try:
+        yield stats
+    finally:
+        remove_listener(stats)
@@ -0,0 +1,338 @@
+"""
+Bulk metadata synchronization, e.g. a full resync of an enterprise
+geodatabase after a schema change.
+
+A BulkSync runs SynchronizeMetadata on many datasets from a pool of
+threads.  Each workspace has its own cap on concurrent syncs and a
+token bucket limits how many syncs start per second overall, so one SDE
+instance is not flooded.  Syncs that fail on a lock are put back in the
+queue and retried after an exponential backoff, while the workers go on
+with other datasets.  A callback gets every Result and the running
+SyncReport, with progress, throughput and failures.
+
+Usage Example:
+
+  >>> def progress(result, report):
+  ...     print(report)
+  >>> sync = BulkSync(limit=2, rate=20)
+  >>> report = sync.run(PaperworkCollection(workspace=sde), "ALWAYS",
+  ...                   callback=progress)
+  >>> report.failed
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import os
+import re
+import time
+import heapq
+import random
+import threading
+from collections import deque, OrderedDict
+from .common import *
+from .paperwork import Paperwork
+from .collection import PaperworkCollection, Result
+
+METHODS = ("ALWAYS", "ACCESSED", "CREATED", "NOT_CREATED", "OVERWRITE",
+           "SELECTIVE")
+LOCK_ERRORS = re.compile(r"000464|000496|schema lock|is locked|"
+                         r"lock request|database is locked|lock conflict",
+                         re.IGNORECASE)
+_clock = getattr(time, "monotonic", time.time)
+#--------------------------------------------------------------------------
+def is_lock_error(message):
+    """returns True if an error message is a lock that may clear"""
+    return LOCK_ERRORS.search(message) is not None
+#--------------------------------------------------------------------------
+def _sync(dataset, method):
+    Paperwork(dataset=dataset).setSyncMethod(method)
+    return dataset
+########################################################################
+class RateLimiter(object):
+    """
+    A thread safe token bucket: acquire() takes a token, waiting until
+    one is free.  Tokens refill at rate per second up to burst.
+
+    Inputs:
+       rate - tokens per second, None for no limit.
+       burst - optional - tokens that can be taken at once after an
+        idle period.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, rate=None, burst=1):
+        """Constructor"""
+        self.rate = float(rate) if rate else None
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = _clock()
+        self._lock = threading.Lock()
+    #----------------------------------------------------------------------
+    def acquire(self):
+        """takes a token, returns the seconds spent waiting for it"""
+        if self.rate is None:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = _clock()
+                self._tokens = min(self.burst, self._tokens +
+                                   (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+########################################################################
+class SyncReport(object):
+    """
+    The running totals of a bulk sync.
+
+    total - datasets scheduled.
+    done - datasets finished, synced or failed.
+    synced - list of the synced datasets.
+    failed - dictionary of dataset to error message.
+    retries - number of retried lock failures.
+    elapsed - seconds since the run started.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, total):
+        """Constructor"""
+        self.total = total
+        self.done = 0
+        self.synced = []
+        self.failed = {}
+        self.retries = 0
+        self._started = _clock()
+        self._finished = None
+    #----------------------------------------------------------------------
+    @property
+    def elapsed(self):
+        """gets the seconds the run has taken so far"""
+        return (self._finished or _clock()) - self._started
+    #----------------------------------------------------------------------
+    @property
+    def rate(self):
+        """gets the throughput in datasets per second"""
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+    #----------------------------------------------------------------------
+    @property
+    def remaining(self):
+        """gets the estimated seconds left, None before the first result"""
+        rate = self.rate
+        return (self.total - self.done) / rate if rate else None
+    #----------------------------------------------------------------------
+    def __str__(self):
+        return "%d/%d done, %d failed, %d retries, %.1f datasets/s" % (
+            self.done, self.total, len(self.failed), self.retries, self.rate)
+########################################################################
+class _Schedule(object):
+    """
+    the datasets waiting to be synced, queued per workspace, with the
+    number of syncs running on each workspace and the retries waiting
+    for their backoff to pass
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, datasets, limit, limits):
+        self.queues = OrderedDict()
+        for dataset in datasets:
+            workspace = workspace_path(dataset)
+            self.queues.setdefault(workspace, deque()).append((dataset, 0))
+        self.active = dict((workspace, 0) for workspace in self.queues)
+        self.limits = dict(
+            (workspace, limits.get(os.path.normcase(workspace), limit))
+            for workspace in self.queues)
+        self.delayed = []
+        self.pending = len(datasets)
+        self.condition = threading.Condition()
+        self._sequence = 0
+    #----------------------------------------------------------------------
+    def _ready(self, now):
+        """moves the retries whose backoff has passed to their queues"""
+        while self.delayed and self.delayed[0][0] <= now:
+            ready, sequence, workspace, item = heapq.heappop(self.delayed)
+            self.queues[workspace].append(item)
+    #----------------------------------------------------------------------
+    def take(self):
+        """
+        returns (workspace, dataset, attempt) for the next dataset whose
+        workspace is below its cap, waiting if needed, or None once every
+        dataset is finished
+        """
+        with self.condition:
+            while self.pending > 0:
+                now = _clock()
+                self._ready(now)
+                for workspace, queue in self.queues.items():
+                    if queue and \
+                       self.active[workspace] < self.limits[workspace]:
+                        self.active[workspace] += 1
+                        # rotate so the workspaces take turns
+                        self.queues.pop(workspace)
+                        self.queues[workspace] = queue
+                        dataset, attempt = queue.popleft()
+                        return workspace, dataset, attempt
+                timeout = self.delayed[0][0] - now if self.delayed else None
+                self.condition.wait(timeout)
+            return None
+    #----------------------------------------------------------------------
+    def finish(self, workspace, dataset=None, attempt=0, delay=None):
+        """
+        frees a workspace slot; with a delay the dataset is queued again
+        for another attempt after delay seconds
+        """
+        with self.condition:
+            self.active[workspace] -= 1
+            if delay is None:
+                self.pending -= 1
+            else:
+                self._sequence += 1
+                heapq.heappush(self.delayed, (_clock() + delay,
+                                              self._sequence, workspace,
+                                              (dataset, attempt)))
+            self.condition.notify_all()
+########################################################################
+class BulkSync(object):
+    """
+    Synchronizes the metadata of many datasets concurrently, see
+    Paperwork.setSyncMethod().
+
+    Inputs:
+       workers - optional - number of threads.  arcpy geoprocessing tools
+        are not thread safe, so the default of 1 runs one sync at a
+        time; only raise it where concurrent SynchronizeMetadata calls
+        are known to be safe.
+       limit - optional - concurrent syncs allowed per workspace.
+       limits - optional - dictionary of workspace path to its own limit,
+        e.g. {r"c:\\connections\\prod.sde" : 2}.  Keys are matched to
+        the workspace of each dataset, see workspace_key().  Limits below
+        1 are raised to 1.
+       rate - optional - most syncs started per second over all
+        workspaces, None for no limit.
+       burst - optional - syncs that may start at once under the rate.
+       retries - optional - times a dataset is retried after a lock
+        error before it is reported as failed.
+       backoff - optional - seconds before the first retry; each retry
+        of a dataset waits twice as long, up to max_backoff, with random
+        jitter so retries do not line up.
+       transient - optional - function of an error message that returns
+        True for errors worth retrying, by default is_lock_error().
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, workers=1, limit=2, limits=None, rate=None, burst=1,
+                 retries=3, backoff=1.0, max_backoff=60.0, transient=None):
+        """Constructor"""
+        self.workers = max(1, int(workers))
+        self.limit = max(1, int(limit))
+        self.limits = dict((workspace_key(workspace), max(1, int(value)))
+                           for workspace, value in (limits or {}).items())
+        self.rate = rate
+        self.burst = burst
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.transient = transient or is_lock_error
+    #----------------------------------------------------------------------
+    def _delay(self, attempt):
+        """returns the backoff before retry number attempt + 1"""
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+    #----------------------------------------------------------------------
+    def run(self, datasets, method="ALWAYS", callback=None):
+        """
+        synchronizes a list of datasets or a PaperworkCollection and
+        returns the SyncReport once every dataset is synced or failed.
+
+        Inputs:
+           datasets - list of dataset paths or a PaperworkCollection.
+           method - optional - sync type, see Paperwork.setSyncMethod().
+           callback - optional - called with each Result and the
+            SyncReport as datasets finish.  Calls are made one at a time.
+            A Result's value is the dataset path, and its error the last
+            error message.
+        Output:
+           SyncReport
+        """
+        if str(method).upper() not in METHODS:
+            raise HermesErrorHandler(
+                {
+                    "function": "BulkSync.run",
+                    "line": 0,
+                    "filename": "sync.py",
+                    "synerror": "Invalid method type: %s" % method,
+                    "arc" : ""
+                }
+            )
+        if isinstance(datasets, PaperworkCollection):
+            datasets = datasets.datasets
+        datasets = list(datasets)
+        schedule = _Schedule(datasets, self.limit, self.limits)
+        limiter = RateLimiter(self.rate, self.burst)
+        report = SyncReport(len(datasets))
+        lock = threading.Lock()
+        errors = []
+        #------------------------------------------------------------------
+        def finished(result):
+            with lock:
+                report.done += 1
+                if result.ok:
+                    report.synced.append(result.dataset)
+                else:
+                    report.failed[result.dataset] = result.error
+                if callback is not None:
+                    callback(result, report)
+        #------------------------------------------------------------------
+        def work():
+            try:
+                while True:
+                    task = schedule.take()
+                    if task is None:
+                        return
+                    workspace, dataset, attempt = task
+                    limiter.acquire()
+                    try:
+                        value = _sync(dataset, method)
+                    except Exception as e:
+                        message = str(e)
+                        if attempt < self.retries and self.transient(message):
+                            with lock:
+                                report.retries += 1
+                            schedule.finish(workspace, dataset, attempt + 1,
+                                            self._delay(attempt))
+                            continue
+                        schedule.finish(workspace)
+                        finished(Result(dataset, None, message))
+                        continue
+                    schedule.finish(workspace)
+                    finished(Result(dataset, value, None))
+            except Exception as e:
+                # a failing callback stops the run; drop the queue so the
+                # other workers finish too
+                with schedule.condition:
+                    errors.append(e)
+                    schedule.pending = 0
+                    schedule.condition.notify_all()
+        threads = [threading.Thread(target=work)
+                   for i in range(min(self.workers, len(datasets)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report._finished = _clock()
+        if errors:
+            raise errors[0]
+        return report
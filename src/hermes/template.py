@@ -0,0 +1,191 @@
+"""
+Compiled metadata templates for stamping a standard document onto many
+datasets.
+
+A MetadataTemplate is parsed and serialized once.  ${name} placeholders
+in element text and attribute values become slots, and rendering a
+document for a dataset only escapes the values and joins them with the
+pre-encoded xml around them.  $$ is a literal $.
+
+Usage Example:
+
+  >>> template = MetadataTemplate(r"c:\\templates\\standard.xml",
+  ...                             defaults={"owner" : "GIS Office"})
+  >>> for fc in new_layers:
+  ...     Paperwork(dataset=fc).stamp(template, {"title" : fc})
+  >>> # only replace the sections the template has, keep the rest
+  >>> Paperwork(dataset=fc).stamp(template, {"title" : fc}, merge=True)
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import io
+import re
+from .common import string_types
+from .converters import ET, metadata_to_dictionary, write_dictionary, \
+     write_element, _escape_text, _escape_attrib
+
+PLACEHOLDER = re.compile(r"\$(?:(\$)|\{([_a-zA-Z][_a-zA-Z0-9]*)\})")
+#--------------------------------------------------------------------------
+def _serialize(source):
+    """returns the xml document of a template source as a string"""
+    writer = io.BytesIO()
+    if isinstance(source, dict):
+        write_dictionary(source, writer)
+    else:
+        if isinstance(source, (string_types, bytes)):
+            text = source.decode("utf-8") if isinstance(source, bytes) \
+                   else source
+            if not text.lstrip().startswith("<"):
+                with open(source, 'rb') as reader:
+                    source = reader.read()
+            elif not isinstance(source, bytes):
+                source = source.encode("utf-8")
+            source = ET.XML(source)
+        write_element(source, writer)
+    return writer.getvalue().decode("utf-8")
+########################################################################
+class MetadataTemplate(object):
+    """
+    A metadata document with ${name} slots, compiled once and rendered
+    per dataset.
+
+    Inputs:
+       source - the template: an xml string, the path of an xml file, a
+        dictionary in the format of Paperwork.convert() or an
+        ElementTree element.
+       defaults - optional - values for slots that render() is not
+        given.
+    """
+    _parts = None
+    defaults = None
+    slots = None
+    #----------------------------------------------------------------------
+    def __init__(self, source, defaults=None):
+        """Constructor"""
+        self.defaults = dict(defaults or {})
+        xml = _serialize(source)
+        parts = []
+        slots = []
+        literal = []
+        position = 0
+        for match in PLACEHOLDER.finditer(xml):
+            literal.append(xml[position:match.start()])
+            position = match.end()
+            if match.group(1):
+                literal.append("$")
+                continue
+            parts.append("".join(literal).encode("utf-8"))
+            literal = []
+            in_tag = xml.rfind("<", 0, match.start()) > \
+                     xml.rfind(">", 0, match.start())
+            name = match.group(2)
+            parts.append((name, _escape_attrib if in_tag else _escape_text))
+            if name not in slots:
+                slots.append(name)
+        literal.append(xml[position:])
+        parts.append("".join(literal).encode("utf-8"))
+        self._parts = parts
+        self.slots = tuple(slots)
+    #----------------------------------------------------------------------
+    def __repr__(self):
+        return "<MetadataTemplate %s>" % ", ".join(self.slots)
+    #----------------------------------------------------------------------
+    def render(self, values=None, **kwargs):
+        """
+        returns the xml document with every slot filled, as UTF-8 bytes.
+        Values are taken from kwargs, values and the defaults, in that
+        order; None renders as an empty string.  Raises KeyError for a
+        slot with no value.
+        """
+        if values or kwargs:
+            merged = dict(self.defaults)
+            merged.update(values or {})
+            merged.update(kwargs)
+        else:
+            merged = self.defaults
+        pieces = []
+        for part in self._parts:
+            if isinstance(part, bytes):
+                pieces.append(part)
+                continue
+            name, escape = part
+            if name not in merged:
+                raise KeyError("no value for template slot '%s'" % name)
+            value = merged[name]
+            if value is None:
+                value = ""
+            elif not isinstance(value, string_types):
+                value = str(value)
+            pieces.append(escape(value).encode("utf-8",
+                                               "xmlcharrefreplace"))
+        return b"".join(pieces)
+    #----------------------------------------------------------------------
+    def write(self, writer, values=None, **kwargs):
+        """
+        writes the rendered document to a binary file object, returns the
+        number of bytes written
+        """
+        data = self.render(values, **kwargs)
+        writer.write(data)
+        return len(data)
+    #----------------------------------------------------------------------
+    def element(self, values=None, **kwargs):
+        """returns the rendered document as an ElementTree element"""
+        return ET.XML(self.render(values, **kwargs))
+    #----------------------------------------------------------------------
+    def to_dict(self, values=None, **kwargs):
+        """returns the rendered document in the format of convert()"""
+        return metadata_to_dictionary(self.element(values, **kwargs))
+    #----------------------------------------------------------------------
+    def merge_into(self, root, values=None, keep=False):
+        """
+        merges the rendered document into the element root, which must
+        have the same tag.  Each top level section of the template
+        replaces the sections of the same tag in root, where it keeps
+        their place; when keep is True, sections root already has are
+        left alone and only the missing ones are added.  Root attributes
+        are merged the same way.  Sections that would not change are not
+        touched.
+
+        Returns the list of the top level tags ('@name' for attributes)
+        that changed.
+        """
+        rendered = self.element(values)
+        if rendered.tag != root.tag:
+            raise ValueError("the template root <%s> does not match <%s>" %
+                             (rendered.tag, root.tag))
+        changed = []
+        for name, value in rendered.attrib.items():
+            if name in root.attrib and (keep or root.get(name) == value):
+                continue
+            root.set(name, value)
+            changed.append("@" + name)
+        sections = []
+        for node in rendered:
+            if node.tag not in sections:
+                sections.append(node.tag)
+        for tag in sections:
+            new = [node for node in rendered if node.tag == tag]
+            old = [node for node in root if node.tag == tag]
+            if old and (keep or [metadata_to_dictionary(n) for n in old] ==
+                        [metadata_to_dictionary(n) for n in new]):
+                continue
+            index = list(root).index(old[0]) if old else len(root)
+            for node in old:
+                root.remove(node)
+            for offset, node in enumerate(new):
+                root.insert(index + offset, node)
+            changed.append(tag)
+        return changed
@@ -0,0 +1,266 @@
+"""
+Mapping views over a metadata element tree.  A view reads and writes the
+ElementTree nodes directly, using the same '@attribute', '#text' and
+list conventions as Paperwork.convert(), and only wraps a child element
+when it is accessed.
+
+Example:
+
+  >>> view = Paperwork(dataset=fc).view()
+  >>> keys = view['metadata']['dataIdInfo']['searchKeys']['keyword']
+  >>> keys.append('USA')
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import copy
+try:
+    from collections.abc import MutableMapping, MutableSequence
+except ImportError:
+    from collections import MutableMapping, MutableSequence
+from .common import string_types
+from .converters import ET, fill_element, metadata_to_dictionary
+
+#--------------------------------------------------------------------------
+def _build(tag, value):
+    """creates an element from a dictionary value or a view"""
+    if isinstance(value, ElementView):
+        node = copy.deepcopy(value.element)
+        node.tag = tag
+        return node
+    node = ET.Element(tag)
+    fill_element(node, value)
+    return node
+########################################################################
+class ElementView(MutableMapping):
+    """
+    A dictionary-like proxy over one metadata element.
+
+    Keys are the tags of the child elements, '@name' for attributes and
+    '#text' for the element text.  A child with no children and no
+    attributes is returned as its text, a repeated child as an
+    ElementListView and any other child as an ElementView.  Assigning a
+    dictionary, list or string replaces the child elements with that tag.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, element, on_change=None, section=None):
+        """Constructor"""
+        self._element = element
+        self._on_change = on_change
+        self._section = section
+    #----------------------------------------------------------------------
+    @property
+    def element(self):
+        """gets the underlying xml element"""
+        return self._element
+    #----------------------------------------------------------------------
+    def _touch(self, key):
+        """reports a change to the top level section holding this view"""
+        if self._on_change is not None:
+            self._on_change(key if self._section is None else self._section)
+    #----------------------------------------------------------------------
+    def _wrap(self, node):
+        """returns the value of a child element"""
+        if len(node) or node.attrib:
+            return ElementView(node, self._on_change,
+                               node.tag if self._section is None else self._section)
+        if node.text:
+            return node.text.strip()
+        return None
+    #----------------------------------------------------------------------
+    def _children(self, tag):
+        """returns the child elements with the given tag"""
+        return [node for node in self._element if node.tag == tag]
+    #----------------------------------------------------------------------
+    def __getitem__(self, key):
+        if key.startswith('@'):
+            return self._element.attrib[key[1:]]
+        elif key == '#text':
+            text = (self._element.text or "").strip()
+            if text and (len(self._element) or self._element.attrib):
+                return text
+            raise KeyError(key)
+        children = self._children(key)
+        if not children:
+            raise KeyError(key)
+        elif len(children) == 1:
+            return self._wrap(children[0])
+        return ElementListView(self, key)
+    #----------------------------------------------------------------------
+    def __setitem__(self, key, value):
+        if isinstance(value, ElementListView):
+            value = list(value)
+        if key.startswith('@'):
+            assert isinstance(value, string_types)
+            self._element.set(key[1:], value)
+        elif key == '#text':
+            assert isinstance(value, string_types)
+            self._element.text = value
+        else:
+            children = self._children(key)
+            if children:
+                index = list(self._element).index(children[0])
+                for node in children:
+                    self._element.remove(node)
+            else:
+                index = len(self._element)
+            values = value if isinstance(value, list) else [value]
+            for offset, item in enumerate(values):
+                self._element.insert(index + offset, _build(key, item))
+        self._touch(key)
+    #----------------------------------------------------------------------
+    def __delitem__(self, key):
+        if key.startswith('@'):
+            del self._element.attrib[key[1:]]
+        elif key == '#text':
+            self[key]
+            self._element.text = None
+        else:
+            children = self._children(key)
+            if not children:
+                raise KeyError(key)
+            for node in children:
+                self._element.remove(node)
+        self._touch(key)
+    #----------------------------------------------------------------------
+    def __iter__(self):
+        seen = set()
+        for node in self._element:
+            if node.tag not in seen:
+                seen.add(node.tag)
+                yield node.tag
+        for name in list(self._element.attrib):
+            yield '@' + name
+        if '#text' in self:
+            yield '#text'
+    #----------------------------------------------------------------------
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+    #----------------------------------------------------------------------
+    def __len__(self):
+        return sum(1 for _ in self)
+    #----------------------------------------------------------------------
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self._element.tag)
+    #----------------------------------------------------------------------
+    def to_dict(self):
+        """converts the element to the dictionary format of convert()"""
+        return metadata_to_dictionary(self._element)[self._element.tag]
+########################################################################
+class ElementListView(MutableSequence):
+    """
+    A list-like proxy over the repeated child elements of an ElementView
+    that share one tag.  Changing the list changes the document.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, parent, tag):
+        """Constructor"""
+        self._parent = parent
+        self._tag = tag
+    #----------------------------------------------------------------------
+    def _elements(self):
+        """returns the elements the list is over"""
+        return self._parent._children(self._tag)
+    #----------------------------------------------------------------------
+    def __getitem__(self, index):
+        elements = self._elements()
+        if isinstance(index, slice):
+            return [self._parent._wrap(node) for node in elements[index]]
+        return self._parent._wrap(elements[index])
+    #----------------------------------------------------------------------
+    def __setitem__(self, index, value):
+        node = self._elements()[index]
+        parent = self._parent.element
+        position = list(parent).index(node)
+        parent.remove(node)
+        parent.insert(position, _build(self._tag, value))
+        self._parent._touch(self._tag)
+    #----------------------------------------------------------------------
+    def __delitem__(self, index):
+        node = self._elements()[index]
+        self._parent.element.remove(node)
+        self._parent._touch(self._tag)
+    #----------------------------------------------------------------------
+    def insert(self, index, value):
+        elements = self._elements()
+        parent = self._parent.element
+        if index < len(elements):
+            position = list(parent).index(elements[index])
+        elif elements:
+            position = list(parent).index(elements[-1]) + 1
+        else:
+            position = len(parent)
+        parent.insert(position, _build(self._tag, value))
+        self._parent._touch(self._tag)
+    #----------------------------------------------------------------------
+    def __len__(self):
+        return len(self._elements())
+    #----------------------------------------------------------------------
+    def __repr__(self):
+        return repr(list(self))
+########################################################################
+class MetadataView(MutableMapping):
+    """
+    A dictionary-like proxy over a whole metadata document.  It has a
+    single key, the root tag, like the dictionary from convert().
+    Paperwork.save() accepts the view and writes its tree directly.
+    """
+    #----------------------------------------------------------------------
+    def __init__(self, element, on_change=None):
+        """Constructor"""
+        self._root = ElementView(element, on_change)
+    #----------------------------------------------------------------------
+    @property
+    def element(self):
+        """gets the root xml element"""
+        return self._root.element
+    #----------------------------------------------------------------------
+    def __getitem__(self, key):
+        if key != self.element.tag:
+            raise KeyError(key)
+        return self._root
+    #----------------------------------------------------------------------
+    def __setitem__(self, key, value):
+        if key != self.element.tag:
+            raise KeyError(key)
+        node = _build(key, value)
+        root = self.element
+        sections = set(child.tag for child in root)
+        root.clear()
+        root.text = node.text
+        root.attrib.update(node.attrib)
+        root.extend(list(node))
+        sections.update(child.tag for child in root)
+        for section in sections or [key]:
+            self._root._touch(section)
+    #----------------------------------------------------------------------
+    def __delitem__(self, key):
+        raise TypeError("the root element of a document cannot be deleted")
+    #----------------------------------------------------------------------
+    def __iter__(self):
+        yield self.element.tag
+    #----------------------------------------------------------------------
+    def __len__(self):
+        return 1
+    #----------------------------------------------------------------------
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self.element.tag)
+    #----------------------------------------------------------------------
+    def to_dict(self):
+        """converts the document to the dictionary format of convert()"""
+        return metadata_to_dictionary(self.element)
@@ -0,0 +1,195 @@
+"""
+Parsed path expressions over a metadata element tree.  Paths use the
+XPath subset of ElementTree ('tag', '*', '.', '//', '[n]', '[@attr]',
+"[tag='text']", ...) and may end in '/@name' to address an attribute or
+'/#text' to address the element text.  A path starting with '/' names
+the root tag first, e.g. '/metadata/dataIdInfo/idPurp'; any other path
+is relative to the root element.
+
+compile_path() keeps the parsed form of recent paths, the root tag,
+element path, attribute or text target and plain steps, so running the
+same path over thousands of documents only splits it once.  The element
+path itself is run with ElementTree's findall() on every call.
+
+
+Copyright 2015 Esri
+Licensed under the Apache License, Version 2.0 (the 'License');
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an 'AS IS' BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import re
+import threading
+from collections import OrderedDict
+from .common import string_types
+from .converters import ET, fill_element, metadata_to_dictionary
+
+CACHE_SIZE = 1024
+PLAIN_STEP = re.compile(r"^(\{[^}]*\})?[^/\[\]@*.(){}]+$")
+_cache = OrderedDict()
+_lock = threading.Lock()
+_SLASH = re.compile(r"/(?![^{]*\})")
+#--------------------------------------------------------------------------
+def element_value(node):
+    """returns the dictionary value of an element, as convert() would"""
+    return metadata_to_dictionary(node)[node.tag]
+########################################################################
+class CompiledPath(object):
+    """
+    A path expression split once into its root tag, element path and
+    target, and evaluated with findall() against any number of metadata
+    trees.  Use compile_path() to reuse the instance of a path.
+    """
+    __slots__ = ('path', 'root', 'elements', 'target', 'steps')
+    #----------------------------------------------------------------------
+    def __init__(self, path):
+        """Constructor"""
+        self.path = path
+        self.root = None
+        self.target = None
+        parts = _SLASH.split(path)
+        if parts[0] == "" and len(parts) > 1:
+            self.root = parts[1]
+            parts = parts[2:]
+        if parts and (parts[-1].startswith("@") or parts[-1] == "#text"):
+            self.target = parts.pop()
+        if parts and parts[-1] == "" and len(parts) > 1:
+            parts[-1] = "*"
+        self.elements = "/".join(parts) or "."
+        parts = [] if self.elements == "." else parts
+        self.steps = parts if all(PLAIN_STEP.match(p) for p in parts) \
+                     else None
+        # reports an invalid path now rather than on first use
+        try:
+            ET.Element("metadata").findall(self.elements)
+        except (SyntaxError, KeyError, TypeError):
+            raise SyntaxError("invalid path: %s" % path)
+    #----------------------------------------------------------------------
+    def __repr__(self):
+        return "<CompiledPath %s>" % self.path
+    #----------------------------------------------------------------------
+    def findall(self, root):
+        """returns the elements of root's tree the path selects"""
+        if self.root is not None and root.tag != self.root:
+            return []
+        if self.elements == ".":
+            return [root]
+        return root.findall(self.elements)
+    #----------------------------------------------------------------------
+    def values(self, root):
+        """returns the values the path selects, in convert() format"""
+        nodes = self.findall(root)
+        if self.target is None:
+            return [element_value(node) for node in nodes]
+        elif self.target == "#text":
+            # whitespace only text is no text, as in convert() and views
+            texts = [(node.text or "").strip() for node in nodes]
+            return [text for text in texts if text]
+        name = self.target[1:]
+        return [node.get(name) for node in nodes if name in node.attrib]
+#--------------------------------------------------------------------------
+def compile_path(path):
+    """returns the CompiledPath of a path string, reusing a recent one"""
+    with _lock:
+        try:
+            compiled = _cache.pop(path)
+        except KeyError:
+            compiled = CompiledPath(path)
+            if len(_cache) >= CACHE_SIZE:
+                _cache.popitem(last=False)
+        _cache[path] = compiled
+        return compiled
+#--------------------------------------------------------------------------
+def section_tag(root, node, compiled):
+    """returns the tag of the top level section holding node"""
+    if compiled.steps:
+        return compiled.steps[0]
+    for child in root:
+        if child is node or any(n is node for n in child.iter()):
+            return child.tag
+    return root.tag
+#--------------------------------------------------------------------------
+def create_path(root, compiled):
+    """creates the elements of a plain path that does not exist yet"""
+    if compiled.steps is None or \
+       (compiled.root is not None and root.tag != compiled.root):
+        raise KeyError("%s does not exist and cannot be created" %
+                       compiled.path)
+    node = root
+    for step in compiled.steps:
+        child = node.find(step)
+        node = ET.SubElement(node, step) if child is None else child
+    return node
+#--------------------------------------------------------------------------
+def set_path(root, path, value, on_change=None):
+    """
+    sets the value of every element (or attribute, or text) a path
+    selects in root's tree, creating the elements of a plain path such
+    as 'dataIdInfo/idCitation/resTitle' if it selects nothing.
+
+    Inputs:
+       root - root element of the document.
+       path - path string or CompiledPath.
+       value - a string for attributes and text, otherwise a value in
+        convert() format.  A list replaces the selected elements with one
+        element per item.
+       on_change - optional - called with the top level section tag of
+        every element that changed.
+    Output:
+       True if the document changed.
+    """
+    compiled = path if isinstance(path, CompiledPath) else compile_path(path)
+    nodes = compiled.findall(root)
+    if not nodes:
+        nodes = [create_path(root, compiled)]
+    changed = False
+    if isinstance(value, list) and compiled.target is None:
+        if [element_value(node) for node in nodes] == value:
+            return False
+        parents = dict((child, parent) for parent in root.iter()
+                       for child in parent)
+        first = nodes[0]
+        if first is root:
+            raise ValueError("the root element cannot be replaced by a list")
+        parent = parents[first]
+        section = first.tag if parent is root else \
+                  section_tag(root, first, compiled)
+        index = list(parent).index(first)
+        for node in nodes:
+            parents[node].remove(node)
+        for offset, item in enumerate(value):
+            node = ET.Element(first.tag)
+            fill_element(node, item)
+            parent.insert(index + offset, node)
+        if on_change is not None:
+            on_change(section)
+        return True
+    for node in nodes:
+        if compiled.target is None:
+            if element_value(node) == value:
+                continue
+            tail = node.tail
+            node.clear()
+            node.tail = tail
+            fill_element(node, value)
+        elif compiled.target == "#text":
+            assert isinstance(value, string_types)
+            if (node.text or "").strip() == value:
+                continue
+            node.text = value
+        else:
+            assert isinstance(value, string_types)
+            if node.get(compiled.target[1:]) == value:
+                continue
+            node.set(compiled.target[1:], value)
+        changed = True
+        if on_change is not None:
+            on_change(section_tag(root, node, compiled))
+    return changed
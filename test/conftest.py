@@ -0,0 +1,61 @@
+"""
+pytest configuration.  Puts the source tree on the path and, when ArcGIS
+is not installed, stands in the fake arcpy from the benchmarks folder so
+the unit tests run anywhere.
+"""
+from __future__ import absolute_import
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+try:
+    import arcpy
+    HAS_ARCPY = True
+except ImportError:
+    import fakearcpy
+    sys.modules['arcpy'] = fakearcpy
+    HAS_ARCPY = False
+
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append("test_aio.py")
+
+SAMPLE = """<?xml version="1.0" encoding="UTF-8"?>
+<metadata xml:lang="en">
+  <Esri>
+    <CreaDate>20150101</CreaDate>
+    <ModDate>20150102</ModDate>
+    <ArcGISFormat>1.0</ArcGISFormat>
+    <SyncOnce>TRUE</SyncOnce>
+  </Esri>
+  <dataIdInfo>
+    <idCitation><resTitle Sync="TRUE">states</resTitle></idCitation>
+    <idAbs>Boundaries of the states.</idAbs>
+    <searchKeys><keyword>states</keyword><keyword>USA</keyword></searchKeys>
+    <idPurp></idPurp>
+    <resConst><Consts><useLimit>none</useLimit></Consts></resConst>
+  </dataIdInfo>
+  <eainfo>
+    <detailed Name="states">
+      <attr><attrlabl Sync="TRUE">FID</attrlabl><attrdef>id</attrdef></attr>
+      <attr><attrlabl Sync="TRUE">NAME</attrlabl><attrdef>name</attrdef></attr>
+    </detailed>
+  </eainfo>
+  <mdDateSt Sync="TRUE">20150102</mdDateSt>
+</metadata>
+"""
+DATASET = r"c:\temp\scratch.gdb\states"
+
+@pytest.fixture
+def dataset():
+    """registers the sample document with the fake arcpy"""
+    if HAS_ARCPY:
+        pytest.skip("uses the fake arcpy")
+    fakearcpy.reset()
+    fakearcpy.register(DATASET, SAMPLE)
+    return DATASET
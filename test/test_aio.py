@@ -0,0 +1,128 @@
+"""tests for the asyncio facade"""
+from __future__ import absolute_import
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import fakearcpy
+from conftest import SAMPLE
+from hermes import AsyncPaperwork, WorkspaceLimiter, HermesErrorHandler
+
+GDB = r"c:\temp\scratch.gdb"
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_aconvert_and_asave(dataset):
+    async def edit():
+        async with AsyncPaperwork(dataset) as pw:
+            d = await pw.aconvert()
+            d['metadata']['dataIdInfo']['idPurp'] = 'async'
+            return await pw.asave(d)
+    assert run(edit()) is True
+    assert b"<idPurp>async</idPurp>" in fakearcpy.metadata(dataset)
+
+
+def test_aproperties_and_export(tmpdir, dataset):
+    async def go():
+        async with AsyncPaperwork(dataset) as pw:
+            return (await pw.aproperties(),
+                    await pw.aexport_to_xml(str(tmpdir), "states"))
+    properties, path = run(go())
+    assert properties["tableName"] == "states"
+    assert path.endswith("states.xml")
+
+
+def test_direct_export(tmpdir, dataset):
+    async def go():
+        async with AsyncPaperwork(dataset) as pw:
+            return await pw.aexport_to_xml(str(tmpdir), "direct",
+                                           direct=True, method="copy")
+    path = run(go())
+    with open(path, 'rb') as reader:
+        assert reader.read() == fakearcpy.metadata(dataset)
+
+
+def test_limits_keys_are_normalized():
+    limiter = WorkspaceLimiter(limit=4, limits={"/data/a.gdb/" : 1,
+                                                "/data/b.sde/fds" : 2})
+    assert limiter.limits == {"/data/a.gdb" : 1, "/data/b.sde" : 2}
+    async def go():
+        return [limiter.slot(d) for d in ("/data/a.gdb/fc", "/data/a.gdb/x/fc",
+                                          "/data/c.gdb/fc")]
+    a, nested, other = run(go())
+    assert a is nested and a is not other
+
+
+def test_workspace_limit():
+    fakearcpy.reset(delay=0.01)
+    datasets = [GDB + "\\d%d" % i for i in range(12)]
+    for dataset in datasets:
+        fakearcpy.register(dataset, SAMPLE)
+    active = [0, 0]
+    lock = threading.Lock()
+    original = fakearcpy.MetadataImporter_conversion
+
+    def counting(source, target):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        try:
+            return original(source, target)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    fakearcpy.MetadataImporter_conversion = counting
+    executor = ThreadPoolExecutor(8)
+    try:
+        limiter = WorkspaceLimiter(limit=2)
+        async def go():
+            return await asyncio.gather(*(
+                AsyncPaperwork(dataset, limiter, executor).aconvert()
+                for dataset in datasets))
+        results = run(go())
+    finally:
+        fakearcpy.MetadataImporter_conversion = original
+        executor.shutdown()
+    assert len(results) == 12
+    assert active[1] <= 2
+
+
+def test_default_executor_runs_one_call_at_a_time():
+    datasets = ["/data/one.gdb/d%d" % i for i in range(4)] + \
+               ["/data/two.gdb/d%d" % i for i in range(4)]
+    for dataset in datasets:
+        fakearcpy.register(dataset, SAMPLE)
+    threads = set()
+    original = fakearcpy.MetadataImporter_conversion
+
+    def recording(source, target):
+        threads.add(threading.current_thread().ident)
+        return original(source, target)
+
+    fakearcpy.MetadataImporter_conversion = recording
+    try:
+        async def go():
+            return await asyncio.gather(*(AsyncPaperwork(d).aconvert()
+                                          for d in datasets))
+        assert len(run(go())) == 8
+    finally:
+        fakearcpy.MetadataImporter_conversion = original
+    assert len(threads) == 1
+    assert WorkspaceLimiter(limits={"/data/one.gdb" : 0}).limits == \
+           {"/data/one.gdb" : 1}
+
+
+def test_errors_propagate(dataset):
+    async def go():
+        return await AsyncPaperwork(dataset + "_missing").aconvert()
+    with pytest.raises(HermesErrorHandler):
+        run(go())
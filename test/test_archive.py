@@ -0,0 +1,100 @@
+"""
+Tests for the deduplicated snapshot archive.
+"""
+from __future__ import absolute_import
+
+import io
+import pytest
+import fakearcpy
+import hermes
+from hermes.archive import MetadataArchive, chunk_document
+from hermes.converters import ET, canonical_digest
+from conftest import SAMPLE
+
+CONTACT = ("<mdContact><rpOrgName>GIS Office</rpOrgName><rpCntInfo>"
+           "<cntAddress><delPoint>100 Main Street</delPoint><city>Springfield"
+           "</city><postCode>12345</postCode></cntAddress><cntPhone>"
+           "<voiceNum>555 0100</voiceNum></cntPhone></rpCntInfo></mdContact>")
+
+def _same(a, b):
+    return canonical_digest(io.BytesIO(a)) == canonical_digest(io.BytesIO(b))
+#--------------------------------------------------------------------------
+def test_chunk_document_round_trip():
+    xml = (b'<metadata xmlns:gmd="http://www.isotc211.org/2005/gmd">'
+           b'<gmd:title xml:lang="en">a &lt; b &amp; c</gmd:title>'
+           b'<mixed>one <b>two</b> three</mixed>' +
+           CONTACT.encode("utf-8") + b'<empty /></metadata>')
+    root, chunks = chunk_document(ET.XML(xml), min_chunk=64)
+    assert chunks[-1][0] == root
+    assert len(chunks) > 1
+    with MetadataArchive(":memory:", min_chunk=64) as archive:
+        archive.add("import", "doc", xml)
+        rebuilt = archive.rebuild("doc")
+    assert rebuilt.startswith(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+    assert _same(rebuilt, xml)
+    assert ET.XML(rebuilt).find("mixed/b").tail == " three"
+#--------------------------------------------------------------------------
+def test_snapshots_share_chunks(dataset):
+    other = "/data/other.gdb/roads"
+    fakearcpy.register(other, "<metadata><idinfo>roads</idinfo>%s</metadata>"
+                              % CONTACT)
+    fakearcpy.register(dataset, SAMPLE.replace("</metadata>",
+                                               CONTACT + "</metadata>"))
+    with MetadataArchive(":memory:", min_chunk=128) as archive:
+        summary = archive.snapshot([dataset, other, "/missing"], label="w1")
+        assert (summary["archived"], summary["failed"]) == (2, 1)
+        first = archive.stats()
+        shared = archive._connection.execute(
+            "SELECT COUNT(*) FROM links GROUP BY child "
+            "ORDER BY COUNT(*) DESC").fetchone()[0]
+        assert shared == 2
+        summary = archive.snapshot([dataset, other], label="w2")
+        assert (summary["archived"], summary["chunks"]) == (2, 0)
+        assert archive.stats()["chunks"] == first["chunks"]
+        assert archive.stats()["documents"] == 4
+        assert archive.stats()["documents_bytes"] == \
+               2 * len(archive.rebuild(dataset)) + 2 * len(archive.rebuild(other))
+
+        fakearcpy.register(other, "<metadata><idinfo>renamed</idinfo>%s"
+                                  "</metadata>" % CONTACT)
+        summary = archive.snapshot([other], label="w3")
+        assert summary["chunks"] == 1
+        assert [label for label, root in archive.history(other)] == \
+               ["w1", "w2", "w3"]
+        assert b"renamed" in archive.rebuild(other)
+        assert b"roads" in archive.rebuild(other, snapshot="w2")
+        assert _same(archive.rebuild(dataset, "w1"), fakearcpy.metadata(dataset))
+        assert archive.datasets("w3") == [other]
+        with pytest.raises(KeyError):
+            archive.rebuild(dataset, snapshot="w3")
+#--------------------------------------------------------------------------
+def test_prune(dataset):
+    with MetadataArchive(":memory:") as archive:
+        archive.snapshot([dataset], label="old")
+        fakearcpy.register(dataset, SAMPLE.replace("Sync", "Modified"))
+        archive.snapshot([dataset], label="new")
+        assert archive.prune() == (0, 0)
+        before = archive.stats()["chunks"]
+        removed, size = archive.prune(keep=1)
+        assert removed > 0 and size > 0
+        assert archive.stats()["chunks"] == before - removed
+        assert [s[1] for s in archive.snapshots()] == ["new"]
+        assert b"Modified" in archive.rebuild(dataset)
+        with pytest.raises(KeyError):
+            archive.rebuild(dataset, "old")
+#--------------------------------------------------------------------------
+def test_import_snapshot(dataset):
+    with MetadataArchive(":memory:") as archive:
+        archive.snapshot([dataset], label="w1")
+        pw = hermes.Paperwork(dataset=dataset)
+        pw.set("dataIdInfo/idAbs", "changed")
+        pw.save()
+        assert pw.get("dataIdInfo/idAbs") == "changed"
+        assert pw.importSnapshot(archive, "w1") > 0
+        assert pw.get("dataIdInfo/idAbs") == "Boundaries of the states."
+        copy = "/data/copy.gdb/states"
+        fakearcpy.register(copy, "<metadata />")
+        hermes.Paperwork(dataset=copy).importSnapshot(archive, dataset=dataset)
+        assert _same(fakearcpy.metadata(copy), archive.rebuild(dataset))
+        with pytest.raises(hermes.HermesErrorHandler):
+            hermes.Paperwork(dataset=copy).importSnapshot(archive, "w2")
@@ -0,0 +1,84 @@
+"""
+Tests for PaperworkCollection.
+"""
+from __future__ import absolute_import
+
+import os
+import pytest
+import fakearcpy
+from hermes.collection import PaperworkCollection, export_name
+from conftest import SAMPLE
+
+GDB = "/data/catalog.gdb"
+
+@pytest.fixture
+def catalog(dataset):
+    datasets = ["%s/fc_%d" % (GDB, i) for i in range(6)]
+    datasets.append("%s/fds/fc_in_fds" % GDB)
+    for path in datasets:
+        fakearcpy.register(path, SAMPLE)
+    return datasets
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_convert_all(catalog, workers):
+    collection = PaperworkCollection(catalog + ["/data/missing.shp"],
+                                     workers=workers, chunksize=2)
+    results = list(collection.convert_all(exclude=["*/eainfo"]))
+    assert sorted(r.dataset for r in results if r.ok) == sorted(catalog)
+    assert all('eainfo' not in r.value['metadata'] for r in results if r.ok)
+    assert [r.dataset for r in collection.errors] == ["/data/missing.shp"]
+
+def test_errors_are_per_run(catalog):
+    collection = PaperworkCollection(catalog + ["/data/missing.shp"])
+    assert collection._workers == 1
+    list(collection.convert_all())
+    list(collection.convert_all())
+    assert [r.dataset for r in collection.errors] == ["/data/missing.shp"]
+    fakearcpy.register("/data/missing.shp", SAMPLE)
+    results = collection.convert_all()
+    assert collection.errors == []
+    assert all(r.ok for r in results)
+
+def test_workspace_and_save_all(catalog):
+    collection = PaperworkCollection(workspace=GDB, workers=2)
+    assert sorted(collection.datasets) == sorted(catalog)
+    def edit(dataset, d):
+        if dataset.endswith("fc_0"):
+            d['metadata']['dataIdInfo']['idAbs'] = "edited"
+    results = dict((r.dataset, r.value) for r in collection.save_all(edit))
+    assert results.pop(GDB + "/fc_0") is True
+    assert not any(results.values())
+    assert b"edited" in fakearcpy.metadata(GDB + "/fc_0")
+
+def test_export_direct_all(catalog, tmpdir):
+    other = "/data/other.gdb/fc_0"
+    fakearcpy.register(other, SAMPLE)
+    collection = PaperworkCollection(catalog + [other], workers=2)
+    paths = dict((r.dataset, r.value)
+                 for r in collection.export_direct_all(str(tmpdir.join("out"))))
+    assert len(set(paths.values())) == len(catalog) + 1
+    name = os.path.basename(paths[other])
+    assert name.startswith("fc_0_") and name == export_name(other)
+    with open(paths[other], 'rb') as reader:
+        assert reader.read() == fakearcpy.metadata(other)
+
+def test_export_all_keeps_same_names_apart(tmpdir):
+    datasets = ["/data/ws%d.gdb/roads" % i for i in range(4)]
+    for path in datasets:
+        fakearcpy.register(path, SAMPLE)
+    out = str(tmpdir.join("out"))
+    paths = [r.value for r in PaperworkCollection(datasets).export_all(out)]
+    assert len(set(paths)) == 4
+    assert sorted(os.listdir(out)) == sorted(export_name(d) for d in datasets)
+
+def _entries(dataset, entries, suffix):
+    return sorted(entries), entries.get(dataset), suffix
+
+def test_lookup_sends_each_chunk_its_entries(catalog):
+    lookup = dict((dataset, i) for i, dataset in enumerate(catalog[:4]))
+    lookup["/data/elsewhere.gdb/fc"] = -1
+    collection = PaperworkCollection(catalog, workers=2, chunksize=2)
+    for result in collection._run(_entries, "x", lookup=lookup):
+        keys, value, suffix = result.value
+        assert len(keys) <= 2 and set(keys) <= set(catalog)
+        assert value == lookup.get(result.dataset) and suffix == "x"
@@ -0,0 +1,45 @@
+"""tests for the compact metadata node representation"""
+from __future__ import absolute_import
+
+import fakearcpy
+from conftest import SAMPLE
+from hermes import Paperwork, MetadataNode
+from hermes.converters import ET, metadata_to_dictionary
+
+
+def test_round_trips():
+    root = ET.XML(SAMPLE)
+    d = metadata_to_dictionary(root)
+    node = MetadataNode.from_element(root)
+    assert node.to_dict() == d
+    assert MetadataNode.from_dict(d) == node
+    assert metadata_to_dictionary(node.to_element()) == d
+
+
+def test_keeps_sibling_order():
+    node = MetadataNode.from_element(ET.XML("<a><b>1</b><c/><b>2</b></a>"))
+    assert [child.tag for child in node.to_element()] == ['b', 'c', 'b']
+
+
+def test_names_and_short_values_shared():
+    first = MetadataNode.from_element(ET.XML(SAMPLE))
+    second = MetadataNode.from_element(ET.XML(SAMPLE))
+    a = first.find("eainfo/detailed/attr/attrlabl")
+    b = second.find("eainfo/detailed/attr/attrlabl")
+    assert a.tag is b.tag
+    assert a.attributes[0] is b.attributes[0]
+    assert a.get("Sync") is b.get("Sync") == "TRUE"
+    assert len(first.findall("eainfo/detailed/attr")) == 2
+
+
+def test_paperwork_compact_and_save(dataset):
+    pw = Paperwork(dataset=dataset)
+    node = pw.compact()
+    assert node.to_dict() == pw.convert()
+    fakearcpy.calls.clear()
+    assert pw.save(node) is False
+    assert "MetadataImporter_conversion" not in fakearcpy.calls
+    d = node.to_dict()
+    d['metadata']['dataIdInfo']['idPurp'] = 'compact'
+    assert pw.save(MetadataNode.from_dict(d)) is True
+    assert Paperwork(dataset=dataset).get("dataIdInfo/idPurp") == 'compact'
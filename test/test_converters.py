@@ -0,0 +1,124 @@
+"""
+Parity tests between the iterative converter and the original recursive
+implementation.
+"""
+from __future__ import absolute_import
+import io
+import random
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+import pytest
+from conftest import SAMPLE
+from hermes.converters import metadata_to_dictionary, \
+     metadata_to_dictionary_recursive, dictionary_to_metadata, \
+     iterparse_to_dictionary, write_dictionary, write_element
+
+DOCUMENTS = [
+    SAMPLE,
+    "<metadata />",
+    "<metadata>   </metadata>",
+    "<metadata>text</metadata>",
+    '<metadata a="1" />',
+    '<metadata a="1">  text  </metadata>',
+    "<metadata><a/><a>x</a><a b='c'/></metadata>",
+    "<metadata>lead<a>1</a>tail<b><c/></b></metadata>",
+    "<metadata><a><b><c><d>deep</d></c></b></a><a><b/></a></metadata>",
+    '<metadata xmlns:gmd="http://www.isotc211.org/2005/gmd">'
+    '<gmd:contact><gmd:name>x</gmd:name></gmd:contact></metadata>',
+]
+#--------------------------------------------------------------------------
+def _random_tree(rng, depth=0):
+    """builds a random element with repeated tags, attributes and text"""
+    node = ET.Element(rng.choice(["attr", "attrdomv", "edom", "keyword"]))
+    if rng.random() < 0.3:
+        node.set(rng.choice(["Sync", "value"]), rng.choice(["TRUE", ""]))
+    node.text = rng.choice([None, "", "  ", "value", " padded "])
+    if depth < 5:
+        for _ in range(rng.randint(0, 4)):
+            node.append(_random_tree(rng, depth + 1))
+    return node
+#--------------------------------------------------------------------------
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_parity(document):
+    element = ET.XML(document)
+    expected = metadata_to_dictionary_recursive(element)
+    result = metadata_to_dictionary(element)
+    assert result == expected
+    assert list(result) == list(expected)
+#--------------------------------------------------------------------------
+def test_parity_random_trees():
+    rng = random.Random(1234)
+    for _ in range(200):
+        element = _random_tree(rng)
+        assert metadata_to_dictionary(element) == \
+               metadata_to_dictionary_recursive(element)
+#--------------------------------------------------------------------------
+def test_deep_document():
+    root = node = ET.Element("metadata")
+    for _ in range(5000):
+        node = ET.SubElement(node, "a")
+    node.text = "bottom"
+    d = metadata_to_dictionary(root)["metadata"]
+    depth = 0
+    while isinstance(d, dict):
+        d = d["a"]
+        depth += 1
+    assert (depth, d) == (5000, "bottom")
+#--------------------------------------------------------------------------
+def test_round_trip():
+    d = metadata_to_dictionary(ET.XML(SAMPLE))
+    assert metadata_to_dictionary(ET.XML(dictionary_to_metadata(d))) == d
+#--------------------------------------------------------------------------
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_iterparse_parity(document):
+    expected = metadata_to_dictionary(ET.XML(document))
+    assert iterparse_to_dictionary(io.BytesIO(document.encode('utf-8'))) \
+           == expected
+#--------------------------------------------------------------------------
+def test_iterparse_exclude():
+    source = io.BytesIO(SAMPLE.encode('utf-8'))
+    d = iterparse_to_dictionary(source, exclude=["*/eainfo", "metadata/Esri"])
+    assert sorted(d['metadata']) == ['@{http://www.w3.org/XML/1998/namespace}lang',
+                                     'dataIdInfo', 'mdDateSt']
+    source = io.BytesIO(SAMPLE.encode('utf-8'))
+    d = iterparse_to_dictionary(source, exclude=lambda p: p.endswith("keyword"))
+    assert d['metadata']['dataIdInfo']['searchKeys'] is None
+#--------------------------------------------------------------------------
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_write_dictionary_parity(document):
+    d = metadata_to_dictionary(ET.XML(document))
+    writer = io.BytesIO()
+    size = write_dictionary(d, writer, chunk_size=16)
+    data = writer.getvalue()
+    assert size == len(data)
+    assert data.startswith(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+    assert metadata_to_dictionary(ET.XML(data)) == \
+           metadata_to_dictionary(ET.XML(dictionary_to_metadata(d)))
+#--------------------------------------------------------------------------
+def test_write_dictionary_escapes():
+    d = {"metadata" : {"@a" : '"<&>\n', "#text" : "a & b < c",
+                       "b" : [None, "x > y", {"@c" : "1"}],
+                       u"caf\xe9" : u"\u2713"}}
+    writer = io.BytesIO()
+    write_dictionary(d, writer)
+    assert metadata_to_dictionary(ET.XML(writer.getvalue())) == d
+    assert u"\u2713".encode('utf-8') in writer.getvalue()
+#--------------------------------------------------------------------------
+def test_write_dictionary_namespaces():
+    d = {"{u}a" : {"@{v}x" : "1", "{u}b" : [{"{w}c" : "1"}, {"{w}c" : "2"}],
+                   "@{http://www.w3.org/XML/1998/namespace}lang" : "en"}}
+    writer = io.BytesIO()
+    write_dictionary(d, writer)
+    assert metadata_to_dictionary(ET.XML(writer.getvalue())) == d
+    assert b'xml:lang="en"' in writer.getvalue()
+#--------------------------------------------------------------------------
+def test_write_element():
+    writer = io.BytesIO()
+    write_element(ET.XML(SAMPLE), writer)
+    data = writer.getvalue()
+    assert data.startswith(b'<?xml version="1.0" encoding="UTF-8"?>\n<metadata')
+    assert metadata_to_dictionary(ET.XML(data)) == \
+           metadata_to_dictionary(ET.XML(SAMPLE))
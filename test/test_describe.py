@@ -0,0 +1,76 @@
+"""tests for the shared Describe cache"""
+from __future__ import absolute_import
+import threading
+
+import fakearcpy
+from conftest import SAMPLE
+from hermes import Paperwork, PaperworkCollection
+from hermes.describe import DescribeCache, describe_cache, dataset_properties
+
+GDB = r"c:\temp\scratch.gdb"
+
+
+def _register(names):
+    fakearcpy.reset()
+    describe_cache.clear()
+    datasets = [GDB + "\\" + name for name in names]
+    for dataset in datasets:
+        fakearcpy.register(dataset, SAMPLE)
+    return datasets
+
+
+def test_dataset_properties(dataset):
+    describe_cache.clear()
+    properties = Paperwork(dataset=dataset).datasetProperties
+    assert properties["tableName"] == "states"
+    assert properties["owner"] == ""
+    assert properties["workspace"]["path"] == GDB
+    assert properties["workspace"]["type"] == "Workspace"
+    assert properties["workspace"]["workspaceType"] == "LocalDatabase"
+
+
+def test_workspace_described_once():
+    datasets = _register(["a", "b", "c"])
+    results = list(PaperworkCollection(datasets, workers=1).properties_all())
+    assert all(result.ok for result in results)
+    assert [r.value["tableName"] for r in results] == ["a", "b", "c"]
+    # one Describe per dataset plus one for the shared workspace
+    assert fakearcpy.calls["Describe"] == 4
+
+
+def test_ttl_expires():
+    datasets = _register(["a"])
+    cache = DescribeCache(ttl=0)
+    dataset_properties(datasets[0], cache)
+    dataset_properties(datasets[0], cache)
+    assert cache.misses == 2 and cache.hits == 0
+    cache.ttl = 60
+    dataset_properties(datasets[0], cache)
+    dataset_properties(datasets[0], cache)
+    assert cache.hits == 1
+
+
+def test_concurrent_describe_once():
+    _register(["a"])
+    fakearcpy.latency = 0.05
+    cache = DescribeCache()
+    threads = [threading.Thread(target=cache.describe, args=(GDB,))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fakearcpy.calls["Describe"] == 1
+    assert cache.misses == 1 and cache.hits == 7
+
+
+def test_missing_workspace_not_cached():
+    _register(["a"])
+    cache = DescribeCache()
+    for i in range(2):
+        try:
+            cache.describe(r"c:\temp\other.gdb")
+        except IOError:
+            pass
+    assert cache.misses == 2
+    assert not cache._pending
@@ -0,0 +1,172 @@
+"""
+Tests for the structural metadata diff.
+"""
+from __future__ import absolute_import
+import time
+import random
+
+import pytest
+import arcpy
+import hermes
+from hermes.diff import diff, diff_datasets, diff_all, MetadataDiff
+from hermes.converters import ET, VOLATILE, metadata_to_dictionary
+from conftest import SAMPLE
+
+def _changed(edit):
+    root = ET.XML(SAMPLE)
+    edit(root)
+    return root
+
+def _apply(source, changes):
+    changes.apply_tree(source)
+    return source
+#--------------------------------------------------------------------------
+def test_identical_documents():
+    assert len(diff(ET.XML(SAMPLE), ET.XML(SAMPLE))) == 0
+    with pytest.raises(ValueError):
+        diff(ET.XML(SAMPLE), ET.XML("<other />"))
+#--------------------------------------------------------------------------
+def test_text_attributes_and_sections():
+    def edit(root):
+        root.find("dataIdInfo/idAbs").text = "changed"
+        root.find("dataIdInfo/idCitation/resTitle").set("Sync", "FALSE")
+        del root.find("mdDateSt").attrib["Sync"]
+        root.remove(root.find("eainfo"))
+        ET.SubElement(root, "mdChar").text = "utf8"
+    changes = diff(ET.XML(SAMPLE), _changed(edit))
+    assert [(c.op, c.path) for c in changes] == [
+        ("set", "dataIdInfo/idCitation/resTitle/@Sync"),
+        ("set", "dataIdInfo/idAbs/#text"),
+        ("remove", "eainfo"),
+        ("remove", "mdDateSt/@Sync"),
+        ("append", "mdChar")]
+    assert changes.changes[1].old == "Boundaries of the states."
+#--------------------------------------------------------------------------
+def test_keyed_elements_ignore_order():
+    def edit(root):
+        detailed = root.find("eainfo/detailed")
+        fid, name = detailed.findall("attr")
+        detailed.remove(fid)
+        detailed.append(fid)
+        name.find("attrdef").text = "state name"
+        area = ET.SubElement(detailed, "attr")
+        ET.SubElement(area, "attrlabl").text = "AREA"
+    source = ET.XML(SAMPLE)
+    target = _changed(edit)
+    changes = diff(source, target)
+    assert [(c.op, c.path) for c in changes] == [
+        ("set", "eainfo/detailed/attr[attrlabl='NAME']/attrdef/#text"),
+        ("append", "eainfo/detailed/attr")]
+    assert len(diff(_apply(source, changes), target)) == 0
+    def drop(root):
+        detailed = root.find("eainfo/detailed")
+        detailed.remove(detailed.findall("attr")[0])
+    changes = diff(ET.XML(SAMPLE), _changed(drop))
+    assert [(c.op, c.path) for c in changes] == \
+           [("remove", "eainfo/detailed/attr[attrlabl='FID']")]
+#--------------------------------------------------------------------------
+def test_repeated_elements_by_position():
+    def edit(root):
+        keys = root.find("dataIdInfo/searchKeys")
+        keys.findall("keyword")[1].text = "United States"
+        ET.SubElement(keys, "keyword").text = "boundaries"
+    source = ET.XML(SAMPLE)
+    target = _changed(edit)
+    changes = diff(source, target)
+    assert [(c.op, c.path, c.new) for c in changes] == [
+        ("set", "dataIdInfo/searchKeys/keyword[2]/#text", "United States"),
+        ("append", "dataIdInfo/searchKeys/keyword", "boundaries")]
+    assert metadata_to_dictionary(_apply(source, changes)) == \
+           metadata_to_dictionary(target)
+#--------------------------------------------------------------------------
+def test_exclude():
+    def edit(root):
+        root.find("Esri/ModDate").text = "20990101"
+    assert len(diff(ET.XML(SAMPLE), _changed(edit), exclude=VOLATILE)) == 0
+    assert len(diff(ET.XML(SAMPLE), _changed(edit))) == 1
+#--------------------------------------------------------------------------
+def test_padded_key_uses_position():
+    def pad(root):
+        root.find("eainfo/detailed/attr[2]/attrlabl").text = " NAME "
+    source = _changed(pad)
+    def edit(root):
+        pad(root)
+        root.find("eainfo/detailed/attr[2]/attrdef").text = "state name"
+    target = _changed(edit)
+    changes = diff(source, target)
+    assert [c.path for c in changes] == ["eainfo/detailed/attr[2]/attrdef/#text"]
+    assert len(diff(_apply(source, changes), target)) == 0
+#--------------------------------------------------------------------------
+def _fields(count, changed):
+    rows = "".join("<attr><attrlabl>F%d</attrlabl><attrdef>%s</attrdef></attr>"
+                   % (i, "new" if changed and i % 2 else "old")
+                   for i in range(count) if not (changed and i % 7 == 3))
+    if changed:
+        rows += "".join("<attr><attrlabl>X%d</attrlabl></attr>" % i
+                        for i in range(count // 10))
+    return ET.XML("<metadata><eainfo><detailed>%s</detailed></eainfo>"
+                  "</metadata>" % rows)
+#--------------------------------------------------------------------------
+def test_many_repeated_elements_scale_linearly():
+    timings = []
+    for count in (1000, 4000):
+        best = None
+        for attempt in range(3):
+            source, target = _fields(count, False), _fields(count, True)
+            started = time.time()
+            changes = diff(source, target)
+            changes.apply_tree(source)
+            elapsed = time.time() - started
+            best = elapsed if best is None else min(best, elapsed)
+        assert len(diff(source, target)) == 0
+        timings.append(best)
+    # four times the rows; quadratic matching would take about 16 times
+    assert timings[1] < timings[0] * 8 + 0.05, timings
+#--------------------------------------------------------------------------
+def _canonical(node):
+    """the content of a tree regardless of the order of children"""
+    return (node.tag, sorted(node.attrib.items()), (node.text or "").strip(),
+            sorted(_canonical(child) for child in node))
+#--------------------------------------------------------------------------
+def test_random_edits_round_trip():
+    rng = random.Random(7)
+    for attempt in range(40):
+        source = ET.XML(SAMPLE)
+        target = ET.XML(SAMPLE)
+        for i in range(rng.randint(1, 6)):
+            nodes = list(target.iter())[1:]
+            if not nodes:
+                break
+            node = rng.choice(nodes)
+            parents = dict((c, p) for p in target.iter() for c in p)
+            action = rng.choice(["text", "attr", "remove", "add", "copy"])
+            if action == "text":
+                node.text = "t%d" % rng.randint(0, 3)
+            elif action == "attr":
+                node.set("a%d" % rng.randint(0, 1), str(rng.randint(0, 3)))
+            elif action == "remove":
+                parents[node].remove(node)
+            elif action == "add":
+                ET.SubElement(node, rng.choice(["keyword", "attr", "x"])
+                              ).text = "n%d" % i
+            else:
+                parents[node].append(ET.XML(ET.tostring(node)))
+        changes = diff(source, target)
+        patched = ET.XML(ET.tostring(source))
+        changes.patch().apply_tree(patched)
+        result = _apply(source, changes)
+        assert _canonical(result) == _canonical(target), str(changes)
+        assert _canonical(patched) == _canonical(result), str(changes)
+#--------------------------------------------------------------------------
+def test_save_applies_diff(dataset):
+    staging = "/data/staging.gdb/states"
+    arcpy.register(staging, SAMPLE.replace("Boundaries", "Borders"))
+    changes = diff_datasets(dataset, staging)
+    assert isinstance(changes, MetadataDiff) and len(changes) == 1
+    assert hermes.Paperwork(dataset=dataset).save(changes) is True
+    assert len(diff_datasets(dataset, staging)) == 0
+    results = dict((r.dataset, r.value) for r in
+                   diff_all({dataset : staging, staging : dataset}))
+    assert [len(v) for v in results.values()] == [0, 0]
+    results = list(diff_all({dataset : staging}, workers=2, pool="thread"))
+    assert results[0].ok and len(results[0].value) == 0
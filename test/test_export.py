@@ -0,0 +1,65 @@
+"""
+Tests for the JSON Lines exporter.
+"""
+from __future__ import absolute_import
+import gzip
+import json
+
+import pytest
+import fakearcpy
+import hermes
+from hermes.export import JsonLinesExporter
+from conftest import SAMPLE
+
+@pytest.fixture
+def datasets(dataset):
+    paths = ["/data/export.gdb/fc_%d" % i for i in range(7)]
+    for path in paths:
+        fakearcpy.register(path, SAMPLE)
+    return paths
+
+def _crashing(paths, after):
+    for i, path in enumerate(paths):
+        if i == after:
+            raise RuntimeError("crash")
+        yield path
+
+@pytest.mark.parametrize("name, workers", [("out.jsonl", 1),
+                                           ("out.jsonl.gz", 3)])
+def test_export_and_resume(datasets, tmpdir, name, workers):
+    path = str(tmpdir.join(name))
+    exporter = JsonLinesExporter(path, batch_size=3, properties=False,
+                                 exclude=["*/eainfo"], workers=workers)
+    with pytest.raises(hermes.HermesErrorHandler):
+        exporter.export(_crashing(datasets + ["/missing"], 5))
+    summary = exporter.export(datasets + ["/missing"])
+    assert (summary["skipped"], summary["written"], summary["failed"]) == \
+           (3, 4, 1)
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(path, 'rb') as reader:
+        records = [json.loads(line.decode('utf-8')) for line in reader]
+    assert sorted(r["dataset"] for r in records) == sorted(datasets)
+    assert 'eainfo' not in records[0]["metadata"]["metadata"]
+    assert exporter.export(datasets)["written"] == 0
+    assert exporter.export(datasets, resume=False)["written"] == 7
+
+def test_resume_after_torn_checkpoint(datasets, tmpdir):
+    path = str(tmpdir.join("out.jsonl"))
+    exporter = JsonLinesExporter(path, batch_size=2, properties=False)
+    with pytest.raises(hermes.HermesErrorHandler):
+        exporter.export(_crashing(datasets, 5))
+    with open(exporter.checkpoint, 'rb') as reader:
+        lines = reader.read().splitlines(True)
+    assert len(lines) == 2
+    assert json.loads(lines[1].decode('utf-8'))["datasets"] == datasets[2:4]
+    # a crash while the second record was written leaves half a line
+    with open(exporter.checkpoint, 'wb') as writer:
+        writer.write(lines[0] + lines[1][:len(lines[1]) // 2])
+    summary = exporter.export(datasets)
+    assert (summary["skipped"], summary["written"]) == (2, 5)
+    with open(path, 'rb') as reader:
+        records = [json.loads(line.decode('utf-8')) for line in reader]
+    assert [r["dataset"] for r in records] == datasets
+    with open(exporter.checkpoint, 'rb') as reader:
+        for line in reader:
+            json.loads(line.decode('utf-8'))
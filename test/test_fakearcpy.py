@@ -0,0 +1,48 @@
+"""tests for the benchmark stand-ins: fakearcpy and the corpus generator"""
+from __future__ import absolute_import
+import os
+
+import pytest
+import corpus
+import fakearcpy
+from hermes import Paperwork, PaperworkCollection
+from hermes.converters import ET
+
+pytestmark = pytest.mark.usefixtures("dataset")
+
+
+@pytest.mark.parametrize("style", corpus.STYLES)
+def test_corpus_sizes(style):
+    for size in ("2k", "64k"):
+        document = corpus.generate(style, size, seed=1)
+        assert abs(len(document) - corpus.parse_size(size)) < 2048
+        ET.XML(document)
+    assert corpus.generate(style, "64k", seed=1) == \
+           corpus.generate(style, "64k", seed=1)
+
+
+def test_load_directory(tmpdir):
+    fakearcpy.reset()
+    paths = corpus.write_corpus(str(tmpdir), ("arcgis", "fgdc"), ["2k"],
+                                count=2)
+    datasets = fakearcpy.load_directory(str(tmpdir))
+    assert datasets == sorted(os.path.splitext(p)[0] for p in paths)
+    dataset = datasets[0]
+    pw = Paperwork(dataset=dataset)
+    d = pw.convert()
+    d['metadata']['dataIdInfo']['idPurp'] = 'from disk'
+    pw.save(d)
+    with open(dataset + ".xml", 'rb') as reader:
+        assert b"<idPurp>from disk</idPurp>" in reader.read()
+    properties = pw.datasetProperties
+    assert properties["workspace"]["path"] == os.path.join(str(tmpdir),
+                                                           "arcgis.gdb")
+    walked = PaperworkCollection(workspace=str(tmpdir)).datasets
+    assert sorted(walked) == datasets
+
+
+def test_per_tool_latency():
+    fakearcpy.reset()
+    fakearcpy.latencies["Exists"] = 0.0
+    assert fakearcpy.Exists("missing") is False
+    assert fakearcpy.calls["Exists"] == 1
@@ -0,0 +1,41 @@
+"""
+Tests for the SQLite metadata index.
+"""
+from __future__ import absolute_import
+
+import fakearcpy
+from hermes.index import MetadataIndex, flatten
+
+#--------------------------------------------------------------------------
+def test_flatten():
+    d = {'metadata': {'a': {'@Sync': 'TRUE', '#text': 'x'},
+                      'k': ['one', 'two'], 'empty': None}}
+    assert sorted(flatten(d)) == [('metadata/a', 'x'),
+                                  ('metadata/a/@Sync', 'TRUE'),
+                                  ('metadata/k', 'one'),
+                                  ('metadata/k', 'two')]
+#--------------------------------------------------------------------------
+def test_refresh_and_query(dataset):
+    other = "/data/other.gdb/roads"
+    fakearcpy.register(other, "<metadata><dataIdInfo><searchKeys>"
+                              "<keyword>Roads</keyword></searchKeys>"
+                              "</dataIdInfo></metadata>")
+    with MetadataIndex(":memory:") as index:
+        summary = index.refresh([dataset, other, "/missing"])
+        assert (summary["added"], summary["failed"]) == (2, 1)
+        assert index.keyword("usa") == [dataset]
+        assert index.keyword("ROADS") == [other]
+        assert index.missing("metadata/dataIdInfo/idAbs") == [other]
+        assert index.find("metadata/*/idCitation/resTitle",
+                          contains="STATE") == [dataset]
+        assert index.find("metadata/mdDateSt/@Sync", "TRUE") == [dataset]
+
+        summary = index.refresh([dataset, other])
+        assert summary["unchanged"] == 2
+        fakearcpy.register(other, "<metadata><dataIdInfo><idAbs>roads"
+                                  "</idAbs></dataIdInfo></metadata>")
+        summary = index.refresh([other], prune=True)
+        assert (summary["updated"], summary["removed"]) == (1, 1)
+        assert index.datasets() == [other]
+        assert index.keyword("roads") == []
+        assert index.values(other) == [("metadata/dataIdInfo/idAbs", "roads")]
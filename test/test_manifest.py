@@ -0,0 +1,66 @@
+"""tests for canonical fingerprints and the change manifest"""
+from __future__ import absolute_import
+import io
+
+import fakearcpy
+from conftest import SAMPLE, DATASET
+from hermes import Paperwork, Manifest
+from hermes.converters import canonical_digest, VOLATILE
+
+
+def _digest(xml, exclude=None):
+    return canonical_digest(io.BytesIO(xml.encode('utf-8')), exclude)
+
+
+def test_canonical_digest_ignores_formatting():
+    a = '<?xml version="1.0"?><a x="1" y="2"><b> t </b><c/></a>'
+    b = '<a y="2" x="1">\n  <b>t</b>\n  <c></c>\n</a>'
+    assert _digest(a) == _digest(b)
+    assert _digest(a) != _digest(a.replace("t", "u"))
+    assert _digest(a) != _digest(a.replace('x="1"', 'x="2"'))
+
+
+def test_fingerprint_ignores_volatile(dataset):
+    raw = Paperwork(dataset=dataset).fingerprint()
+    stable = Paperwork(dataset=dataset).fingerprint(exclude=VOLATILE)
+    fakearcpy.register(dataset, SAMPLE.replace("<ModDate>20150102",
+                                               "<ModDate>20160101"))
+    assert Paperwork(dataset=dataset).fingerprint() != raw
+    assert Paperwork(dataset=dataset).fingerprint(exclude=VOLATILE) == stable
+    assert Paperwork(dataset=dataset).fingerprint(canonical=True) != stable
+
+
+def test_manifest_changes(tmpdir, dataset):
+    other = DATASET.replace("states", "counties")
+    fakearcpy.register(other, SAMPLE)
+    path = str(tmpdir.join("harvest.manifest"))
+    manifest = Manifest(path)
+    assert manifest.changed([dataset, other]) == sorted([dataset, other])
+
+    fakearcpy.register(dataset, SAMPLE.replace("<ModDate>20150102",
+                                               "<ModDate>20160101"))
+    fakearcpy.register(other, SAMPLE.replace("Boundaries", "Outlines"))
+    changes = Manifest(path).compare([dataset, other])
+    assert changes.changed == [other]
+    assert changes.unchanged == [dataset]
+    assert changes.datasets == [other]
+
+    changes = Manifest(path).compare([dataset])
+    assert changes.removed == [other]
+    Manifest(path).update(changes)
+    assert list(Manifest(path).entries) == [dataset]
+
+
+def test_manifest_failures_keep_entries(tmpdir, dataset):
+    path = str(tmpdir.join("harvest.manifest"))
+    Manifest(path).changed([dataset])
+    missing = DATASET.replace("states", "missing")
+    changes = Manifest(path).compare([dataset, missing])
+    assert list(changes.failed) == [missing]
+    assert changes.removed == []
+
+
+def test_manifest_exclude_mismatch(tmpdir, dataset):
+    path = str(tmpdir.join("harvest.manifest"))
+    Manifest(path).changed([dataset])
+    assert Manifest(path, exclude=None).compare([dataset]).added == [dataset]
@@ -0,0 +1,134 @@
+"""
+Unit tests for the Paperwork class.  They run against fakearcpy (see
+conftest.py) so no ArcGIS install is needed.
+"""
+from __future__ import absolute_import
+import os
+
+import arcpy
+import hermes
+
+#--------------------------------------------------------------------------
+def test_metadata_is_exported_lazily(dataset):
+    pw = hermes.Paperwork(dataset=dataset)
+    assert not pw.loaded
+    assert "MetadataImporter_conversion" not in arcpy.calls
+    assert os.path.isfile(pw.xmlfile)
+    assert pw.loaded
+    assert arcpy.calls["MetadataImporter_conversion"] == 1
+#--------------------------------------------------------------------------
+def test_preload(dataset):
+    pw = hermes.Paperwork(dataset=dataset, preload=True)
+    assert pw.loaded
+    assert pw.preload() is pw
+    assert arcpy.calls["MetadataImporter_conversion"] == 1
+#--------------------------------------------------------------------------
+def test_dataset_change_discards_export(dataset):
+    pw = hermes.Paperwork(dataset=dataset, preload=True)
+    xmlfile = pw.xmlfile
+    pw.dataset = dataset
+    assert not pw.loaded
+    assert not os.path.isfile(xmlfile)
+#--------------------------------------------------------------------------
+def test_convert_is_cached_and_copied(dataset):
+    pw = hermes.Paperwork(dataset=dataset)
+    first = pw.convert()
+    first['metadata']['dataIdInfo']['idAbs'] = "changed"
+    second = pw.convert()
+    assert second['metadata']['dataIdInfo']['idAbs'] == "Boundaries of the states."
+    assert pw._getroot() is pw._getroot()
+    assert arcpy.calls["MetadataImporter_conversion"] == 1
+#--------------------------------------------------------------------------
+def test_cache_invalidation(dataset, tmpdir):
+    pw = hermes.Paperwork(dataset=dataset)
+    pw.convert()
+    pw.setSyncMethod("ALWAYS")
+    assert pw._dict is None and not pw.loaded
+    xmlfile = tmpdir.join("new.xml")
+    xmlfile.write("<metadata><idinfo>new</idinfo></metadata>")
+    assert pw.importXMLFile(str(xmlfile)) == {'metadata': {'idinfo': 'new'}}
+#--------------------------------------------------------------------------
+def test_streamed_convert(dataset):
+    pw = hermes.Paperwork(dataset=dataset)
+    d = pw.convert(exclude=["metadata/eainfo"])
+    assert 'eainfo' not in d['metadata']
+    assert pw._tree is None
+    assert pw.convert(stream=True) == pw.convert()
+#--------------------------------------------------------------------------
+def test_save_skips_unchanged(dataset):
+    pw = hermes.Paperwork(dataset=dataset)
+    assert pw.save() is False
+    assert pw.save(pw.convert()) is False
+    assert arcpy.calls["MetadataImporter_conversion"] == 1
+    assert pw.save(force=True) is True
+    assert arcpy.calls["MetadataImporter_conversion"] == 2
+#--------------------------------------------------------------------------
+def test_save_splices_changed_sections(dataset):
+    pw = hermes.Paperwork(dataset=dataset)
+    d = pw.convert()
+    d['metadata']['dataIdInfo']['idAbs'] = "changed"
+    del d['metadata']['mdDateSt']
+    d['metadata']['mdChar'] = {'CharSetCd': {'@value': '004'}}
+    esri = pw._getroot().find('Esri')
+    assert pw._splice(d)
+    assert pw._changes == {'dataIdInfo', 'mdDateSt', 'mdChar'}
+    assert pw._getroot().find('Esri') is esri
+    assert [node.tag for node in pw._getroot()] == \
+           ['Esri', 'dataIdInfo', 'eainfo', 'mdChar']
+    assert pw.save(d) is True
+    saved = hermes.Paperwork(dataset=dataset).convert()
+    assert saved['metadata']['dataIdInfo']['idAbs'] == "changed"
+    assert 'mdDateSt' not in saved['metadata']
+#--------------------------------------------------------------------------
+def test_failed_save_drops_cached_changes(dataset, monkeypatch):
+    importer = arcpy.MetadataImporter_conversion
+    def failing(source, target):
+        if target == dataset:
+            raise arcpy.ExecuteError("ERROR 000464: schema lock")
+        importer(source, target)
+    monkeypatch.setattr(arcpy, "MetadataImporter_conversion", failing)
+    pw = hermes.Paperwork(dataset=dataset)
+    d = pw.convert()
+    d['metadata']['dataIdInfo']['idAbs'] = "changed"
+    try:
+        pw.save(d)
+        assert False, "save should fail"
+    except hermes.HermesErrorHandler:
+        pass
+    assert pw.get("dataIdInfo/idAbs") == "Boundaries of the states."
+    assert pw._changes == set()
+    monkeypatch.setattr(arcpy, "MetadataImporter_conversion", importer)
+    assert pw.save(d) is True
+    assert hermes.Paperwork(dataset=dataset).get("dataIdInfo/idAbs") == \
+           "changed"
+#--------------------------------------------------------------------------
+def test_export_and_save_write_declaration(tmpdir, dataset):
+    pw = hermes.Paperwork(dataset=dataset)
+    path = pw.exportToXML(str(tmpdir), "states")
+    with open(path, 'rb') as reader:
+        data = reader.read()
+    assert data.startswith(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+    d = pw.convert()
+    d['metadata']['idPurp'] = 'streamed'
+    pw.save(d)
+    assert arcpy.metadata(dataset).startswith(b'<?xml version="1.0"')
+    assert hermes.Paperwork(dataset=dataset).convert() == d
+#--------------------------------------------------------------------------
+def test_direct_export_keeps_exported_bytes(tmpdir, dataset):
+    source = arcpy.metadata(dataset).replace(b"<Esri>", b"<!-- kept --><Esri>")
+    arcpy.register(dataset, source)
+    pw = hermes.Paperwork(dataset=dataset)
+    path = pw.exportToXML(str(tmpdir), "direct", direct=True)
+    assert not pw.loaded
+    with open(path, 'rb') as reader:
+        assert reader.read() == source
+    pw.preload()
+    path = pw.exportToXML(str(tmpdir), "memory", direct=True)
+    with open(path, 'rb') as reader:
+        assert reader.read() == source
+    assert arcpy.calls["MetadataImporter_conversion"] == 2
+    pw.set("dataIdInfo/idPurp", "unsaved")
+    path = pw.exportToXML(str(tmpdir), "changed", direct=True)
+    assert hermes.Paperwork(dataset=dataset).convert() != pw.convert()
+    with open(path, 'rb') as reader:
+        assert b"<idPurp>unsaved</idPurp>" in reader.read()
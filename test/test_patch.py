@@ -0,0 +1,56 @@
+"""
+Tests for the bulk patch engine.
+"""
+from __future__ import absolute_import
+import pickle
+
+import pytest
+import arcpy
+import fakearcpy
+import hermes
+from hermes.patch import MetadataPatch
+
+OPERATIONS = [
+    {"op": "set", "path": "dataIdInfo/resConst/Consts/useLimit",
+     "value": "Not for navigation."},
+    {"op": "append", "path": "dataIdInfo/searchKeys/keyword", "value": "USA"},
+    {"op": "append", "path": "dataIdInfo/searchKeys/keyword", "value": "hydro"},
+    {"op": "remove", "path": "eainfo/detailed/attr[attrlabl='FID']"},
+    {"op": "merge", "path": "mdContact",
+     "value": {"rpOrgName": "GIS Office", "role": {"RoleCd": {"@value": "007"}}}},
+]
+#--------------------------------------------------------------------------
+@pytest.mark.parametrize("spec", [
+    {"op": "rename", "path": "a"},
+    {"op": "set", "path": ""},
+    {"op": "set", "path": "a"},
+    {"op": "set", "path": "a/@b", "value": {"c": "d"}},
+    {"op": "merge", "path": "a", "value": "text"},
+    {"op": "append", "path": "a//b", "value": "x"},
+    {"op": "remove", "path": "a[", "value": "x"},
+    {"op": "set", "path": "a", "value": "x", "extra": 1},
+])
+def test_invalid_patch(spec):
+    with pytest.raises(hermes.HermesErrorHandler):
+        MetadataPatch([spec])
+#--------------------------------------------------------------------------
+def test_apply_all(dataset):
+    done = "/data/done.gdb/fc"
+    patch = MetadataPatch(OPERATIONS)
+    patch = pickle.loads(pickle.dumps(patch))
+    report = patch.apply_all([dataset, "/missing"])
+    assert report.changed == {dataset: [0, 2, 3, 4]}
+    assert list(report.failed) == ["/missing"]
+    pw = hermes.Paperwork(dataset=dataset)
+    assert pw.get("dataIdInfo/resConst/Consts/useLimit") == "Not for navigation."
+    assert pw.findall("dataIdInfo/searchKeys/keyword") == ["states", "USA", "hydro"]
+    assert pw.findall("eainfo/detailed/attr/attrlabl/#text") == ["NAME"]
+    assert pw.get("mdContact/role/RoleCd/@value") == "007"
+
+    fakearcpy.register(done, fakearcpy.metadata(dataset))
+    imports = arcpy.calls["MetadataImporter_conversion"]
+    report = patch.apply_all([dataset, done], workers=2)
+    assert sorted(report.unchanged) == sorted([dataset, done])
+    assert str(report) == "0 changed, 2 unchanged, 0 failed"
+    # one export per dataset and no imports
+    assert arcpy.calls["MetadataImporter_conversion"] == imports + 2
@@ -0,0 +1,109 @@
+"""
+Tests for the lazy BinaryPayload handles.
+"""
+from __future__ import absolute_import
+import os
+import base64
+
+import pytest
+import arcpy
+import hermes
+from hermes import scratch
+from hermes.payload import BinaryPayload, find_payloads
+from hermes.converters import iterparse_to_dictionary
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(bytearray(range(256))) * 40
+PDF = b"%PDF-1.4 attached report"
+
+def _document(thumbnail=PNG):
+    encoded = base64.encodestring if not hasattr(base64, "encodebytes") \
+              else base64.encodebytes
+    return (b'<?xml version="1.0" encoding="UTF-8"?>\n<metadata>'
+            b'<dataIdInfo><idPurp>payloads</idPurp></dataIdInfo><Binary>'
+            b'<Thumbnail><Data EsriPropertyType="PictureX">' +
+            encoded(thumbnail) + b'</Data></Thumbnail>'
+            b'<Enclosure rel="attachment"><Data EsriPropertyType="Base64" '
+            b'OriginalFileName="report.pdf">' + base64.b64encode(PDF) +
+            b'</Data><Descript>report</Descript></Enclosure>'
+            b'<Enclosure><Data EsriPropertyType="Base64"/></Enclosure>'
+            b'</Binary></metadata>')
+
+@pytest.fixture(params=["memory", "file"])
+def binary(request, dataset, tmpdir):
+    arcpy.register(dataset, _document())
+    if request.param == "file":
+        scratch.configure(str(tmpdir), inline_limit=0)
+        yield dataset
+        scratch.configure(None, scratch.INLINE_LIMIT)
+    else:
+        yield dataset
+#--------------------------------------------------------------------------
+def test_find_payloads():
+    document = _document()
+    thumbnail, enclosure = find_payloads(document)
+    assert thumbnail.path == "metadata/Binary/Thumbnail/Data"
+    assert enclosure.location[-2] == ("Enclosure", 0)
+    assert enclosure.attributes["OriginalFileName"] == "report.pdf"
+    assert thumbnail.decode() == PNG and enclosure.decode() == PDF
+    assert thumbnail.extension() == ".png"
+    assert b"".join(c.encode("ascii") for c in thumbnail.iter_raw(100)) == \
+           thumbnail.raw()
+    assert b"".join(thumbnail.iter_decoded(101)) == PNG
+    d = iterparse_to_dictionary(__import__("io").BytesIO(document))
+    assert thumbnail == d['metadata']['Binary']['Thumbnail']['Data']['#text']
+#--------------------------------------------------------------------------
+def test_find_payloads_skips_comments_and_empty_documents():
+    document = _document().replace(b"<metadata>",
+                                   b"<!-- <Binary> --><metadata>")
+    assert [p.path for p in find_payloads(document)] == \
+           ["metadata/Binary/Thumbnail/Data", "metadata/Binary/Enclosure/Data"]
+    assert find_payloads(b"<metadata><idinfo /></metadata>") == []
+#--------------------------------------------------------------------------
+def test_convert_with_payloads(binary):
+    pw = hermes.Paperwork(dataset=binary)
+    d = pw.convert(payloads=True)
+    data = d['metadata']['Binary']['Thumbnail']['Data']
+    assert isinstance(data['#text'], BinaryPayload)
+    assert data['@EsriPropertyType'] == "PictureX"
+    assert d['metadata']['Binary']['Enclosure'][0]['Data']['#text'].decode() \
+           == PDF
+    assert pw._dict is None
+    assert pw.convert(payloads=True)['metadata']['Binary'] == \
+           hermes.Paperwork(dataset=binary).convert()['metadata']['Binary']
+#--------------------------------------------------------------------------
+def test_save_passes_payloads_through(binary):
+    pw = hermes.Paperwork(dataset=binary)
+    d = pw.convert(payloads=True)
+    d['metadata']['dataIdInfo']['idPurp'] = "changed"
+    assert pw.save(d) is True
+    saved = hermes.Paperwork(dataset=binary)
+    assert saved.payloads()[0].decode() == PNG
+    pw = hermes.Paperwork(dataset=binary)
+    d = pw.convert(payloads=True)
+    assert pw.save({'renamed': d['metadata']}) is True
+    assert hermes.Paperwork(dataset=binary).payloads()[1].decode() == PDF
+#--------------------------------------------------------------------------
+def test_extract_payloads(binary, tmpdir):
+    pw = hermes.Paperwork(dataset=binary)
+    paths = pw.extractPayloads(str(tmpdir.join("out")))
+    assert [os.path.basename(p) for p in paths] == ["thumbnail.png",
+                                                    "report.pdf"]
+    with open(paths[0], 'rb') as reader:
+        assert reader.read() == PNG
+#--------------------------------------------------------------------------
+def test_handles_keep_scratch_file(dataset, tmpdir):
+    arcpy.register(dataset, _document())
+    scratch.configure(str(tmpdir), inline_limit=0)
+    try:
+        pw = hermes.Paperwork(dataset=dataset)
+        thumbnail = pw.payloads()[0]
+        pw.close()
+        assert thumbnail.decode() == PNG
+        path = thumbnail.source
+        del thumbnail
+        assert not os.path.exists(path)
+        thumbnail = BinaryPayload(path, 0, 4, [("Data", 0)], mapped=True)
+        with pytest.raises(IOError):
+            thumbnail.decode()
+    finally:
+        scratch.configure(None, scratch.INLINE_LIMIT)
@@ -0,0 +1,77 @@
+"""
+Tests for the scratch space and the Paperwork temp file lifecycle.
+"""
+from __future__ import absolute_import
+import os
+import subprocess
+import sys
+
+import pytest
+import hermes
+from hermes import scratch
+
+@pytest.fixture
+def scratch_dir(tmpdir):
+    scratch.configure(str(tmpdir))
+    yield tmpdir
+    scratch.configure(None, scratch.INLINE_LIMIT)
+
+def _files(folder):
+    return [name for _, _, names in os.walk(str(folder)) for name in names]
+#--------------------------------------------------------------------------
+def test_export_is_read_into_memory(dataset, scratch_dir):
+    pw = hermes.Paperwork(dataset=dataset, preload=True)
+    assert pw.loaded and _files(scratch_dir) == []
+    assert pw.save_location == os.path.join(
+        str(scratch_dir), "hermes-%s-%d" % (scratch._host(), os.getpid()))
+    xmlfile = pw.xmlfile
+    assert os.path.dirname(xmlfile) == pw.save_location
+    pw.close()
+    assert not os.path.exists(xmlfile) and not pw.loaded
+#--------------------------------------------------------------------------
+def test_large_export_stays_on_disk(dataset, scratch_dir):
+    scratch.configure(str(scratch_dir), inline_limit=0)
+    with hermes.Paperwork(dataset=dataset) as pw:
+        assert pw.get("dataIdInfo/idAbs") == "Boundaries of the states."
+        assert len(_files(scratch_dir)) == 1
+    assert _files(scratch_dir) == []
+#--------------------------------------------------------------------------
+def test_stale_folders_are_removed(scratch_dir):
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    stale = scratch_dir.mkdir("hermes-%s-%d" % (scratch._host(), child.pid))
+    stale.join("tmp.xml").write("<metadata />")
+    other = scratch_dir.mkdir("unrelated")
+    # the same pid may be a live process on another host sharing the root
+    remote = scratch_dir.mkdir("hermes-otherhost-%d" % child.pid)
+    legacy = scratch_dir.mkdir("hermes-%d" % child.pid)
+    scratch.get_scratch()
+    assert not stale.exists()
+    assert other.exists() and remote.exists() and legacy.exists()
+#--------------------------------------------------------------------------
+@pytest.mark.parametrize("method", ["auto", "hardlink", "copy"])
+def test_place_file(tmpdir, method):
+    source = tmpdir.join("source.xml")
+    source.write_binary(b"<metadata />")
+    destination = tmpdir.join("destination.xml")
+    destination.write_binary(b"old")
+    used = scratch.place_file(str(source), str(destination), method)
+    assert destination.read_binary() == b"<metadata />"
+    if method == "copy":
+        assert used == "copy"
+    elif method == "hardlink":
+        assert used in ("hardlink", "copy")
+    else:
+        assert used in ("reflink", "copy")
+    with pytest.raises(ValueError):
+        scratch.place_file(str(source), str(destination), "move")
+#--------------------------------------------------------------------------
+def test_direct_export_of_scratch_file(dataset, scratch_dir, tmpdir):
+    scratch.configure(str(scratch_dir), inline_limit=0)
+    pw = hermes.Paperwork(dataset=dataset, preload=True)
+    path = pw.exportToXML(str(tmpdir.join("out")), "states", direct=True,
+                          method="hardlink")
+    with open(path, 'rb') as reader:
+        assert reader.read() == hermes.Paperwork(dataset=dataset)._read()
+    pw.close()
+    assert os.path.isfile(path)
@@ -0,0 +1,66 @@
+"""tests for the per-stage instrumentation"""
+from __future__ import absolute_import
+
+from hermes import Paperwork, stats
+
+
+def test_no_listener_is_a_no_op(dataset):
+    assert stats.start() is None
+    stats.stop(None, "export", dataset, 10)
+
+
+def test_stages_recorded(dataset):
+    events = []
+    stats.add_listener(events.append)
+    try:
+        pw = Paperwork(dataset=dataset)
+        d = pw.convert()
+        d['metadata']['dataIdInfo']['idPurp'] = 'timed'
+        pw.save(d)
+    finally:
+        stats.remove_listener(events.append)
+    assert [e.stage for e in events] == ['export', 'read', 'parse', 'convert',
+                                         'serialize', 'import']
+    assert all(e.dataset == dataset and e.seconds >= 0 for e in events)
+    assert events[0].nbytes == events[1].nbytes == events[2].nbytes > 0
+    assert stats.start() is None
+
+
+def test_collect_aggregates(dataset):
+    with stats.collect() as collected:
+        for i in range(3):
+            Paperwork(dataset=dataset).convert()
+    assert collected.count("export") == 3
+    assert collected.count("import") == 0
+    assert collected.nbytes("export") > 0
+    assert set(collected.summary()) == set(['export', 'read', 'parse',
+                                            'convert'])
+    assert set(collected.datasets[dataset]) == set(collected.summary())
+    assert "export" in str(collected)
+
+
+def test_per_dataset_bytes():
+    collected = stats.StageStats()
+    for dataset, stage, nbytes in [("a", "export", 100), ("a", "export", 50),
+                                   ("a", "parse", 150), ("b", "export", 7)]:
+        collected(stats.StageEvent(dataset, stage, 0.5, nbytes))
+    assert collected.dataset_bytes == {"a" : {"export" : 150, "parse" : 150},
+                                       "b" : {"export" : 7}}
+    assert collected.datasets["a"] == {"export" : 1.0, "parse" : 0.5}
+    summary = collected.dataset_summary("a")
+    assert list(summary) == ["export", "parse"]
+    assert summary["export"] == {"total" : 1.0, "bytes" : 150}
+    assert collected.dataset_summary("missing") == {}
+    assert collected.nbytes("export") == 157
+
+
+def test_percentile():
+    collected = stats.StageStats(per_dataset=False)
+    for seconds in [4, 1, 3, 2, 5]:
+        collected(stats.StageEvent("d", "parse", seconds, 0))
+    assert collected.percentile("parse", 0) == 1
+    assert collected.percentile("parse", 50) == 3
+    assert collected.percentile("parse", 100) == 5
+    assert collected.percentile("parse", 25) == 2
+    assert collected.percentile("import", 50) is None
+    assert collected.datasets == collected.dataset_bytes == {}
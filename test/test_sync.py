@@ -0,0 +1,112 @@
+"""
+Tests for the bulk sync scheduler.
+"""
+from __future__ import absolute_import
+
+import time
+import threading
+import pytest
+import fakearcpy
+import hermes
+from hermes.sync import BulkSync, RateLimiter, is_lock_error
+
+LOCKED = "ERROR 000464: Cannot get exclusive schema lock."
+
+@pytest.fixture
+def datasets():
+    names = ["c:/data/a.gdb/fc%d" % i for i in range(6)] + \
+            ["c:/data/b.sde/fc%d" % i for i in range(6)]
+    for name in names:
+        fakearcpy.register(name, "<metadata />")
+    return names
+#--------------------------------------------------------------------------
+def _tool(monkeypatch, fail=None, delay=0.01):
+    """replaces the sync tool with one recording concurrency per workspace"""
+    state = {"running" : {}, "peak" : {}, "calls" : []}
+    lock = threading.Lock()
+    def sync(source, synctype="ALWAYS"):
+        workspace = source.rsplit("/", 1)[0]
+        with lock:
+            state["calls"].append(source)
+            running = state["running"].get(workspace, 0) + 1
+            state["running"][workspace] = running
+            state["peak"][workspace] = max(running,
+                                           state["peak"].get(workspace, 0))
+        try:
+            time.sleep(delay)
+            if fail is not None:
+                fail(source)
+        finally:
+            with lock:
+                state["running"][workspace] -= 1
+    monkeypatch.setattr(fakearcpy, "SynchronizeMetadata_conversion", sync)
+    return state
+#--------------------------------------------------------------------------
+def test_is_lock_error():
+    assert is_lock_error(LOCKED)
+    assert is_lock_error("sqlite3: database is locked")
+    assert not is_lock_error("ERROR 000732: Dataset does not exist")
+#--------------------------------------------------------------------------
+def test_workspace_limits(monkeypatch, datasets):
+    state = _tool(monkeypatch)
+    seen = []
+    sync = BulkSync(workers=8, limit=2, limits={"c:/data/b.sde" : 1})
+    report = sync.run(datasets, callback=lambda r, rep: seen.append(rep.done))
+    assert sorted(report.synced) == sorted(datasets)
+    assert report.failed == {} and report.done == report.total == 12
+    assert state["peak"] == {"c:/data/a.gdb" : 2, "c:/data/b.sde" : 1}
+    assert seen == list(range(1, 13))
+    assert report.rate > 0 and report.remaining == 0
+#--------------------------------------------------------------------------
+def test_limits_keys_are_normalized(monkeypatch, datasets):
+    state = _tool(monkeypatch)
+    sync = BulkSync(workers=8, limit=3, limits={"c:/data/b.sde/" : 1,
+                                                "c:/data/a.gdb" : 0})
+    assert sync.limits == {"c:/data/b.sde" : 1, "c:/data/a.gdb" : 1}
+    report = sync.run(datasets)
+    assert report.done == 12
+    assert state["peak"] == {"c:/data/a.gdb" : 1, "c:/data/b.sde" : 1}
+    assert BulkSync().workers == 1
+#--------------------------------------------------------------------------
+def test_rate_limit(monkeypatch, datasets):
+    _tool(monkeypatch, delay=0)
+    started = time.time()
+    BulkSync(workers=8, limit=8, rate=100).run(datasets)
+    assert time.time() - started >= 0.1
+    limiter = RateLimiter(None)
+    assert limiter.acquire() == 0.0
+#--------------------------------------------------------------------------
+def test_lock_errors_are_retried(monkeypatch, datasets):
+    failures = {}
+    def fail(source):
+        if source.endswith("fc0"):
+            count = failures[source] = failures.get(source, 0) + 1
+            if count <= 2:
+                raise fakearcpy.ExecuteError(LOCKED)
+        if source == "c:/data/b.sde/fc5":
+            raise fakearcpy.ExecuteError("ERROR 000732: does not exist")
+    state = _tool(monkeypatch, fail=fail)
+    results = []
+    report = BulkSync(workers=4, retries=3, backoff=0.01).run(
+        datasets, "always", callback=lambda r, rep: results.append(r))
+    assert report.retries == 4
+    assert list(report.failed) == ["c:/data/b.sde/fc5"]
+    assert "000732" in report.failed["c:/data/b.sde/fc5"]
+    assert len(report.synced) == 11
+    assert state["calls"].count("c:/data/a.gdb/fc0") == 3
+    assert state["calls"].count("c:/data/b.sde/fc5") == 1
+    assert [r.ok for r in results].count(False) == 1
+
+    failures.clear()
+    report = BulkSync(retries=1, backoff=0.01).run(["c:/data/a.gdb/fc0"])
+    assert LOCKED in report.failed["c:/data/a.gdb/fc0"]
+    assert report.retries == 1
+#--------------------------------------------------------------------------
+def test_invalid_method_and_callback_errors(monkeypatch, datasets):
+    _tool(monkeypatch)
+    with pytest.raises(hermes.HermesErrorHandler):
+        BulkSync().run(datasets, "SOMETIMES")
+    def callback(result, report):
+        raise RuntimeError("stop")
+    with pytest.raises(RuntimeError):
+        BulkSync(workers=4).run(datasets, callback=callback)
@@ -0,0 +1,79 @@
+"""
+Tests for compiled metadata templates.
+"""
+from __future__ import absolute_import
+
+import pytest
+import arcpy
+import hermes
+from hermes.template import MetadataTemplate
+from hermes.collection import PaperworkCollection
+from hermes.converters import ET
+
+STANDARD = """<metadata xml:lang="${lang}">
+  <dataIdInfo>
+    <idCitation><resTitle>${title}</resTitle></idCitation>
+    <idCredit>${owner}, $$0 licence</idCredit>
+  </dataIdInfo>
+  <distInfo><distributor><distorCont rpIndName="${owner}" /></distributor></distInfo>
+</metadata>"""
+
+@pytest.fixture
+def template():
+    return MetadataTemplate(STANDARD, defaults={"lang" : "en"})
+#--------------------------------------------------------------------------
+def test_render(template):
+    assert template.slots == ("lang", "title", "owner")
+    root = template.element({"title" : "a < b & c", "owner" : 'O"Neil'})
+    assert root.get("{http://www.w3.org/XML/1998/namespace}lang") == "en"
+    assert root.find("dataIdInfo/idCitation/resTitle").text == "a < b & c"
+    assert root.find("dataIdInfo/idCredit").text == 'O"Neil, $0 licence'
+    assert root.find("distInfo/distributor/distorCont").get("rpIndName") \
+           == 'O"Neil'
+    assert template.render(title=1, owner=None).startswith(
+        b'<?xml version="1.0" encoding="UTF-8"?>\n')
+    with pytest.raises(KeyError):
+        template.render({"title" : "missing owner"})
+#--------------------------------------------------------------------------
+def test_dictionary_source():
+    template = MetadataTemplate({"metadata" : {"idinfo" : {
+        "title" : "${title}", "@lang" : "${lang}"}}})
+    assert template.to_dict(title="roads", lang="en") == \
+           {"metadata" : {"idinfo" : {"title" : "roads", "@lang" : "en"}}}
+#--------------------------------------------------------------------------
+def test_stamp_replaces_without_export(dataset, template):
+    pw = hermes.Paperwork(dataset=dataset)
+    assert pw.stamp(template, {"title" : "states", "owner" : "GIS"})
+    assert arcpy.calls["MetadataImporter_conversion"] == 1
+    d = hermes.Paperwork(dataset=dataset).convert()
+    assert 'eainfo' not in d['metadata']
+    assert d['metadata']['dataIdInfo']['idCitation']['resTitle'] == "states"
+#--------------------------------------------------------------------------
+def test_stamp_merge(dataset, template):
+    values = {"title" : "states", "owner" : "GIS"}
+    pw = hermes.Paperwork(dataset=dataset)
+    assert pw.stamp(template, values, merge=True)
+    d = hermes.Paperwork(dataset=dataset).convert()['metadata']
+    assert d['dataIdInfo']['idCredit'] == "GIS, $0 licence"
+    assert 'idAbs' not in d['dataIdInfo'] and 'eainfo' in d
+    assert [node.tag for node in ET.XML(arcpy.metadata(dataset))] == \
+           ['Esri', 'dataIdInfo', 'eainfo', 'mdDateSt', 'distInfo']
+    assert hermes.Paperwork(dataset=dataset).stamp(template, values,
+                                                   merge=True) is False
+    values["owner"] = "Records"
+    assert hermes.Paperwork(dataset=dataset).stamp(template, values,
+                                                   merge="keep") is False
+    d = hermes.Paperwork(dataset=dataset).convert()['metadata']
+    assert d['dataIdInfo']['idCredit'] == "GIS, $0 licence"
+#--------------------------------------------------------------------------
+def test_stamp_all(dataset, template):
+    datasets = ["/data/new.gdb/layer_%d" % i for i in range(4)]
+    for path in datasets:
+        arcpy.register(path, "<metadata />")
+    collection = PaperworkCollection(datasets, workers=2)
+    results = list(collection.stamp_all(
+        template, lambda dataset: {"title" : dataset[-7:], "owner" : "GIS"}))
+    assert all(r.ok and r.value for r in results)
+    for path in datasets:
+        assert ("<resTitle>%s</resTitle>" % path[-7:]).encode() in \
+               arcpy.metadata(path)
@@ -0,0 +1,48 @@
+"""
+Tests for the mapping views over the metadata tree.
+"""
+from __future__ import absolute_import
+
+import arcpy
+import hermes
+from hermes.converters import ET, metadata_to_dictionary
+from hermes.view import MetadataView, ElementView, ElementListView
+from conftest import SAMPLE
+
+#--------------------------------------------------------------------------
+def test_view_matches_convert():
+    view = MetadataView(ET.XML(SAMPLE))
+    expected = metadata_to_dictionary(ET.XML(SAMPLE))
+    info = view['metadata']['dataIdInfo']
+    assert isinstance(info, ElementView)
+    assert info['idAbs'] == "Boundaries of the states."
+    assert info['idPurp'] is None
+    assert info['idCitation']['resTitle'] == {'@Sync': 'TRUE', '#text': 'states'}
+    assert list(info['searchKeys']['keyword']) == ['states', 'USA']
+    assert list(info) == list(expected['metadata']['dataIdInfo'])
+    assert view.to_dict() == expected
+#--------------------------------------------------------------------------
+def test_view_changes_tree():
+    changed = []
+    view = MetadataView(ET.XML(SAMPLE), changed.append)
+    info = view['metadata']['dataIdInfo']
+    keywords = info['searchKeys']['keyword']
+    assert isinstance(keywords, ElementListView)
+    keywords.append('Hermes')
+    keywords[0] = 'State'
+    info['idPurp'] = {'@Sync': 'FALSE', '#text': 'testing'}
+    del info['resConst']
+    d = view.to_dict()['metadata']['dataIdInfo']
+    assert d['searchKeys']['keyword'] == ['State', 'USA', 'Hermes']
+    assert d['idPurp'] == {'@Sync': 'FALSE', '#text': 'testing'}
+    assert 'resConst' not in d
+    assert set(changed) == {'dataIdInfo'}
+#--------------------------------------------------------------------------
+def test_save_view(dataset):
+    pw = hermes.Paperwork(dataset=dataset)
+    view = pw.view()
+    view['metadata']['dataIdInfo']['idAbs'] = "changed"
+    assert pw.convert()['metadata']['dataIdInfo']['idAbs'] == "changed"
+    assert pw.save(view)
+    saved = metadata_to_dictionary(ET.XML(arcpy.metadata(dataset)))
+    assert saved['metadata']['dataIdInfo']['idAbs'] == "changed"
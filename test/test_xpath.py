@@ -0,0 +1,68 @@
+"""
+Tests for the compiled path queries.
+"""
+from __future__ import absolute_import
+
+import pytest
+import hermes
+from hermes import xpath
+from hermes.converters import ET
+from conftest import SAMPLE
+
+#--------------------------------------------------------------------------
+def test_compiled_paths_are_cached():
+    compiled = xpath.compile_path("dataIdInfo/idAbs")
+    assert xpath.compile_path("dataIdInfo/idAbs") is compiled
+    assert compiled.steps == ["dataIdInfo", "idAbs"]
+    assert xpath.compile_path("eainfo//attr[1]").steps is None
+    with pytest.raises(SyntaxError):
+        xpath.compile_path("dataIdInfo[")
+#--------------------------------------------------------------------------
+def test_whitespace_text_is_no_text():
+    root = ET.XML("<metadata><a x='1'>  </a><a> kept </a><b /></metadata>")
+    assert xpath.compile_path("a/#text").values(root) == ["kept"]
+    assert xpath.compile_path("b/#text").values(root) == []
+    assert "#text" not in xpath.element_value(root)["a"][0]
+#--------------------------------------------------------------------------
+@pytest.mark.parametrize("path, expected", [
+    ("dataIdInfo/idAbs", ["Boundaries of the states."]),
+    ("/metadata/dataIdInfo/searchKeys/keyword", ["states", "USA"]),
+    ("/other/dataIdInfo/idAbs", []),
+    ("dataIdInfo/idCitation/resTitle", [{'@Sync': 'TRUE', '#text': 'states'}]),
+    ("dataIdInfo/idCitation/resTitle/@Sync", ["TRUE"]),
+    ("dataIdInfo/idCitation/resTitle/#text", ["states"]),
+    (".//attr[attrlabl='NAME']/attrdef", ["name"]),
+    ("eainfo/detailed/attr[2]/attrlabl/#text", ["NAME"]),
+    ("/metadata/@{http://www.w3.org/XML/1998/namespace}lang", ["en"]),
+])
+def test_values(path, expected):
+    assert xpath.compile_path(path).values(ET.XML(SAMPLE)) == expected
+#--------------------------------------------------------------------------
+def test_set_path():
+    root = ET.XML(SAMPLE)
+    changed = []
+    assert not xpath.set_path(root, "dataIdInfo/idAbs",
+                              "Boundaries of the states.", changed.append)
+    assert xpath.set_path(root, "dataIdInfo/searchKeys/keyword",
+                          ["a", "b", "c"], changed.append)
+    assert xpath.set_path(root, ".//attr/attrlabl/@Sync", "FALSE",
+                          changed.append)
+    assert xpath.set_path(root, "distInfo/distributor/distorCont/rpIndName",
+                          "Hermes", changed.append)
+    assert changed == ["dataIdInfo", "eainfo", "eainfo", "distInfo"]
+    values = xpath.compile_path
+    assert values("dataIdInfo/searchKeys/keyword").values(root) == ["a", "b", "c"]
+    assert values(".//attrlabl/@Sync").values(root) == ["FALSE", "FALSE"]
+    assert values("distInfo//rpIndName").values(root) == ["Hermes"]
+    with pytest.raises(KeyError):
+        xpath.set_path(root, "eainfo/detailed/attr[9]/attrdef", "x")
+#--------------------------------------------------------------------------
+def test_paperwork_get_set(dataset):
+    pw = hermes.Paperwork(dataset=dataset)
+    assert pw.get("dataIdInfo/idPurp", "default") is None
+    assert pw.get("dataIdInfo/nothing", "default") == "default"
+    assert pw.findall("eainfo/detailed/attr/attrlabl/#text") == ["FID", "NAME"]
+    assert pw.set("dataIdInfo/idPurp", "testing")
+    assert pw.convert()['metadata']['dataIdInfo']['idPurp'] == "testing"
+    assert pw.save() is True
+    assert hermes.Paperwork(dataset=dataset).get("dataIdInfo/idPurp") == "testing"